@@ -0,0 +1,104 @@
+"""
+Бенчмарк расчета аспектов: прежний двойной цикл Python против векторного AspectEngine
+Запуск: python bench_aspects.py
+"""
+import sys
+import os
+import timeit
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from oracle.natal.aspects import ASPECT_TYPES, AspectEngine, aspect_engine
+
+
+LEGACY_ASPECT_TYPES = {
+    0: ('conjunction', 8, 'Соединение - слияние энергий'),
+    60: ('sextile', 6, 'Секстиль - гармоничная возможность'),
+    90: ('square', 8, 'Квадрат - напряжение и вызов'),
+    120: ('trine', 8, 'Трин - гармония и поток'),
+    180: ('opposition', 8, 'Оппозиция - противостояние и баланс')
+}
+
+
+def legacy_aspects(names, longitudes):
+    """Прежняя реализация NatalAstrology._calculate_aspects (без dataclass)"""
+    aspects = []
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            angle = abs(longitudes[i] - longitudes[j])
+            if angle > 180:
+                angle = 360 - angle
+            for aspect_angle, (asp_type, orb, interp) in LEGACY_ASPECT_TYPES.items():
+                if abs(angle - aspect_angle) <= orb:
+                    aspects.append((names[i], names[j], asp_type, abs(angle - aspect_angle), interp))
+                    break
+    return aspects
+
+
+def legacy_synastry(names_a, lons_a, names_b, lons_b):
+    aspects = []
+    for i in range(len(names_a)):
+        for j in range(len(names_b)):
+            angle = abs(lons_a[i] - lons_b[j])
+            if angle > 180:
+                angle = 360 - angle
+            for aspect_angle, (asp_type, orb, interp) in LEGACY_ASPECT_TYPES.items():
+                if abs(angle - aspect_angle) <= orb:
+                    aspects.append((names_a[i], names_b[j], asp_type))
+                    break
+    return aspects
+
+
+def check_equivalence(rng):
+    """С прежними орбисами (8°, секстиль 6°) движок находит те же аспекты"""
+    majors = [a for a in ASPECT_TYPES if a.major]
+    engine = AspectEngine(majors, body_orbs={}, default_orb=8.0)
+    names = [f"b{i}" for i in range(12)]
+    for _ in range(200):
+        lons = rng.uniform(0, 360, 12)
+        old = {(a, b, t) for a, b, t, _, _ in legacy_aspects(names, lons.tolist())}
+        hits = engine.natal(names, lons)
+        new = {(names[i], names[j], majors[k].name) for i, j, k in zip(hits.first, hits.second, hits.aspect)}
+        assert old == new, (old ^ new)
+    print("✅ Результаты совпадают с прежней реализацией (200 случайных карт)")
+
+
+def bench(label, legacy, vectorized, number):
+    t_old = timeit.timeit(legacy, number=number) / number
+    t_new = timeit.timeit(vectorized, number=number) / number
+    print(f"{label:<32} legacy {t_old * 1e6:9.1f} us   numpy {t_new * 1e6:9.1f} us   x{t_old / t_new:5.1f}")
+
+
+def main():
+    rng = np.random.default_rng(42)
+    check_equivalence(rng)
+
+    for n, number in ((12, 5000), (40, 1000), (200, 50)):
+        names = [f"b{i}" for i in range(n)]
+        lons = rng.uniform(0, 360, n)
+        lons_list = lons.tolist()
+        bench(
+            f"Натал, {n} тел (только мажорные)",
+            lambda: legacy_aspects(names, lons_list),
+            lambda: aspect_engine.natal(names, lons, include_minor=False),
+            number
+        )
+
+    names = [f"b{i}" for i in range(12)]
+    a, b = rng.uniform(0, 360, 12), rng.uniform(0, 360, 12)
+    a_list, b_list = a.tolist(), b.tolist()
+    bench(
+        "Синастрия 12x12 (мажорные)",
+        lambda: legacy_synastry(names, a_list, names, b_list),
+        lambda: aspect_engine.synastry(names, a, names, b, include_minor=False),
+        5000
+    )
+    t = timeit.timeit(lambda: aspect_engine.synastry(names, a, names, b), number=5000) / 5000
+    print(f"Синастрия 12x12, все 11 аспектов: numpy {t * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
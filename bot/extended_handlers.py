@@ -1,20 +1,144 @@
 """
 Расширенные обработчики (Отключены при откате версий)
+Натальная карта и совместимость работают: карты берутся из хранилища natal_chart_store.
 """
-from telegram import Update
+import re
+from datetime import datetime
+from typing import Optional, Tuple
+
+from loguru import logger
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 
+from database.user_manager import user_manager
+from oracle.compatibility.compatibility import compatibility
+from oracle.natal.chart_store import natal_chart_store
+from oracle.natal.natal_chart import natal_astrology
+from utils import fix_markdown
+
+
+# 'дд.мм.гггг чч:мм Город' (время можно не указывать - тогда полдень)
+_BIRTH_INPUT = re.compile(
+    r'^\s*(\d{1,2})[./-](\d{1,2})[./-](\d{4})(?:\s+(\d{1,2})[:.](\d{2}))?\s+(.+?)\s*$'
+)
+
+_DATE = re.compile(r'(\d{1,2})[./-](\d{1,2})[./-](\d{4})')
+
+CANCEL_WORDS = ('отмена', 'cancel', '/cancel')  # Обрабатываются в main.handle_message
+
+NATAL_FORMAT_HINT = "Формат: `дд.мм.гггг чч:мм Город`\nПример: `15.03.1990 14:30 Москва`"
+
+NATAL_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("❤️ Любовь", callback_data="sphere_love"), InlineKeyboardButton("💼 Карьера", callback_data="sphere_career")],
+    [InlineKeyboardButton("🔙 В меню", callback_data="menu")]
+])
+
+
+def parse_birth_input(text: str) -> Optional[Tuple[datetime, str]]:
+    """(местное время рождения, место) из текста пользователя или None"""
+    match = _BIRTH_INPUT.match(text or "")
+    if not match:
+        return None
+    day, month, year, hour, minute, place = match.groups()
+    try:
+        birth_local = datetime(int(year), int(month), int(day), int(hour or 12), int(minute or 0))
+    except ValueError:
+        return None
+    return birth_local, place
+
+
 async def handle_awaiting_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    """Stub"""
+    """Ввод данных для ожидаемого расчета (True - сообщение обработано)"""
+    text = update.message.text or ""
+    if text.lower() in CANCEL_WORDS:
+        return False
+    if context.user_data.get('awaiting_natal_data'):
+        await process_natal_data(update, context, text)
+        return True
+    if context.user_data.get('awaiting_compatibility_dates'):
+        await process_compatibility_dates(update, context, text)
+        return True
     return False
 
+
+async def process_compatibility_dates(update, context, text):
+    """Совместимость по двум датам; своя дата с сохраненными временем и городом - по натальной карте"""
+    message = update.message
+    try:
+        dates = [datetime(int(y), int(m), int(d)) for d, m, y in _DATE.findall(text)]
+    except ValueError:
+        dates = []
+    if len(dates) != 2:
+        await message.reply_text("❓ Нужны две даты через пробел.\nПример: `15.03.1990 20.01.1995`", parse_mode='Markdown')
+        return
+
+    context.user_data['awaiting_compatibility_dates'] = False
+    try:
+        result = await compatibility.calculate_for_user(update.effective_user.id, *dates)
+    except Exception as e:
+        logger.exception(f"Compatibility failed: {e}")
+        await message.reply_text("❌ Звезды сейчас скрыты. Попробуй позже.")
+        return
+
+    await message.reply_text(
+        f"💞 *СОВМЕСТИМОСТЬ*\n\n{compatibility.render_speedometer(result['total_score'])}\n\n"
+        f"{fix_markdown(result['text_report'])}",
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 В меню", callback_data="menu")]]),
+        parse_mode='Markdown'
+    )
+
 async def handle_horoscope_callback(update, context, sign):
     """Stub"""
     pass
 
 async def process_natal_data(update, context, text):
-    """Stub"""
-    pass
+    """Натальная карта по 'дд.мм.гггг чч:мм Город' (место и пояс - из офлайн-справочника)"""
+    message = update.message if update.message else update.callback_query.message
+    user = update.effective_user
+
+    parsed = parse_birth_input(text)
+    if parsed is None:
+        await message.reply_text(f"❓ Не разобрал данные рождения.\n{NATAL_FORMAT_HINT}", parse_mode='Markdown')
+        context.user_data['awaiting_natal_data'] = True
+        return
+    birth_local, place = parsed
+
+    try:
+        # Карта из памяти/БД, расчет - только для новых данных; сохраняется за пользователем
+        chart = await natal_chart_store.get_for_place(birth_local, place, telegram_id=user.id)
+    except Exception as e:
+        logger.exception(f"Natal chart failed: {e}")
+        await message.reply_text("❌ Звезды сейчас скрыты. Попробуй позже.")
+        return
+    if chart is None:
+        await message.reply_text(
+            f"🗺 Не нашел город «{place}». Напиши название крупного города рядом.\n{NATAL_FORMAT_HINT}",
+            parse_mode='Markdown'
+        )
+        context.user_data['awaiting_natal_data'] = True
+        return
+
+    context.user_data['awaiting_natal_data'] = False
+    context.user_data['user_info'] = {
+        **context.user_data.get('user_info', {}),
+        'birth_date': birth_local,
+        'date_str': birth_local.strftime('%d.%m.%Y'),
+        'time_str': birth_local.strftime('%H:%M'),
+        'location': chart.location,
+    }
+    await user_manager.save_user_data(
+        user.id,
+        birth_date=birth_local,
+        birth_time=birth_local.strftime('%H:%M'),
+        birth_location=chart.location,
+        zodiac_sign=chart.sun_sign
+    )
+
+    chart_text = natal_astrology.format_natal_chart(chart)
+    # Разбор по сферам строится по этой же карте
+    context.user_data['last_calc_type'] = 'natal'
+    context.user_data['last_calc_data'] = chart_text
+    await message.reply_text(fix_markdown(chart_text), reply_markup=NATAL_KEYBOARD, parse_mode='Markdown')
 
 async def process_numerology_date(update, context, text):
     """Stub"""
@@ -0,0 +1,370 @@
+"""
+Ежедневная рассылка
+Подписчики читаются из БД потоком (только telegram_id и дата рождения),
+каждый получает послание своего знака зодиака, а отправка идет параллельно
+с общим ограничением скорости под глобальный лимит Telegram (~30 сообщений в секунду).
+
+Прогресс хранится в БД (broadcasts / broadcast_deliveries): после перезапуска
+рассылка продолжается с курсора, повторно может уйти только последняя
+незаписанная часть получателей (при штатной остановке уже отправленное
+записывается, и повторов нет). На RetryAfter
+скорость снижается, заблокировавшие бота пользователи исключаются из рассылок.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from sqlalchemy import and_, exists, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from config.settings import settings
+from database.database import AsyncSessionLocal
+from database.models import Broadcast, BroadcastDelivery, User, UserData
+from oracle.daily_guidance import GENERAL, daily_guidance
+from oracle.horoscope.horoscope_parser import horoscope_parser
+from oracle.llm_scheduler import TokenBucket
+from oracle.singleflight import SingleFlight
+from utils import fix_markdown
+
+
+MAILING_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔮 Задать вопрос", callback_data="ask")],
+    [InlineKeyboardButton("✨ Другие возможности", callback_data="menu")]
+])
+
+
+def format_daily_message(guidance: str) -> str:
+    return (
+        f"📜 *Свиток Дня от Источника*\n\n{fix_markdown(guidance)}\n\n"
+        f"✨ Слушай шепот судьбы и делай свой выбор.\n\n"
+        f"🔮 *Если туман сгустился, задай свой вопрос...*"
+    )
+
+
+def sign_of(birth_date: Optional[datetime]) -> str:
+    """Знак зодиака подписчика (GENERAL, если дата рождения неизвестна)"""
+    if birth_date is None:
+        return GENERAL
+    return horoscope_parser.get_sign_from_date(birth_date.day, birth_date.month)
+
+
+SENT = 'sent'
+FAILED = 'failed'
+UNDELIVERABLE = 'undeliverable'
+
+# BadRequest, после которых слать этому чату бесполезно
+UNDELIVERABLE_ERRORS = ("chat not found", "user not found", "peer_id_invalid")
+
+
+@dataclass
+class MailingReport:
+    """Итог запуска рассылки (только этого запуска, без уже доставленных до перезапуска)"""
+    broadcast_id: Optional[int] = None
+    resumed: bool = False
+    recipients: int = 0
+    sent: int = 0
+    failed: int = 0
+    undeliverable: int = 0
+    throttled: int = 0  # Сколько раз Telegram ответил RetryAfter
+    by_sign: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+
+class AdaptiveRate:
+    """
+    Скорость отправки: на RetryAfter все отправки ставятся на паузу и скорость падает вдвое,
+    после серии успешных отправок постепенно возвращается к целевой
+    """
+
+    MIN_RATE = 1.0  # сообщений в секунду
+    RECOVERY_STREAK = 100
+
+    def __init__(self, messages_per_second: float):
+        self.target = messages_per_second
+        # Без всплеска: отправки равномерно по 1/rate, в любой секунде не больше лимита
+        self.bucket = TokenBucket(messages_per_second * 60, capacity=1)
+        self._paused_until = 0.0
+        self._streak = 0
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    async def acquire(self):
+        while (delay := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        await self.bucket.acquire()
+
+    def on_success(self):
+        self._streak += 1
+        if self._streak >= self.RECOVERY_STREAK and self.bucket.rate < self.target:
+            self.bucket.rate = min(self.target, self.bucket.rate * 1.25)
+            self._streak = 0
+
+    def on_retry_after(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.bucket.rate = max(self.MIN_RATE, self.bucket.rate / 2)
+        self._streak = 0
+        logger.warning(f"Mailing throttled by Telegram for {seconds}s, rate -> {self.bucket.rate:.1f} msg/s")
+
+
+class DailyMailer:
+    """Потоковая рассылка посланий дня по знакам зодиака"""
+
+    KIND = 'daily'
+
+    def __init__(
+        self,
+        messages_per_second: float = 30,
+        concurrency: int = 30,
+        batch_size: int = 500,
+        checkpoint_size: int = 100,
+        max_attempts: int = 3
+    ):
+        self.messages_per_second = messages_per_second
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.checkpoint_size = checkpoint_size
+        self.max_attempts = max_attempts
+        # Плановый запуск и продолжение после перезапуска не идут параллельно
+        self._flights = SingleFlight()
+
+    @staticmethod
+    def today() -> date:
+        return datetime.utcnow().date()
+
+    async def run(self, bot: Bot) -> MailingReport:
+        """Разослать послание дня (или продолжить сегодняшнюю рассылку с курсора)"""
+        day = self.today()
+        return await self._flights.do(day, self._run, bot, day)
+
+    async def resume(self, bot: Bot) -> Optional[MailingReport]:
+        """Продолжить сегодняшнюю рассылку, если ее прервал перезапуск (None - продолжать нечего)"""
+        day = self.today()
+        async with AsyncSessionLocal() as session:
+            status = await session.scalar(
+                select(Broadcast.status).where(Broadcast.kind == self.KIND, Broadcast.day == day)
+            )
+        if status != 'running':
+            return None
+        logger.info(f"Resuming interrupted daily mailing for {day}")
+        return await self.run(bot)
+
+    async def subscribers(self, broadcast_id: int, after_id: int) -> AsyncIterator[Sequence[Tuple[int, int, Optional[datetime]]]]:
+        """
+        Получатели пачками по batch_size: (users.id, telegram_id, дата рождения), без загрузки ORM-объектов.
+        Пропускаются обработанные до курсора, уже получившие эту рассылку и недоступные
+        """
+        birth_date = (
+            select(UserData.birth_date)
+            .where(UserData.user_id == User.id, UserData.birth_date != None)
+            .limit(1)
+            .scalar_subquery()
+        )
+        delivered = exists().where(and_(
+            BroadcastDelivery.broadcast_id == broadcast_id,
+            BroadcastDelivery.telegram_id == User.telegram_id,
+        ))
+        stmt = (
+            select(User.id, User.telegram_id, birth_date)
+            .where(
+                User.id > after_id,
+                User.daily_prediction_enabled == True,
+                User.undeliverable_at == None,
+                ~delivered,
+            )
+            .order_by(User.id)
+            .execution_options(yield_per=self.batch_size)
+        )
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt)
+            async for partition in result.partitions():
+                yield partition
+
+    async def _messages(self, signs, cache: Dict[str, str]) -> Dict[str, str]:
+        """Тексты для знаков пачки (генерируются один раз за день, дальше из памяти)"""
+        for sign in signs:
+            if sign in cache:
+                continue
+            try:
+                cache[sign] = format_daily_message(await daily_guidance.get(sign))
+            except Exception as e:
+                # Без персонального послания знак получает общее
+                logger.error(f"Daily guidance for {sign or 'general'} unavailable: {e}")
+                if sign == GENERAL:
+                    raise
+                cache[sign] = format_daily_message(await daily_guidance.get(GENERAL))
+        return cache
+
+    async def _deliver(self, bot: Bot, rate: AdaptiveRate, report: MailingReport, chat_id: int, text: str):
+        """Отправить одно сообщение: (telegram_id, статус, попытки, ошибка)"""
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            await rate.acquire()
+            try:
+                await bot.send_message(
+                    chat_id=chat_id,
+                    text=text,
+                    parse_mode='Markdown',
+                    reply_markup=MAILING_KEYBOARD
+                )
+                rate.on_success()
+                return chat_id, SENT, attempt, None
+            except RetryAfter as e:
+                report.throttled += 1
+                rate.on_retry_after(float(e.retry_after))
+                error = str(e)
+            except Forbidden as e:
+                # Бот заблокирован или аккаунт удален
+                return chat_id, UNDELIVERABLE, attempt, str(e)
+            except BadRequest as e:
+                status = UNDELIVERABLE if any(m in str(e).lower() for m in UNDELIVERABLE_ERRORS) else FAILED
+                return chat_id, status, attempt, str(e)
+            except NetworkError as e:
+                # Таймауты и сетевые сбои: повторяем с паузой
+                error = str(e)
+                await asyncio.sleep(attempt)
+            except Exception as e:
+                return chat_id, FAILED, attempt, str(e)
+        return chat_id, FAILED, self.max_attempts, error
+
+    async def _open_broadcast(self, day: date) -> Tuple[Broadcast, bool]:
+        """Сегодняшняя рассылка: (запись, продолжение ли это прерванной)"""
+        async with AsyncSessionLocal() as session:
+            broadcast = await session.scalar(
+                select(Broadcast).where(Broadcast.kind == self.KIND, Broadcast.day == day)
+            )
+            if broadcast:
+                return broadcast, True
+            broadcast = Broadcast(kind=self.KIND, day=day, status='running', cursor=0)
+            session.add(broadcast)
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Запись создал другой процесс бота
+                await session.rollback()
+                broadcast = await session.scalar(
+                    select(Broadcast).where(Broadcast.kind == self.KIND, Broadcast.day == day)
+                )
+                return broadcast, True
+            return broadcast, False
+
+    async def _checkpoint(self, broadcast_id: int, cursor: int, results: List[tuple]):
+        """Записать результаты части получателей и сдвинуть курсор (одна транзакция)"""
+        counts = defaultdict(int)
+        for _, status, _, _ in results:
+            counts[status] += 1
+        dead = [chat_id for chat_id, status, _, _ in results if status == UNDELIVERABLE]
+
+        async with AsyncSessionLocal() as session:
+            if results:
+                await session.execute(insert(BroadcastDelivery), [
+                    dict(broadcast_id=broadcast_id, telegram_id=chat_id, status=status,
+                         attempts=attempts, error=error[:255] if error else None)
+                    for chat_id, status, attempts, error in results
+                ])
+            await session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id)
+                .values(
+                    cursor=cursor,
+                    sent=Broadcast.sent + counts[SENT],
+                    failed=Broadcast.failed + counts[FAILED],
+                    undeliverable=Broadcast.undeliverable + counts[UNDELIVERABLE],
+                )
+            )
+            if dead:
+                # Исключаем из будущих рассылок (вернутся по /start)
+                await session.execute(
+                    update(User)
+                    .where(User.telegram_id.in_(dead), User.undeliverable_at == None)
+                    .values(undeliverable_at=datetime.utcnow())
+                )
+            await session.commit()
+
+    async def _finish(self, broadcast_id: int):
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id)
+                .values(status='done', finished_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    async def _run(self, bot: Bot, day: date) -> MailingReport:
+        started = time.monotonic()
+        broadcast, resumed = await self._open_broadcast(day)
+        report = MailingReport(broadcast_id=broadcast.id, resumed=resumed)
+        if broadcast.status == 'done':
+            logger.info(f"Daily mailing for {day} already completed")
+            return report
+
+        rate = AdaptiveRate(self.messages_per_second)
+        slots = asyncio.Semaphore(self.concurrency)
+        texts: Dict[str, str] = {}
+
+        async def send(chat_id: int, text: str):
+            try:
+                return await self._deliver(bot, rate, report, chat_id, text)
+            finally:
+                slots.release()
+
+        cursor = broadcast.cursor
+        async for batch in self.subscribers(broadcast.id, cursor):
+            signs = [sign_of(birth_date) for _, _, birth_date in batch]
+            await self._messages(set(signs), texts)
+
+            # Контрольные точки по checkpoint_size получателей: после перезапуска
+            # повторно может уйти не больше одной незаписанной части
+            for start in range(0, len(batch), self.checkpoint_size):
+                part = batch[start:start + self.checkpoint_size]
+                tasks = []
+                try:
+                    for (_, chat_id, _), sign in zip(part, signs[start:start + self.checkpoint_size]):
+                        report.recipients += 1
+                        report.by_sign[sign] += 1
+                        # Не больше concurrency отправок в полете
+                        await slots.acquire()
+                        tasks.append(asyncio.create_task(send(chat_id, texts[sign])))
+                    results = await asyncio.gather(*tasks)
+                except BaseException:
+                    # Остановка посреди части: записываем уже доставленное, курсор не сдвигаем -
+                    # после перезапуска эти получатели отсеются по broadcast_deliveries
+                    for task in tasks:
+                        task.cancel()
+                    done = [t.result() for t in tasks if t.done() and not t.cancelled() and t.exception() is None]
+                    await asyncio.shield(self._checkpoint(broadcast.id, cursor, done))
+                    raise
+
+                for _, status, _, error in results:
+                    if status == SENT:
+                        report.sent += 1
+                    elif status == UNDELIVERABLE:
+                        report.undeliverable += 1
+                    else:
+                        report.failed += 1
+                        logger.warning(f"Could not send daily message: {error}")
+                cursor = part[-1][0]
+                await self._checkpoint(broadcast.id, cursor, results)
+
+        await self._finish(broadcast.id)
+        report.elapsed = time.monotonic() - started
+        return report
+
+
+# Singleton
+daily_mailer = DailyMailer(
+    messages_per_second=settings.mailing_messages_per_second,
+    concurrency=settings.mailing_concurrency,
+    batch_size=settings.mailing_batch_size
+)
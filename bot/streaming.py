@@ -0,0 +1,89 @@
+"""
+Потоковая доставка ответов: сообщение дописывается по мере генерации текста
+"""
+import asyncio
+import time
+from typing import List
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+from loguru import logger
+
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """Разбить длинный текст на части, не превышающие лимит Telegram (по абзацам, если можно)"""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return parts
+
+
+class StreamingMessage:
+    """
+    Сообщение, которое постепенно редактируется по мере поступления фрагментов.
+    Частота редактирований ограничена, чтобы не упираться в лимиты Telegram
+    (около одного редактирования в секунду на чат).
+    """
+
+    CURSOR = " ▌"
+
+    def __init__(self, message: Message, min_interval: float = 1.2):
+        self.message = message
+        self.min_interval = min_interval
+        self.text = ""
+        self._shown = ""
+        self._next_edit_at = 0.0  # Первый фрагмент показываем сразу
+
+    async def append(self, chunk: str):
+        """Добавить фрагмент текста и, если пора, обновить сообщение"""
+        self.text += chunk
+        if time.monotonic() < self._next_edit_at or not self.text.strip():
+            return
+
+        # Промежуточный текст без разметки: незакрытые * и _ ломают Markdown
+        preview = self.text[:TELEGRAM_MESSAGE_LIMIT - len(self.CURSOR)] + self.CURSOR
+        await self._edit(preview)
+
+    async def _edit(self, text: str):
+        if text == self._shown:
+            return
+        try:
+            await self.message.edit_text(text)
+            self._shown = text
+            self._next_edit_at = time.monotonic() + self.min_interval
+        except RetryAfter as e:
+            # Telegram просит притормозить - откладываем следующее редактирование
+            self._next_edit_at = time.monotonic() + float(e.retry_after)
+        except BadRequest as e:
+            logger.debug(f"Streaming edit skipped: {e}")
+            self._next_edit_at = time.monotonic() + self.min_interval
+
+    async def finish(self, text: str, parse_mode: str = 'Markdown'):
+        """Показать окончательный текст (с разметкой), лишнее отправить отдельными сообщениями"""
+        parts = split_message(text)
+        await self._finalize(self.message.edit_text, parts[0], parse_mode)
+        for part in parts[1:]:
+            await self._finalize(self.message.reply_text, part, parse_mode)
+
+    async def _finalize(self, send, text: str, parse_mode: str):
+        for _ in range(2):
+            try:
+                await send(text, parse_mode=parse_mode)
+                return
+            except RetryAfter as e:
+                await asyncio.sleep(float(e.retry_after))
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    return
+                # Невалидная разметка от модели - показываем текст как есть
+                logger.warning(f"Final message rejected with {parse_mode}: {e}")
+                parse_mode = None
+        await send(text, parse_mode=parse_mode)
@@ -55,7 +55,7 @@ async def run_client_scenarios():
     mock_query.answer = AsyncMock()
     mock_update.callback_query = mock_query
     with patch('main.user_manager') as mock_um:
-        mock_um.get_or_create_user.return_value = MagicMock(is_premium=False)
+        mock_um.get_profile = AsyncMock(return_value=MagicMock(is_premium=False))
         await bot.button_handler(mock_update, mock_context)
     print("✅ Успех: Бот предложил восстановление сессии\n")
 
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Literal
+from typing import Dict, Literal
 
 
 class Settings(BaseSettings):
@@ -9,19 +9,67 @@ class Settings(BaseSettings):
     telegram_bot_token: str
     
     # AI Configuration
-    ai_provider: Literal["openai", "anthropic", "groq"] = "openai"  # Добавлен groq
+    ai_provider: Literal["openai", "anthropic", "groq", "together", "huggingface"] = "openai"
     ai_model: str = "gpt-4-turbo-preview"
     openai_api_key: str | None = None
     anthropic_api_key: str | None = None
     groq_api_key: str | None = None  # НОВОЕ!
+    together_api_key: str | None = None
+    huggingface_api_key: str | None = None
+
+    # LLM router (выбор самого быстрого здорового провайдера)
+    llm_hedge_enabled: bool = True
+    llm_hedge_min_delay: float = 2.0  # секунд: не дублируем запрос раньше этого
+    llm_provider_cooldown: float = 30.0  # секунд паузы после 429/5xx
+    llm_auth_cooldown: float = 600.0  # секунд паузы после 401/403
+
+    # LLM scheduler (очередь запросов к моделям)
+    llm_max_concurrency: int = 8  # одновременных запросов к моделям
+    llm_rate_limits: Dict[str, int] = {  # запросов в минуту на провайдера (JSON в .env)
+        "groq": 30,
+        "openai": 500,
+        "anthropic": 50,
+        "together": 60,
+        "huggingface": 30,
+    }
     
     # Database
     database_url: str = "sqlite:///./oracle.db"
+    sqlite_busy_timeout_ms: int = 5000  # сколько запись ждет блокировку SQLite
     
     # Bot Settings
     debug_mode: bool = False
     log_level: str = "INFO"
-    
+    admin_ids: list[int] = []  # Telegram ID администраторов (JSON в .env: [123, 456])
+
+    # Streaming (ответ появляется по мере генерации)
+    stream_responses: bool = True
+    stream_edit_interval: float = 1.2  # секунд между редактированиями сообщения
+
+    # LLM response cache (ответы на детерминированные расчеты)
+    llm_cache_memory_items: int = 1000
+    llm_cache_ttl_days: int = 30
+
+    # Кэш профилей пользователей (сбрасывается при любой записи в users)
+    user_cache_max_items: int = 10000
+    user_cache_ttl: float = 300.0  # секунд
+
+    # Ежедневная рассылка (глобальный лимит Telegram ~30 сообщений в секунду)
+    mailing_messages_per_second: float = 30
+    mailing_concurrency: int = 30
+    mailing_batch_size: int = 500
+
+    # Пулы для тяжелых расчетов и разбора HTML (0 процессов - только потоки).
+    # По умолчанию потоки: воркер spawn заново импортирует main.py со всем ботом (сотни МБ на процесс),
+    # а расчеты swisseph занимают миллисекунды. Процессы имеют смысл на машине с запасом памяти.
+    executor_processes: int = 0
+    executor_threads: int = 8
+
+    # Outbound HTTP (общий пул соединений)
+    http_pool_limit: int = 100
+    http_pool_limit_per_host: int = 20
+    http_dns_cache_ttl: int = 300  # секунд
+
     # Monetization
     payment_provider_token: str | None = None
     free_questions_per_day: int = 2
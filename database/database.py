@@ -1,28 +1,66 @@
 """
 Настройка подключения к базе данных
+Синхронный engine - для миграций и скриптов, асинхронный - для обработчиков бота
+(запросы к БД не блокируют event loop)
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from config.settings import settings
 from database.models import Base
 
+
+IS_SQLITE = "sqlite" in settings.database_url
+
+
+def _async_url(url: str) -> str:
+    """URL с асинхронным драйвером (sqlite -> aiosqlite, postgresql -> asyncpg)"""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL: чтение не ждет записи; busy_timeout: запись ждет блокировку, а не падает"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.close()
+
+
 # Создаем engine
 engine = create_engine(
     settings.database_url,
     echo=settings.debug_mode,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
+    connect_args={"check_same_thread": False} if IS_SQLITE else {}
 )
 
 # Создаем фабрику сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный engine для обработчиков
+async_engine = create_async_engine(
+    _async_url(settings.database_url),
+    echo=settings.debug_mode,
+)
+
+# expire_on_commit=False: объекты остаются читаемыми после закрытия сессии
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+
 
 def init_db():
     """Инициализировать базу данных (создать таблицы)"""
     Base.metadata.create_all(bind=engine)
-    
+
     # Хак для миграции SQLite (добавление новых колонок если их нет)
-    if "sqlite" in settings.database_url:
+    if IS_SQLITE:
         from sqlalchemy import text
         with engine.connect() as conn:
             # Проверяем наличие колонки bonus_questions в users
@@ -32,13 +70,36 @@ def init_db():
                 conn.execute(text("ALTER TABLE users ADD COLUMN bonus_questions INTEGER DEFAULT 0"))
                 conn.commit()
                 print("✅ Миграция: добавлена колонка bonus_questions")
-            
+
             if "last_tarot_date" not in columns:
                 conn.execute(text("ALTER TABLE users ADD COLUMN last_tarot_date DATETIME"))
                 conn.execute(text("ALTER TABLE users ADD COLUMN tarot_today INTEGER DEFAULT 0"))
                 conn.commit()
                 print("✅ Миграция: добавлены колонки для Таро")
 
+            if "last_dream_detailed_date" not in columns:
+                conn.execute(text("ALTER TABLE users ADD COLUMN last_dream_detailed_date DATETIME"))
+                conn.commit()
+                print("✅ Миграция: добавлена колонка last_dream_detailed_date")
+
+            if "undeliverable_at" not in columns:
+                conn.execute(text("ALTER TABLE users ADD COLUMN undeliverable_at DATETIME"))
+                conn.commit()
+                print("✅ Миграция: добавлена колонка undeliverable_at")
+
+            # Послание дня стало ключеваться по (день, знак): старая таблица - только кэш текстов
+            res = conn.execute(text("PRAGMA table_info(daily_guidance)"))
+            if "sign" not in [row[1] for row in res]:
+                conn.execute(text("DROP TABLE daily_guidance"))
+                conn.commit()
+                Base.metadata.tables["daily_guidance"].create(bind=engine)
+                print("✅ Миграция: daily_guidance пересоздана с колонкой sign")
+
+
+async def close_db():
+    """Закрыть пул асинхронных соединений (при остановке бота)"""
+    await async_engine.dispose()
+
 
 def get_db():
     """Получить сессию БД"""
@@ -1,7 +1,7 @@
 """
 Модели базы данных
 """
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Float, ForeignKey, LargeBinary, Text, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -25,6 +25,9 @@ class User(Base):
     questions_today = Column(Integer, default=0)
     last_question_date = Column(DateTime, default=datetime.utcnow)
     total_questions_asked = Column(Integer, default=0)
+    tarot_today = Column(Integer, default=0)
+    last_tarot_date = Column(DateTime, nullable=True)
+    last_dream_detailed_date = Column(DateTime, nullable=True)
     
     # Реферальная система
     referred_by = Column(Integer, nullable=True)
@@ -33,6 +36,7 @@ class User(Base):
     
     # Настройки
     daily_prediction_enabled = Column(Boolean, default=True)
+    undeliverable_at = Column(DateTime, nullable=True)  # Бот заблокирован / чат не найден
     
     created_at = Column(DateTime, default=datetime.utcnow)
     last_active = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -118,3 +122,82 @@ class Payment(Base):
     
     def __repr__(self):
         return f"<Payment(id={self.id}, user_id={self.user_id}, amount={self.amount})>"
+
+
+class LLMCacheEntry(Base):
+    """Кэш ответов LLM (ключ - хэш входных данных запроса)"""
+    __tablename__ = 'llm_cache'
+    
+    key = Column(String(64), primary_key=True)
+    value = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<LLMCacheEntry(key={self.key[:12]}, expires_at={self.expires_at})>"
+
+
+class DailyGuidance(Base):
+    """Послание дня (одно на сутки по UTC для каждого знака; sign='' - общее)"""
+    __tablename__ = 'daily_guidance'
+    
+    day = Column(Date, primary_key=True)
+    sign = Column(String(20), primary_key=True, default='')
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<DailyGuidance(day={self.day}, sign={self.sign})>"
+
+
+class Broadcast(Base):
+    """Рассылка (одна на вид и день): прогресс для продолжения после перезапуска"""
+    __tablename__ = 'broadcasts'
+    __table_args__ = (UniqueConstraint('kind', 'day'),)
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)  # daily
+    day = Column(Date, nullable=False)
+    status = Column(String(20), default='running')  # running, done
+    cursor = Column(Integer, default=0)  # users.id, до которого рассылка обработана
+    sent = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    undeliverable = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<Broadcast(kind={self.kind}, day={self.day}, status={self.status})>"
+
+
+class BroadcastDelivery(Base):
+    """Результат доставки рассылки одному получателю"""
+    __tablename__ = 'broadcast_deliveries'
+    
+    broadcast_id = Column(Integer, ForeignKey('broadcasts.id'), primary_key=True)
+    telegram_id = Column(Integer, primary_key=True)
+    status = Column(String(20), nullable=False)  # sent, failed, undeliverable
+    attempts = Column(Integer, default=1)
+    error = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<BroadcastDelivery(broadcast_id={self.broadcast_id}, telegram_id={self.telegram_id}, status={self.status})>"
+
+
+class NatalChartEntry(Base):
+    """Рассчитанная натальная карта: сырые позиции планет и куспиды (остальное выводится из них)"""
+    __tablename__ = 'natal_charts'
+    
+    telegram_id = Column(Integer, primary_key=True)  # 0 - карта без владельца (партнер в совместимости)
+    input_hash = Column(String(64), primary_key=True)  # Хэш даты/места рождения и параметров расчета
+    birth_date = Column(DateTime, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    location = Column(String(255), nullable=True)
+    positions = Column(LargeBinary, nullable=False)  # float64: (долгота, скорость) x планеты, NaN - нет данных
+    cusps = Column(LargeBinary, nullable=False)  # float64 x 12
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<NatalChartEntry(telegram_id={self.telegram_id}, input_hash={self.input_hash[:12]})>"
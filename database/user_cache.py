@@ -0,0 +1,110 @@
+"""
+Кэш профилей пользователей в памяти процесса
+Обработчики читают статус и счетчики из неизменяемых снимков, а не из SQLite.
+Все записи в users (лимиты, премиум, рассылка, рефералы) сбрасывают снимок пользователя.
+Сброс увеличивает поколение ключа: снимок, прочитанный из БД до сброса, в кэш уже не попадет.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, date
+from typing import Dict, Optional, Tuple
+
+from config.settings import settings
+from database.models import User
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    """Неизменяемый снимок профиля (без ORM и привязки к сессии)"""
+    telegram_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    is_premium: bool
+    premium_until: Optional[datetime]
+    questions_today: int
+    total_questions_asked: int
+    referral_count: int
+    bonus_questions: int
+    daily_prediction_enabled: bool
+    day: date  # Сутки (UTC), для которых посчитан questions_today
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        today = datetime.utcnow().date()
+        # Дневной счетчик сбрасывается лениво: вчерашнее значение - это ноль
+        questions_today = user.questions_today or 0
+        if user.last_question_date is None or user.last_question_date.date() < today:
+            questions_today = 0
+        return cls(
+            telegram_id=user.telegram_id,
+            username=user.username,
+            first_name=user.first_name,
+            is_premium=bool(user.is_premium),
+            premium_until=user.premium_until,
+            questions_today=questions_today,
+            total_questions_asked=user.total_questions_asked or 0,
+            referral_count=user.referral_count or 0,
+            bonus_questions=user.bonus_questions or 0,
+            daily_prediction_enabled=bool(user.daily_prediction_enabled),
+            day=today,
+        )
+
+
+class UserCache:
+    """LRU с TTL: telegram_id -> UserSnapshot"""
+
+    def __init__(self, max_items: int = 10000, ttl: float = 300.0):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items: "OrderedDict[int, tuple[float, UserSnapshot]]" = OrderedDict()
+        # Поколения ключей: растут при каждом сбросе (int на пользователя, которому что-то записывали)
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0  # Растет при clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, telegram_id: int) -> Optional[UserSnapshot]:
+        item = self._items.get(telegram_id)
+        if item is not None:
+            expires_at, snapshot = item
+            # Снимок со вчерашним счетчиком не отдаем, даже если TTL не истек
+            if expires_at > time.monotonic() and snapshot.day == datetime.utcnow().date():
+                self._items.move_to_end(telegram_id)
+                self.hits += 1
+                return snapshot
+            del self._items[telegram_id]
+        self.misses += 1
+        return None
+
+    def generation(self, telegram_id: int) -> Tuple[int, int]:
+        """Поколение ключа: взять до чтения из БД и передать в put"""
+        return self._epoch, self._generations.get(telegram_id, 0)
+
+    def put(self, snapshot: UserSnapshot, generation: Optional[Tuple[int, int]] = None):
+        """Сохранить снимок; если с момента generation ключ сбрасывали - снимок устарел и не сохраняется"""
+        if generation is not None and generation != self.generation(snapshot.telegram_id):
+            return
+        self._items[snapshot.telegram_id] = (time.monotonic() + self.ttl, snapshot)
+        self._items.move_to_end(snapshot.telegram_id)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def invalidate(self, telegram_id: Optional[int]):
+        if telegram_id is not None:
+            self._generations[telegram_id] = self._generations.get(telegram_id, 0) + 1
+            self._items.pop(telegram_id, None)
+
+    def clear(self):
+        self._epoch += 1
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+# Singleton
+user_cache = UserCache(
+    max_items=settings.user_cache_max_items,
+    ttl=settings.user_cache_ttl
+)
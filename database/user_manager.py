@@ -1,176 +1,351 @@
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, insert, literal, or_, select, update
+from sqlalchemy.exc import IntegrityError
 
-from datetime import datetime, date
-from sqlalchemy.orm import Session
 from database.models import User, QuestionSession, Payment, UserData
-from database.database import SessionLocal
+from database.database import AsyncSessionLocal
+from database.user_cache import UserSnapshot, user_cache
+
+
+LIMIT_REACHED_TEXT = "Лимит бесплатных вопросов на сегодня исчерпан. Позови друга или подожди до завтра."
+TAROT_LIMIT_TEXT = "Твое видение на сегодня исчерпано. Возвращайся завтра или получи Premium для безлимитных раскладов."
+REFERRAL_BONUS = 3  # Бонусных вопросов за приглашенного друга
+DREAM_DETAILED_PERIOD = timedelta(days=7)
+
+
+@dataclass
+class QuestionAdmission:
+    """Результат допуска вопроса"""
+    allowed: bool
+    is_premium: bool = False
+    questions_today: int = 0
+    used_bonus: bool = False
+    bonus_left: int = 0
+    message: Optional[str] = None  # Причина отказа
+
+
+async def _get_user(session, telegram_id) -> Optional[User]:
+    result = await session.execute(select(User).where(User.telegram_id == telegram_id))
+    return result.scalar_one_or_none()
+
+
+def _field(obj, name):
+    """Поле результата гадания: dataclass (Hexagram, TarotCard) или dict"""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def _day_start() -> datetime:
+    """Начало текущих суток (UTC): счетчики с датой раньше этой считаются нулевыми"""
+    return datetime.combine(datetime.utcnow().date(), time.min)
+
+
+def _new_user(tg_user, referred_by=None, **counters) -> User:
+    now = datetime.utcnow()
+    values = dict(
+        telegram_id=tg_user.id,
+        username=tg_user.username,
+        first_name=tg_user.first_name,
+        last_name=tg_user.last_name,
+        referred_by=referred_by,
+        is_premium=False,
+        questions_today=0,
+        total_questions_asked=0,
+        referral_count=0,
+        bonus_questions=0,
+        tarot_today=0,
+        last_question_date=now,
+    )
+    values.update(counters)
+    return User(**values)
+
+
+async def _consume_question(session, telegram_id, free_limit: int) -> Optional[QuestionAdmission]:
+    """
+    Списать вопрос атомарными UPDATE ... RETURNING (без чтения-изменения-записи).
+    Дневной сброс ленивый: если last_question_date раньше начала суток, счетчик считается с нуля.
+    None - пользователя нет в БД.
+    """
+    now = datetime.utcnow()
+    day_start = _day_start()
+    new_day = User.last_question_date < day_start
+
+    # 1. Премиум или еще есть бесплатные вопросы на сегодня
+    result = await session.execute(
+        update(User)
+        .where(User.telegram_id == telegram_id)
+        .where(or_(User.is_premium == True, new_day, User.questions_today < free_limit))
+        .values(
+            questions_today=case((new_day, 1), else_=User.questions_today + 1),
+            total_questions_asked=User.total_questions_asked + 1,
+            last_question_date=now,
+        )
+        .returning(User.questions_today, User.is_premium, User.bonus_questions)
+    )
+    row = result.first()
+    if row:
+        return QuestionAdmission(True, is_premium=bool(row.is_premium), questions_today=row.questions_today,
+                                 bonus_left=row.bonus_questions or 0)
+
+    # 2. Лимит исчерпан - списываем бонусный вопрос, если есть
+    result = await session.execute(
+        update(User)
+        .where(User.telegram_id == telegram_id, User.bonus_questions > 0)
+        .values(
+            bonus_questions=User.bonus_questions - 1,
+            total_questions_asked=User.total_questions_asked + 1,
+            last_question_date=now,
+        )
+        .returning(User.questions_today, User.bonus_questions)
+    )
+    row = result.first()
+    if row:
+        return QuestionAdmission(True, questions_today=row.questions_today, used_bonus=True,
+                                 bonus_left=row.bonus_questions)
+
+    exists = await session.scalar(select(User.id).where(User.telegram_id == telegram_id))
+    if exists is None:
+        return None
+    return QuestionAdmission(False, message=LIMIT_REACHED_TEXT)
+
 
 class UserManager:
+    """Асинхронный доступ к пользователям (AsyncSession поверх aiosqlite)"""
+
     @staticmethod
-    def get_or_create_user(tg_user, referred_by=None):
-        session = SessionLocal()
-        try:
-            db_user = session.query(User).filter(User.telegram_id == tg_user.id).first()
-            if not db_user:
-                db_user = User(
-                    telegram_id=tg_user.id,
-                    username=tg_user.username,
-                    first_name=tg_user.first_name,
-                    last_name=tg_user.last_name,
-                    referred_by=referred_by
+    async def get_or_create_user(tg_user, referred_by=None):
+        async with AsyncSessionLocal() as session:
+            db_user = await _get_user(session, tg_user.id)
+            if db_user:
+                return db_user
+
+            db_user = _new_user(tg_user, referred_by=referred_by)
+            session.add(db_user)
+            try:
+                await session.flush()
+            except IntegrityError:
+                # Параллельный запрос уже создал пользователя (и начислил бонус рефереру)
+                await session.rollback()
+                return await _get_user(session, tg_user.id)
+
+            if referred_by:
+                # Бонус за друга - атомарный инкремент, без чтения реферера
+                await session.execute(
+                    update(User)
+                    .where(User.telegram_id == referred_by)
+                    .values(
+                        referral_count=User.referral_count + 1,
+                        bonus_questions=User.bonus_questions + REFERRAL_BONUS,
+                    )
                 )
-                session.add(db_user)
-                if referred_by:
-                    referrer = session.query(User).filter(User.telegram_id == referred_by).first()
-                    if referrer:
-                        referrer.referral_count += 1
-                        referrer.bonus_questions += 3 # Бонус за друга
-                session.commit()
-                session.refresh(db_user)
+            await session.commit()
+            user_cache.invalidate(referred_by)
             return db_user
-        finally:
-            session.close()
 
     @staticmethod
-    def check_and_update_limits(telegram_id, free_limit=2):
-        session = SessionLocal()
-        try:
-            user = session.query(User).filter(User.telegram_id == telegram_id).first()
-            if not user:
-                return False, "Пользователь не найден"
-
-            # Сброс счетчика, если наступил новый день
-            today = date.today()
-            if user.last_question_date.date() < today:
-                user.questions_today = 0
-                user.last_question_date = datetime.utcnow()
-
-            if user.is_premium:
-                # У премиум пользователей нет лимитов или они другие
-                user.questions_today += 1
-                user.total_questions_asked += 1
-                session.commit()
-                return True, user.questions_today
-
-            if user.questions_today >= free_limit:
-                # Проверяем бонусные вопросы
-                if user.bonus_questions > 0:
-                    user.bonus_questions -= 1
-                    user.total_questions_asked += 1
-                    user.last_question_date = datetime.utcnow()
-                    session.commit()
-                    return True, f"bonus_{user.bonus_questions}"
-                
-                return False, "Лимит бесплатных вопросов на сегодня исчерпан. Позови друга или подожди до завтра."
-
-            user.questions_today += 1
-            user.total_questions_asked += 1
-            user.last_question_date = datetime.utcnow()
-            session.commit()
-            return True, user.questions_today
-        finally:
-            session.close()
+    async def get_profile(tg_user, referred_by=None) -> UserSnapshot:
+        """Профиль пользователя для чтения: из кэша, при промахе - из БД (с созданием)"""
+        snapshot = user_cache.get(tg_user.id)
+        if snapshot is None:
+            # Запись, завершившаяся во время чтения, сбросит поколение - устаревший снимок не сохранится
+            generation = user_cache.generation(tg_user.id)
+            db_user = await UserManager.get_or_create_user(tg_user, referred_by=referred_by)
+            snapshot = UserSnapshot.from_user(db_user)
+            user_cache.put(snapshot, generation)
+        return snapshot
 
     @staticmethod
-    def check_tarot_limit(telegram_id, free_limit=1):
-        session = SessionLocal()
-        try:
-            user = session.query(User).filter(User.telegram_id == telegram_id).first()
-            if not user:
+    async def check_and_update_limits(telegram_id, free_limit=2):
+        async with AsyncSessionLocal() as session:
+            admission = await _consume_question(session, telegram_id, free_limit)
+            if admission is None:
                 return False, "Пользователь не найден"
+            if not admission.allowed:
+                return False, admission.message
+
+            await session.commit()
+            user_cache.invalidate(telegram_id)
+            if admission.used_bonus:
+                return True, f"bonus_{admission.bonus_left}"
+            return True, admission.questions_today
 
-            today = date.today()
-            if not user.last_tarot_date or user.last_tarot_date.date() < today:
-                user.tarot_today = 0
-                user.last_tarot_date = datetime.utcnow()
+    @staticmethod
+    async def admit_question(tg_user, free_limit=2) -> QuestionAdmission:
+        """
+        Допуск вопроса одной транзакцией: найти или создать пользователя,
+        сбросить дневной счетчик, проверить лимит, списать бонус
+        """
+        async with AsyncSessionLocal() as session:
+            admission = await _consume_question(session, tg_user.id, free_limit)
+            if admission is None:
+                # Новый пользователь: первый вопрос дня уже засчитан при создании
+                session.add(_new_user(tg_user, questions_today=1, total_questions_asked=1))
+                try:
+                    await session.commit()
+                    user_cache.invalidate(tg_user.id)
+                    return QuestionAdmission(True, questions_today=1)
+                except IntegrityError:
+                    await session.rollback()
+                    admission = await _consume_question(session, tg_user.id, free_limit)
 
-            if user.is_premium:
-                user.tarot_today += 1
-                session.commit()
-                return True, user.tarot_today
+            if admission.allowed:
+                await session.commit()
+                user_cache.invalidate(tg_user.id)
+            return admission
 
-            if user.tarot_today >= free_limit:
-                return False, "Твое видение на сегодня исчерпано. Возвращайся завтра или получи Premium для безлимитных раскладов."
+    @staticmethod
+    async def record_answer(telegram_id, question_text, response_data) -> bool:
+        """
+        Сохранить вопрос и ответ одним INSERT ... SELECT (id пользователя - из users).
+        Пользователя нет (допуск не сработал и вопрос пропущен без записи) - ничего не пишется, False.
+        """
+        values = {
+            'question': question_text,
+            'interpretation': response_data.get('interpretation'),
+            'iching_hexagram_primary': _field(response_data.get('iching', {}).get('primary'), 'number'),
+            'iching_hexagram_secondary': _field(response_data.get('iching', {}).get('secondary'), 'number'),
+            'tarot_card': _field(response_data.get('tarot', {}).get('card'), 'name'),
+            'created_at': datetime.utcnow(),
+        }
+        columns = [QuestionSession.__table__.c[name] for name in values]
+        rows = select(
+            User.id,
+            *(literal(value, column.type) for value, column in zip(values.values(), columns))
+        ).where(User.telegram_id == telegram_id)
 
-            user.tarot_today += 1
-            user.last_tarot_date = datetime.utcnow()
-            session.commit()
-            return True, user.tarot_today
-        finally:
-            session.close()
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                insert(QuestionSession).from_select(['user_id', *values], rows)
+            )
+            await session.commit()
+            return result.rowcount > 0
 
     @staticmethod
-    def check_dream_detailed_limit(telegram_id):
-        session = SessionLocal()
-        try:
-            user = session.query(User).filter(User.telegram_id == telegram_id).first()
-            if not user:
+    async def check_tarot_limit(telegram_id, free_limit=1):
+        async with AsyncSessionLocal() as session:
+            new_day = or_(User.last_tarot_date == None, User.last_tarot_date < _day_start())
+            result = await session.execute(
+                update(User)
+                .where(User.telegram_id == telegram_id)
+                .where(or_(User.is_premium == True, new_day, User.tarot_today < free_limit))
+                .values(
+                    tarot_today=case((new_day, 1), else_=User.tarot_today + 1),
+                    last_tarot_date=datetime.utcnow(),
+                )
+                .returning(User.tarot_today)
+            )
+            tarot_today = result.scalar()
+            if tarot_today is not None:
+                await session.commit()
+                user_cache.invalidate(telegram_id)
+                return True, tarot_today
+
+            exists = await session.scalar(select(User.id).where(User.telegram_id == telegram_id))
+            if exists is None:
                 return False, "Пользователь не найден"
+            return False, TAROT_LIMIT_TEXT
+
+    @staticmethod
+    async def check_dream_detailed_limit(telegram_id):
+        async with AsyncSessionLocal() as session:
+            now = datetime.utcnow()
+            # Не премиум и прошла неделя (или еще не было) - отмечаем расчет одним UPDATE
+            result = await session.execute(
+                update(User)
+                .where(User.telegram_id == telegram_id, User.is_premium != True)
+                .where(or_(User.last_dream_detailed_date == None,
+                           User.last_dream_detailed_date <= now - DREAM_DETAILED_PERIOD))
+                .values(last_dream_detailed_date=now)
+                .returning(User.id)
+            )
+            if result.first():
+                await session.commit()
+                user_cache.invalidate(telegram_id)
+                return True, "Success"
 
-            if user.is_premium:
+            row = (await session.execute(
+                select(User.is_premium, User.last_dream_detailed_date).where(User.telegram_id == telegram_id)
+            )).first()
+            if not row:
+                return False, "Пользователь не найден"
+            if row.is_premium:
                 return True, "Premium access"
 
-            if user.last_dream_detailed_date:
-                from datetime import timedelta
-                if datetime.utcnow() - user.last_dream_detailed_date < timedelta(days=7):
-                    # Еще не прошла неделя
-                    next_date = user.last_dream_detailed_date + timedelta(days=7)
-                    wait_days = (next_date - datetime.utcnow()).days + 1
-                    return False, f"Подробная трактовка доступна 1 раз в неделю. Приходи через {wait_days} дн. или получи Premium для безлимита."
-
-            # Можно делать расчет
-            user.last_dream_detailed_date = datetime.utcnow()
-            session.commit()
-            return True, "Success"
-        finally:
-            session.close()
+            # Еще не прошла неделя
+            next_date = row.last_dream_detailed_date + DREAM_DETAILED_PERIOD
+            wait_days = (next_date - now).days + 1
+            return False, f"Подробная трактовка доступна 1 раз в неделю. Приходи через {wait_days} дн. или получи Premium для безлимита."
 
     @staticmethod
-    def save_question(telegram_id, question_text, response_data):
-        session = SessionLocal()
-        try:
-            user = session.query(User).filter(User.telegram_id == telegram_id).first()
-            if not user:
-                return
-            
-            new_session = QuestionSession(
-                user_id=user.id,
-                question=question_text,
-                interpretation=response_data.get('interpretation'),
-                iching_hexagram_primary=response_data.get('iching', {}).get('primary', {}).get('number'),
-                tarot_card=response_data.get('tarot', {}).get('card', {}).get('name')
+    async def save_question(telegram_id, question_text, response_data):
+        await UserManager.record_answer(telegram_id, question_text, response_data)
+
+    @staticmethod
+    async def update_premium_status(telegram_id, days=30):
+        async with AsyncSessionLocal() as session:
+            # Устанавливаем дату окончания
+            await session.execute(
+                update(User)
+                .where(User.telegram_id == telegram_id)
+                .values(is_premium=True, premium_until=datetime.utcnow() + timedelta(days=days))
             )
-            session.add(new_session)
-            session.commit()
-        finally:
-            session.close()
+            await session.commit()
+        user_cache.invalidate(telegram_id)
 
     @staticmethod
-    def update_premium_status(telegram_id, days=30):
-        session = SessionLocal()
-        try:
-            user = session.query(User).filter(User.telegram_id == telegram_id).first()
-            if user:
-                user.is_premium = True
-                # Устанавливаем дату окончания
-                from datetime import timedelta
-                user.premium_until = datetime.utcnow() + timedelta(days=days)
-                session.commit()
-        finally:
-            session.close()
+    async def toggle_daily(telegram_id) -> Optional[bool]:
+        """Переключить ежедневную рассылку. Возвращает новое состояние (None - пользователя нет)"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(User)
+                .where(User.telegram_id == telegram_id)
+                .values(daily_prediction_enabled=~User.daily_prediction_enabled)
+                .returning(User.daily_prediction_enabled)
+            )
+            enabled = result.scalar()
+            await session.commit()
+        user_cache.invalidate(telegram_id)
+        return enabled
+
+    @staticmethod
+    async def get_daily_subscribers() -> List[int]:
+        """Telegram ID пользователей с включенной рассылкой"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(User.telegram_id).where(User.daily_prediction_enabled == True, User.undeliverable_at == None)
+            )
+            return list(result.scalars())
+
+    @staticmethod
+    async def mark_deliverable(telegram_id):
+        """Пользователь снова написал боту - рассылки ему снова доходят"""
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(User)
+                .where(User.telegram_id == telegram_id, User.undeliverable_at != None)
+                .values(undeliverable_at=None)
+            )
+            await session.commit()
 
     @staticmethod
-    def save_user_data(telegram_id, birth_date=None, birth_time=None, birth_location=None, zodiac_sign=None):
-        session = SessionLocal()
-        try:
-            user = session.query(User).filter(User.telegram_id == telegram_id).first()
+    async def save_user_data(telegram_id, birth_date=None, birth_time=None, birth_location=None, zodiac_sign=None):
+        async with AsyncSessionLocal() as session:
+            user = await _get_user(session, telegram_id)
             if not user:
                 return
-            
-            data = session.query(UserData).filter(UserData.user_id == user.id).first()
+
+            result = await session.execute(select(UserData).where(UserData.user_id == user.id))
+            data = result.scalars().first()
             if not data:
                 data = UserData(user_id=user.id)
                 session.add(data)
-            
+
             if birth_date:
                 data.birth_date = birth_date
             if birth_time:
@@ -179,22 +354,29 @@ class UserManager:
                 data.birth_location = birth_location
             if zodiac_sign:
                 data.zodiac_sign = zodiac_sign
-                
-            session.commit()
-        finally:
-            session.close()
+
+            await session.commit()
 
     @staticmethod
-    def get_user_data(telegram_id):
-        session = SessionLocal()
-        try:
-            user = session.query(User).filter(User.telegram_id == telegram_id).first()
+    async def get_user_data(telegram_id):
+        async with AsyncSessionLocal() as session:
+            user = await _get_user(session, telegram_id)
             if not user:
                 return None
-            
-            data = session.query(UserData).filter(UserData.user_id == user.id).first()
-            return data
-        finally:
-            session.close()
+
+            result = await session.execute(select(UserData).where(UserData.user_id == user.id))
+            return result.scalars().first()
+
+    @staticmethod
+    async def get_referral_birth_dates(telegram_id) -> List[Tuple[int, datetime]]:
+        """Приглашенные пользователем друзья с известной датой рождения: [(telegram_id, birth_date)]"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(User.telegram_id, UserData.birth_date)
+                .join(UserData, UserData.user_id == User.id)
+                .where(User.referred_by == telegram_id, UserData.birth_date != None)
+                .order_by(User.id)
+            )
+            return [(tg_id, birth_date) for tg_id, birth_date in result.all()]
 
 user_manager = UserManager()
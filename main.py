@@ -1,8 +1,9 @@
 """
 Главный файл Telegram бота Оракула
 """
-import asyncio
-from datetime import datetime, time as dt_time
+import time
+from contextlib import aclosing
+from datetime import time as dt_time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, LabeledPrice, PreCheckoutQuery
 from telegram.ext import (
     Application,
@@ -19,11 +20,18 @@ import os
 import tempfile
 
 from config.settings import settings
-from oracle.interpreter import oracle_interpreter
-from database.models import User, QuestionSession
-from database.database import SessionLocal, init_db
+from oracle.interpreter import INTERPRETATION_ERROR_TEXT, oracle_interpreter
+from oracle.daily_guidance import daily_guidance
+from oracle.llm_scheduler import llm_scheduler
+from oracle.metrics import metrics
+from oracle.http_client import http_client
+from oracle.executors import executors
+from database.models import QuestionSession
+from database.database import init_db, close_db
 from database.user_manager import user_manager
 from utils import fix_markdown
+from bot.streaming import StreamingMessage
+from bot.mailing import daily_mailer, sign_of
 from oracle.horoscope.horoscope_parser import horoscope_parser
 from oracle.horoscope.moon_parser import moon_parser
 
@@ -40,67 +48,98 @@ from bot.extended_handlers import (
     process_dream_detailed
 )
 from oracle.voice_handler import voice_handler
+from oracle.horary.horary import horary
 from oracle.compatibility.compatibility import compatibility
 
-# Настройка логгирования
-logger.remove()
-logger.add(sys.stderr, level=settings.log_level)
-logger.add("logs/bot.log", rotation="1 day", retention="7 days", level="INFO")
+
+def setup_logging():
+    """
+    Настройка логгирования. Вызывается только из main(): воркеры пула процессов (spawn)
+    импортируют этот модуль заново и не должны ротировать и удалять общий logs/bot.log.
+    """
+    logger.remove()
+    logger.add(sys.stderr, level=settings.log_level)
+    logger.add("logs/bot.log", rotation="1 day", retention="7 days", level="INFO")
 
 
 class OracleBot:
     """Telegram бот Оракула"""
     
     def __init__(self):
-        self.app = Application.builder().token(settings.telegram_bot_token).build()
+        self.app = (
+            Application.builder()
+            .token(settings.telegram_bot_token)
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
         self._setup_handlers()
         self._setup_jobs()
     
+    async def _post_init(self, application: Application):
+        """Запуск общих ресурсов вместе с приложением"""
+        await http_client.start()
+        await executors.start()
+
+    async def _post_shutdown(self, application: Application):
+        """Освобождение общих ресурсов при остановке приложения"""
+        await http_client.close()
+        await executors.close()
+        await close_db()
+
     def _setup_jobs(self):
         """Настройка периодических задач"""
         if self.app.job_queue:
+            # Послание дня готовим заранее, чтобы рассылка и кнопка меню брали готовый текст
+            self.app.job_queue.run_daily(self.daily_guidance_job, time=dt_time(hour=5, minute=30))
+            self.app.job_queue.run_once(self.daily_guidance_job, when=5)
+            
+            # Хорарная карта следующей минуты считается заранее (вопросы не ждут swisseph)
+            self.app.job_queue.run_repeating(self.horary_precompute_job, interval=30, first=1)
+            
             # Каждый день в 6:00 утра (UTC)
             self.app.job_queue.run_daily(self.daily_mailing_job, time=dt_time(hour=6, minute=0))
+            # Если бот перезапустился посреди рассылки - дослать остальным
+            self.app.job_queue.run_once(self.resume_mailing_job, when=30)
             logger.info("Daily mailing job scheduled at 06:00 UTC")
 
+    async def daily_guidance_job(self, context: ContextTypes.DEFAULT_TYPE):
+        """Задача подготовки послания дня (генерируется один раз, дальше читается из памяти/БД)"""
+        await daily_guidance.precompute()
+
+    async def horary_precompute_job(self, context: ContextTypes.DEFAULT_TYPE):
+        """Задача предрасчета хорарной карты на следующую минуту"""
+        try:
+            await horary.precompute_async()
+        except Exception as e:
+            logger.warning(f"Horary precompute failed: {e}")
+
     async def daily_mailing_job(self, context: ContextTypes.DEFAULT_TYPE):
-        """Задача ежедневной рассылки прогнозов"""
+        """Задача ежедневной рассылки прогнозов (послание по знаку зодиака подписчика)"""
         logger.info("Starting daily mailing job...")
-        session = SessionLocal()
         try:
-            # Находим всех активных пользователей с включенной рассылкой
-            users = session.query(User).filter(User.daily_prediction_enabled == True).all()
-            
-            # Генерируем общее послание дня (чтобы не дергать AI для каждого)
-            guidance = await oracle_interpreter.get_daily_guidance()
-            formatted_guidance = fix_markdown(guidance)
-            
-            # Кнопки для рассылки
-            keyboard = [
-                [InlineKeyboardButton("🔮 Задать вопрос", callback_data="ask")],
-                [InlineKeyboardButton("✨ Другие возможности", callback_data="menu")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            count = 0
-            for db_user in users:
-                try:
-                    text = f"📜 *Свиток Дня от Источника*\n\n{formatted_guidance}\n\n✨ Слушай шепот судьбы и делай свой выбор.\n\n🔮 *Если туман сгустился, задай свой вопрос...*"
-                    await context.bot.send_message(
-                        chat_id=db_user.telegram_id,
-                        text=text,
-                        parse_mode='Markdown',
-                        reply_markup=reply_markup
-                    )
-                    count += 1
-                    # Небольшая задержка чтобы не спамить API Telegram
-                    await asyncio.sleep(0.05)
-                except Exception as e:
-                    logger.warning(f"Could not send daily message to {db_user.telegram_id}: {e}")
-            
-            logger.info(f"Daily mailing completed. Sent to {count} users.")
-        finally:
-            session.close()
+            report = await daily_mailer.run(context.bot)
+            self._log_mailing(report)
+        except Exception as e:
+            logger.error(f"Daily mailing failed: {e}")
+
+    async def resume_mailing_job(self, context: ContextTypes.DEFAULT_TYPE):
+        """Продолжить рассылку, прерванную перезапуском бота"""
+        try:
+            report = await daily_mailer.resume(context.bot)
+            if report:
+                self._log_mailing(report)
+        except Exception as e:
+            logger.error(f"Daily mailing resume failed: {e}")
+
+    @staticmethod
+    def _log_mailing(report):
+        logger.info(
+            f"Daily mailing {'resumed and ' if report.resumed else ''}completed. "
+            f"Sent to {report.sent}/{report.recipients} users in {report.elapsed:.1f}s "
+            f"({report.rate:.1f} msg/s), failed: {report.failed}, "
+            f"undeliverable: {report.undeliverable}, throttled: {report.throttled}"
+        )
 
     def _setup_handlers(self):
         """Настроить обработчики команд и сообщений"""
@@ -112,6 +151,7 @@ class OracleBot:
         self.app.add_handler(CommandHandler("debug_info", self.debug_info_command))
         self.app.add_handler(CommandHandler("test_ai", self.test_ai_command))
         self.app.add_handler(CommandHandler("force_question", self.force_question_command))
+        self.app.add_handler(CommandHandler("latency", self.latency_command))
         
         # Новые команды удалены для отката версии
         
@@ -142,17 +182,28 @@ class OracleBot:
             censored_groq = f"{groq_key[:4]}...{groq_key[-4:]}" if groq_key else "None"
             censored_openai = f"{openai_key[:4]}...{openai_key[-4:]}" if openai_key else "None"
             
-            is_groq = getattr(interp, 'is_groq', False)
+            lines = []
+            queue = interp.llm.snapshot()
+            wait_p95 = f"{queue['wait_p95']:.1f}s" if queue['wait_p95'] is not None else "-"
+            for row in interp.llm.router.snapshot():
+                p50 = f"{row['p50']:.2f}s" if row['p50'] is not None else "-"
+                p95 = f"{row['p95']:.2f}s" if row['p95'] is not None else "-"
+                cooldown = f", пауза {row['cooldown']:.0f}s" if row['cooldown'] else ""
+                lines.append(
+                    f"• `{row['name']} ({row['model']})`: p50 {p50}, p95 {p95}, "
+                    f"ошибки {row['error_rate']:.0%} из {row['samples']}{cooldown}"
+                )
             
             msg = (
                 f"🐞 *DEBUG INFO*\n"
                 f"Config Provider: `{settings.ai_provider}`\n"
-                f"Active Provider: `{interp.ai_provider}`\n"
-                f"Is Groq Mode: `{is_groq}`\n"
-                f"Model: `{interp.model}`\n"
+                f"Active Provider: `{interp.llm.primary.name}`\n"
                 f"Groq Key: `{censored_groq}`\n"
                 f"OpenAI Key: `{censored_openai}`\n"
-                f"Base URL: `{interp.client.base_url}`"
+                f"Hedges: `{interp.llm.router.hedges_won}/{interp.llm.router.hedges_fired}`\n"
+                f"Queue: `{queue['active']}/{queue['max_concurrency']} active, {queue['queue_depth']} waiting "
+                f"({queue['premium_waiting']} premium), wait p95 {wait_p95}`\n"
+                f"Providers:\n" + "\n".join(lines)
             )
             await update.message.reply_text(msg, parse_mode='Markdown')
         except Exception as e:
@@ -162,24 +213,10 @@ class OracleBot:
         """DEBUG: Test AI generation directly"""
         try:
             interp = oracle_interpreter
-            await update.message.reply_text(f"🧪 Testing AI...\nProvider: {interp.ai_provider}\nModel: {interp.model}")
+            primary = interp.llm.primary
+            await update.message.reply_text(f"🧪 Testing AI...\nProvider: {primary.name}\nModel: {primary.model}")
             
-            if interp.ai_provider == "openai":
-                response = interp.client.chat.completions.create(
-                    model=interp.model,
-                    messages=[{"role": "user", "content": "Just say 'Works!'"}],
-                    max_tokens=10
-                )
-                result = response.choices[0].message.content
-            elif interp.ai_provider == "anthropic":
-                response = interp.client.messages.create(
-                    model=interp.model,
-                    max_tokens=10,
-                    messages=[{"role": "user", "content": "Just say 'Works!'"}]
-                )
-                result = response.content[0].text
-            else:
-                 result = "Unknown provider"
+            result = await interp.llm.complete("", "Just say 'Works!'", max_tokens=10)
                  
             await update.message.reply_text(f"✅ SUCCESS: {result}")
         except Exception as e:
@@ -190,6 +227,21 @@ class OracleBot:
             if len(tb) < 3000:
                 await update.message.reply_text(f"Traceback:\n`{tb}`", parse_mode='Markdown')
 
+    async def latency_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """ADMIN: Гистограммы задержек этапов обработки вопроса"""
+        # Пока ADMIN_IDS не задан, команда открыта, как и остальные отладочные
+        if settings.admin_ids and update.effective_user.id not in settings.admin_ids:
+            return
+        
+        if not metrics.histograms:
+            await update.message.reply_text("⏱ Замеров пока нет - ни один вопрос еще не обработан.")
+            return
+        
+        await update.message.reply_text(
+            f"⏱ *Задержки этапов*\n```\n{metrics.format_report()}\n```",
+            parse_mode='Markdown'
+        )
+
     async def force_question_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """DEBUG: Force oracle question with full error exposure"""
         try:
@@ -254,7 +306,9 @@ class OracleBot:
         if context.args and context.args[0].isdigit():
             referred_by = int(context.args[0])
             
-        user_manager.get_or_create_user(user, referred_by=referred_by)
+        await user_manager.get_profile(user, referred_by=referred_by)
+        # Если бот был заблокирован, а теперь перезапущен - возвращаем в рассылку
+        await user_manager.mark_deliverable(user.id)
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /help"""
@@ -290,7 +344,7 @@ class OracleBot:
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /stats - статистика пользователя"""
         user = update.effective_user
-        db_user = user_manager.get_or_create_user(user)
+        db_user = await user_manager.get_profile(user)
         
         status = "💎 PREMIUM" if db_user.is_premium else "🆓 BASIC"
         energy_emoji = "⚡" if db_user.questions_today < settings.free_questions_per_day else "🪫"
@@ -405,29 +459,24 @@ class OracleBot:
             return
             
         user = update.effective_user
+        is_premium = False
         
-        # Гарантируем, что пользователь существует в БД перед проверкой лимитов
-        try:
-            user_manager.get_or_create_user(user)
-        except Exception as e:
-            logger.error(f"Failed to create user in DB: {e}")
-            
-        # Проверка лимитов с обработкой ошибок
+        # Пользователь, дневной сброс, лимит и бонус - одной транзакцией
         try:
-            allowed, result = user_manager.check_and_update_limits(user.id, free_limit=settings.free_questions_per_day)
+            admission = await user_manager.admit_question(user, free_limit=settings.free_questions_per_day)
             
-            if not allowed:
+            if not admission.allowed:
                 keyboard = [[InlineKeyboardButton("💎 Купить Энергию", callback_data="premium")]]
                 await update.message.reply_text(
-                    f"🪫 *Энергия исчерпана*\n\n{result}\nПриходи завтра или получи безлимитный доступ.",
+                    f"🪫 *Энергия исчерпана*\n\n{admission.message}\nПриходи завтра или получи безлимитный доступ.",
                     reply_markup=InlineKeyboardMarkup(keyboard),
                     parse_mode='Markdown'
                 )
                 return
 
-            if isinstance(result, str) and result.startswith("bonus_"):
-                bonus_left = result.split("_")[1]
-                await update.message.reply_text(f"✨ Использовано бонусное озарение! (Осталось: {bonus_left})")
+            is_premium = admission.is_premium
+            if admission.used_bonus:
+                await update.message.reply_text(f"✨ Использовано бонусное озарение! (Осталось: {admission.bonus_left})")
         except Exception as e:
             logger.error(f"Error checking limits: {e}")
             # В случае ошибки лимитов - пускаем (fail open) или блокируем? Лучше пустить, чтобы не блокировать юзера из-за бага
@@ -439,25 +488,62 @@ class OracleBot:
             "Ожидай ответа. 🌌"
         )
         
+        started = time.perf_counter()
         try:
-            db_user = user_manager.get_or_create_user(user)
-            logger.info(f"Processing question for user {user.id}: {question[:50]}...")
-            
-            oracle_response = await oracle_interpreter.process_question(question, user.first_name, is_premium=db_user.is_premium)
-            
-            if not oracle_response:
-                raise ValueError("Oracle returned empty response")
-            
-            context.user_data['last_question'] = question
-            context.user_data['last_oracle_response'] = oracle_response
+            # Если Источник сейчас занят - честно показываем место в очереди
+            position = llm_scheduler.position(premium=is_premium)
+            if position:
+                wait = llm_scheduler.estimated_wait(position)
+                await processing_msg.edit_text(
+                    "🙏 Обращаюсь к Источнику с твоим вопросом...\n"
+                    "Ожидай ответа. 🌌\n\n"
+                    f"🕯 Перед тобой в очереди: {position} (≈{max(1, round(wait))} сек)"
+                )
             
-            response_text = fix_markdown(oracle_response['interpretation'])
+            logger.info(f"Processing question for user {user.id}: {question[:50]}...")
             
-            await processing_msg.delete()
-            await update.message.reply_text(response_text, parse_mode='Markdown')
+            if settings.stream_responses:
+                # Потоковый режим: текст появляется в сообщении "Обращаюсь к Источнику" по мере генерации
+                oracle_response = await oracle_interpreter.cast_divination(question)
+                streaming_msg = StreamingMessage(processing_msg, min_interval=settings.stream_edit_interval)
+                # aclosing: если отправка упала, генератор закрывается сразу и освобождает слот очереди LLM
+                async with aclosing(oracle_interpreter.stream_interpretation(
+                    question, oracle_response['divination_data'], user.first_name, is_premium=is_premium
+                )) as chunks:
+                    async for chunk in chunks:
+                        await streaming_msg.append(chunk)
+                # Страховка: пустой текст Telegram отклонит, и пользователь увидит общую ошибку
+                if not streaming_msg.text.strip():
+                    streaming_msg.text = INTERPRETATION_ERROR_TEXT
+                oracle_response['interpretation'] = streaming_msg.text
+                
+                context.user_data['last_question'] = question
+                context.user_data['last_oracle_response'] = oracle_response
+                
+                with metrics.span("telegram_send"):
+                    await streaming_msg.finish(fix_markdown(streaming_msg.text), parse_mode='Markdown')
+            else:
+                oracle_response = await oracle_interpreter.process_question(question, user.first_name, is_premium=is_premium)
+                
+                if not oracle_response:
+                    raise ValueError("Oracle returned empty response")
+                
+                context.user_data['last_question'] = question
+                context.user_data['last_oracle_response'] = oracle_response
+                
+                response_text = fix_markdown(oracle_response['interpretation'])
+                
+                with metrics.span("telegram_send"):
+                    await processing_msg.delete()
+                    await update.message.reply_text(response_text, parse_mode='Markdown')
             
-            # Сохраняем в историю
-            user_manager.save_question(user.id, question, oracle_response)
+            # Сохраняем в историю (ответ уже отправлен - ошибка записи не должна превращаться в ответ-ошибку)
+            try:
+                with metrics.span("db_save"):
+                    await user_manager.record_answer(user.id, question, oracle_response)
+            except Exception as e:
+                logger.error(f"Could not save question history for {user.id}: {e}")
+            metrics.observe("question_total", time.perf_counter() - started)
             
             # Сбрасываем счетчик уточнений
             context.user_data['followup_count'] = 0
@@ -513,8 +599,20 @@ class OracleBot:
         """Команда /natal - натальная карта"""
         self._reset_state(context)
         message = update.message if update.message else update.callback_query.message
-        if 'user_info' in context.user_data and 'date_str' in context.user_data['user_info']:
-            saved_date = context.user_data['user_info'].get('date_str')
+        user_info = context.user_data.get('user_info', {})
+        if 'date_str' not in user_info:
+            # После перезапуска контекст пуст - данные рождения берем из БД (город переводится в UT справочником)
+            db_data = await user_manager.get_user_data(update.effective_user.id)
+            if db_data and db_data.birth_date and db_data.birth_location:
+                user_info.update(
+                    birth_date=db_data.birth_date,
+                    date_str=db_data.birth_date.strftime('%d.%m.%Y'),
+                    time_str=db_data.birth_time or '12:00',
+                    location=db_data.birth_location,
+                )
+                context.user_data['user_info'] = user_info
+        if 'date_str' in user_info:
+            saved_date = user_info.get('date_str')
             keyboard = [
                 [InlineKeyboardButton(f"Использовать {saved_date}", callback_data="use_saved_natal")],
                 [InlineKeyboardButton("Ввести новые данные", callback_data="new_natal")],
@@ -652,7 +750,7 @@ class OracleBot:
         # Попытка получить данные из БД, если в контексте пусто
         user_info = context.user_data.get('user_info', {})
         if not user_info or 'birth_date' not in user_info:
-            db_data = user_manager.get_user_data(update.effective_user.id)
+            db_data = await user_manager.get_user_data(update.effective_user.id)
             if db_data and db_data.birth_date:
                 user_info['birth_date'] = db_data.birth_date
                 context.user_data['user_info'] = user_info
@@ -843,7 +941,7 @@ class OracleBot:
         if query.data.startswith("sphere_"):
             sphere = query.data.split("_")[1]
             user = update.effective_user
-            db_user = user_manager.get_or_create_user(user)
+            db_user = await user_manager.get_profile(user)
             
             # Проверка на премиум для определенных сфер
             premium_spheres = ["love", "money", "purpose"]
@@ -873,11 +971,9 @@ class OracleBot:
             
             await query.message.reply_text("🔮 Обращаюсь к Источнику за подробностями...")
             
-            # Получаем интерпретацию
-            # Для простоты передаем строковое представление данных
-            data_str = str(calc_data)
+            # Получаем интерпретацию (одинаковые расчеты обслуживаются из кэша)
             interpretation = await oracle_interpreter.get_sphere_interpretation(
-                sphere, calc_type, data_str, user.first_name, db_user.is_premium
+                sphere, calc_type, calc_data, user.first_name, db_user.is_premium
             )
             
             # Кнопки для выбора периода
@@ -902,7 +998,7 @@ class OracleBot:
              sphere = parts[3] # health/career/etc
              
              user = update.effective_user
-             db_user = user_manager.get_or_create_user(user)
+             db_user = await user_manager.get_profile(user)
              
              calc_type = context.user_data.get('last_calc_type')
              calc_data = context.user_data.get('last_calc_data')
@@ -913,17 +1009,11 @@ class OracleBot:
                  
              await query.message.reply_text(f"⏳ Источник готовит прогноз на {period}...")
              
-             # Вызываем AI для прогноза на период
-             # Мы можем повторно использовать get_sphere_interpretation с небольшим дополнением в промпте
-             # Или добавить новый метод. Для скорости добавим здесь.
-             
+             # Прогноз на период - тот же разбор сферы с указанием периода (и тот же кэш)
              period_ru = "неделю" if period == "week" else "месяц"
              
-             prompt_addon = f"\n\nВАЖНО: Дай рекомендации именно на предстоящий {period_ru}."
-             
-             data_str = str(calc_data)
              interpretation = await oracle_interpreter.get_sphere_interpretation(
-                 sphere + prompt_addon, calc_type, data_str, user.first_name, db_user.is_premium
+                 sphere, calc_type, calc_data, user.first_name, db_user.is_premium, period=period
              )
              
              await query.message.reply_text(
@@ -984,19 +1074,10 @@ class OracleBot:
         if query.data == "daily_message":
             await query.message.reply_text("🙏 Слушаю шепот дня...")
             
-            # Проверка кэша (Карта дня одна на весь день)
-            today_str = datetime.now().strftime("%Y-%m-%d")
-            saved_date = context.user_data.get('daily_message_date')
-            saved_message = context.user_data.get('daily_message_text')
-            
-            if saved_date == today_str and saved_message:
-                message = fix_markdown(saved_message)
-                # Небольшая задержка для имитации "вспоминания", но не обращения
-            else:
-                message = fix_markdown(await oracle_interpreter.get_daily_guidance())
-                # Сохраняем
-                context.user_data['daily_message_date'] = today_str
-                context.user_data['daily_message_text'] = message
+            # То же послание, что пришло в рассылке: по знаку зодиака или общее
+            db_data = await user_manager.get_user_data(update.effective_user.id)
+            sign = sign_of(db_data.birth_date if db_data else None)
+            message = fix_markdown(await daily_guidance.get(sign))
             
             # Сохраняем "фейковый" контекст для кнопки "Подробнее"
             context.user_data['last_question'] = "Каков совет на сегодня? (Послание дня)"
@@ -1082,7 +1163,7 @@ class OracleBot:
              user_sign_ru = None
              
              if not user_info or 'birth_date' not in user_info:
-                 db_data = user_manager.get_user_data(update.effective_user.id)
+                 db_data = await user_manager.get_user_data(update.effective_user.id)
                  if db_data and db_data.birth_date:
                      user_info['birth_date'] = db_data.birth_date
                      context.user_data['user_info'] = user_info
@@ -1182,20 +1263,12 @@ class OracleBot:
             return
 
         elif query.data == "toggle_daily":
-            from database.database import SessionLocal
-            from database.models import User
-            session = SessionLocal()
-            try:
-                db_user = session.query(User).filter(User.telegram_id == query.from_user.id).first()
-                if db_user:
-                    db_user.daily_prediction_enabled = not db_user.daily_prediction_enabled
-                    session.commit()
-                    status = "включена" if db_user.daily_prediction_enabled else "выключена"
-                    await query.answer(f"Рассылка {status}!", show_alert=True)
-                    # Обновляем сообщение статов
-                    await self.stats_command(update, context)
-            finally:
-                session.close()
+            enabled = await user_manager.toggle_daily(query.from_user.id)
+            if enabled is not None:
+                status = "включена" if enabled else "выключена"
+                await query.answer(f"Рассылка {status}!", show_alert=True)
+                # Обновляем сообщение статов
+                await self.stats_command(update, context)
             return
 
 
@@ -1252,7 +1325,7 @@ class OracleBot:
     async def successful_payment_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка успешного платежа"""
         user = update.effective_user
-        user_manager.update_premium_status(user.id)
+        await user_manager.update_premium_status(user.id)
         
         await update.message.reply_text(
             "🎉 *Поздравляем!*\n\nТеперь ты обладаешь неограниченным доступом к Источнику. "
@@ -1260,9 +1333,9 @@ class OracleBot:
             parse_mode='Markdown'
         )
 
-    def _save_user(self, user):
-        """Сохранить пользователя в БД"""
-        user_manager.get_or_create_user(user)
+    async def _save_user(self, user):
+        """Сохранить пользователя в БД (если он уже в кэше профилей - без запроса)"""
+        await user_manager.get_profile(user)
     
     def run(self):
         """Запустить бота"""
@@ -1273,11 +1346,13 @@ class OracleBot:
     async def set_premium_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда для админа: выдать премиум (для тестов)"""
         user = update.effective_user
-        user_manager.update_premium_status(user.id)
+        await user_manager.update_premium_status(user.id)
         await update.message.reply_text("💎 Тестовый Премиум активирован! Проверь /stats")
 
 def main():
     """Главная функция"""
+    setup_logging()
+    
     # Инициализация базы данных
     init_db()
     
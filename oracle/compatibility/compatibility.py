@@ -1,31 +1,151 @@
 
+from dataclasses import dataclass
 from datetime import datetime
-import random
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from oracle.compatibility.synastry import PLANET_NAMES_RU, Synastry, synastry_engine
+from oracle.matrix.destiny_matrix import matrix_of_destiny
+from oracle.matrix.matrix_table import date_parts
+from oracle.natal.chart_store import natal_chart_store
+from oracle.natal.natal_chart import NatalChart
+from oracle.numerology.sucai import reduce_to_single
+
+
+@dataclass
+class BulkCompatibility:
+    """Совместимость одной даты с N кандидатами: оценки массивами (N,) в порядке кандидатов"""
+    dates: np.ndarray  # datetime64[D]
+    total_score: np.ndarray
+    astro: np.ndarray
+    aspects: np.ndarray
+    elements: np.ndarray
+    sucai: np.ndarray
+    matrix: np.ndarray
+    biorhythm: np.ndarray
+
+    def __len__(self):
+        return len(self.total_score)
+
+    def top(self, k: int = 10) -> np.ndarray:
+        """Индексы k лучших кандидатов по убыванию total_score (при равенстве - в порядке списка)"""
+        n = len(self)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        # Уникальный ключ: оценка, при равенстве - меньший индекс выше
+        key = self.total_score.astype(np.int64) * n + (n - 1 - np.arange(n))
+        best = np.argpartition(-key, k - 1)[:k]
+        return best[np.argsort(-key[best])]
+
+    def details(self, i: int) -> dict:
+        return {
+            "astro": int(self.astro[i]),
+            "aspects": int(self.aspects[i]),
+            "elements": int(self.elements[i]),
+            "sucai": int(self.sucai[i]),
+            "matrix": int(self.matrix[i]),
+            "biorhythm": int(self.biorhythm[i]),
+        }
+
 
 class CompatibilityCalculator:
-    """Калькулятор совместимости (Сюцай + Матрица + Биоритмы)"""
+    """Калькулятор совместимости (Синастрия + Сюцай + Матрица + Биоритмы)"""
 
-    def calculate(self, date1: datetime, date2: datetime) -> dict:
+    def calculate(
+        self,
+        date1: datetime,
+        date2: datetime,
+        chart1: Optional[NatalChart] = None,
+        chart2: Optional[NatalChart] = None
+    ) -> dict:
         """
         Рассчитать совместимость двух дат
+        Если известны натальные карты (время и место рождения) - синастрия строится по ним
         """
+        if chart1 is None and chart2 is None:
+            synastry = synastry_engine.compare(date1, date2)
+        else:
+            synastry = synastry_engine.compare_charts(chart1 or date1, chart2 or date2)
+        score_astro = (synastry.aspect_score * 2 + synastry.element_score) // 3
         score_sucai = self._calc_sucai_compatibility(date1, date2)
         score_matrix = self._calc_matrix_compatibility(date1, date2)
-        score_biorhythm = self._calc_biorhythm(date1, date2)
+        score_biorhythm = synastry.biorhythm_score
         
         # Среднее взвешенное
-        total_score = int((score_sucai * 0.3) + (score_matrix * 0.3) + (score_biorhythm * 0.4))
+        total_score = int(
+            (score_astro * 0.4) + (score_sucai * 0.2) + (score_matrix * 0.2) + (score_biorhythm * 0.2)
+        )
         
         return {
             "total_score": total_score,
             "details": {
+                "astro": score_astro,
+                "aspects": synastry.aspect_score,
+                "elements": synastry.element_score,
                 "sucai": score_sucai,
                 "matrix": score_matrix,
-                "biorhythm": score_biorhythm
+                "biorhythm": score_biorhythm,
+                "biorhythm_cycles": synastry.biorhythm
             },
-            "text_report": self._generate_report(total_score)
+            "synastry": synastry,
+            "text_report": self._generate_report(total_score) + self._synastry_report(synastry)
         }
     
+    async def calculate_for_user(self, telegram_id: int, date1: datetime, date2: datetime) -> dict:
+        """
+        Совместимость, введенная пользователем: если одна из дат - его дата рождения и карта
+        известна (время и город сохранены), эта сторона считается по натальной карте из хранилища
+        """
+        chart = await natal_chart_store.for_user(telegram_id)
+        own = chart.birth_date.date() if chart is not None else None
+        return self.calculate(
+            date1,
+            date2,
+            chart1=chart if date1.date() == own else None,
+            chart2=chart if date2.date() == own and date1.date() != own else None,
+        )
+
+    def calculate_many(self, date: datetime, candidates: Sequence) -> BulkCompatibility:
+        """
+        Совместимость одной даты с N кандидатами за один векторный проход
+        (приглашенные друзья, загруженный список дат). Кандидаты - даты без времени:
+        datetime/date или массив datetime64[D]; карта кандидата строится на полдень UT.
+        """
+        dates = np.asarray(candidates, dtype='datetime64[D]').ravel()
+        synastry = synastry_engine.compare_many(date, dates)
+        day, _, _ = date_parts(dates)
+
+        astro = (synastry.aspect_score * 2 + synastry.element_score) // 3
+        sucai = self._sucai_many(date, day)
+        matrix = self._matrix_many(date, dates)
+        total = ((astro * 0.4) + (sucai * 0.2) + (matrix * 0.2) + (synastry.biorhythm_score * 0.2)).astype(np.int64)
+
+        return BulkCompatibility(
+            dates=dates,
+            total_score=total,
+            astro=astro,
+            aspects=synastry.aspect_score,
+            elements=synastry.element_score,
+            sucai=sucai,
+            matrix=matrix,
+            biorhythm=synastry.biorhythm_score,
+        )
+
+    def top_matches(self, date: datetime, candidates: Sequence, k: int = 10) -> List[dict]:
+        """k самых совместимых кандидатов: [{'index', 'birth_date', 'total_score', 'details'}]"""
+        result = self.calculate_many(date, candidates)
+        return [
+            {
+                "index": int(i),
+                "birth_date": result.dates[i].item(),
+                "total_score": int(result.total_score[i]),
+                "details": result.details(i),
+            }
+            for i in result.top(k).tolist()
+        ]
+
     def render_speedometer(self, percent: int) -> str:
         """Отрисовать спидометр прогресс-баром"""
         bar_length = 10
@@ -58,20 +178,54 @@ class CompatibilityCalculator:
         return 65 # Средне
 
     def _calc_matrix_compatibility(self, d1: datetime, d2: datetime) -> int:
-        """Совместимость по матрице (упрощенно)"""
-        # Обычно считают общие арканы.
-        # Для MVP сделаем заглушку на основе разницы дат (чем ближе или гармоничнее, тем лучше)
-        diff_days = abs((d1 - d2).days)
-        if diff_days < 365: return 95 # Ровесники
-        if diff_days % 365 < 30: return 80 # Близко по сезону
-        return 70
-
-    def _calc_biorhythm(self, d1: datetime, d2: datetime) -> int:
-        """Псевдо-расчет по биоритмам (симуляция)"""
-        # Используем хэш дат для детерминированного но "случайного" результата
-        seed = d1.toordinal() + d2.toordinal()
-        random.seed(seed)
-        return random.randint(50, 100)
+        """Совместимость по матрице: общие арканы в ключевых позициях и программе отношений"""
+        m1 = matrix_of_destiny.calculate_matrix(d1)
+        m2 = matrix_of_destiny.calculate_matrix(d2)
+        
+        def key_arcana(m):
+            return {m.personal_arcana, m.destiny_arcana, m.social_arcana, m.spiritual_arcana, *m.chakra_line}
+        
+        shared = len(key_arcana(m1) & key_arcana(m2))
+        score = 60 + 6 * shared
+        if m1.love_program == m2.love_program:
+            score += 10
+        return min(score, 100)
+
+    @staticmethod
+    def _sucai_many(date: datetime, days: np.ndarray) -> np.ndarray:
+        """_calc_sucai_compatibility для массива дней рождения (число сознания = число души Сюцай)"""
+        diff = np.abs(reduce_to_single(days) - reduce_to_single(date.day))
+        return np.where(diff == 0, 90, np.where(np.isin(diff, (3, 4, 6)), 85, 65))
+
+    @staticmethod
+    def _matrix_many(date: datetime, dates: np.ndarray) -> np.ndarray:
+        """_calc_matrix_compatibility для массива дат: ключевые арканы - битовые маски, общие - popcount"""
+        rows = matrix_of_destiny.calculate_many(dates)
+        arcana = np.column_stack([
+            rows['personal'], rows['destiny'], rows['social'], rows['spiritual'], rows['chakra_line']
+        ])
+        masks = np.bitwise_or.reduce(np.left_shift(np.uint32(1), arcana.astype(np.uint32)), axis=1)
+
+        m = matrix_of_destiny.calculate_matrix(date)
+        own = {m.personal_arcana, m.destiny_arcana, m.social_arcana, m.spiritual_arcana, *m.chakra_line}
+        own_mask = np.uint32(sum(1 << a for a in own))
+        shared = np.unpackbits((masks & own_mask).view(np.uint8).reshape(-1, 4), axis=1).sum(axis=1)
+
+        score = 60 + 6 * shared.astype(np.int64)
+        score += np.where(rows['love_program'] == m.love_program, 10, 0)
+        return np.minimum(score, 100)
+
+    def _synastry_report(self, synastry: Synastry) -> str:
+        """Самые весомые аспекты пары (гармоничный и напряженный)"""
+        lines = []
+        for title, aspects in (("💫 Сильнее всего связывает", synastry.harmonious), ("⚡ Точка напряжения", synastry.tense)):
+            if aspects:
+                a = aspects[0]
+                lines.append(
+                    f"{title}: {PLANET_NAMES_RU.get(a.planet1, a.planet1)} и "
+                    f"{PLANET_NAMES_RU.get(a.planet2, a.planet2)} ({a.interpretation})"
+                )
+        return ("\n\n" + "\n".join(lines)) if lines else ""
 
     def _generate_report(self, score: int) -> str:
         if score > 85:
@@ -0,0 +1,387 @@
+"""
+Синастрия (астрологическая совместимость пары)
+Матрица аспектов между планетами двух карт, пересечение стихий и биоритмы - векторно (NumPy).
+Результат кэшируется по неупорядоченной паре: (A, B) и (B, A) считаются один раз.
+compare_many - одна дата против N дат (рейтинг совместимости) за один векторный проход.
+"""
+import dataclasses
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Hashable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from oracle.ephemeris import body_positions, ephemeris, julian_day
+from oracle.natal.aspects import aspect_engine
+from oracle.natal.natal_chart import NatalChart, natal_astrology
+
+
+# Вклад аспекта: >0 - гармония, <0 - напряжение
+ASPECT_HARMONY: Dict[str, float] = {
+    'conjunction': 0.6,
+    'sextile': 0.8,
+    'square': -1.0,
+    'trine': 1.0,
+    'opposition': -0.7,
+    'semisextile': 0.3,
+    'semisquare': -0.4,
+    'quintile': 0.4,
+    'sesquiquadrate': -0.4,
+    'biquintile': 0.4,
+    'quincunx': -0.3,
+}
+
+# Вес тела в отношениях: личные планеты важнее высших
+BODY_WEIGHTS: Dict[str, float] = {
+    'Sun': 1.0, 'Moon': 1.0, 'Venus': 0.9, 'Mars': 0.8, 'Mercury': 0.6,
+    'Jupiter': 0.5, 'Saturn': 0.5, 'Uranus': 0.2, 'Neptune': 0.2, 'Pluto': 0.2,
+    'North Node': 0.3, 'Chiron': 0.2, 'Ascendant': 0.8, 'MC': 0.4,
+}
+
+# Стихии в порядке знаков (Овен - огонь, Телец - земля, Близнецы - воздух, Рак - вода, ...)
+ELEMENTS = ['fire', 'earth', 'air', 'water']
+# Совместимость стихий: своя, дружественная (огонь-воздух, земля-вода), нейтральная, конфликтная
+ELEMENT_AFFINITY = np.array([
+    [1.0, 0.4, 0.8, 0.3],
+    [0.4, 1.0, 0.3, 0.8],
+    [0.8, 0.3, 1.0, 0.4],
+    [0.3, 0.8, 0.4, 1.0],
+])
+
+# Биоритмы: периоды циклов в днях
+BIORHYTHM_CYCLES = {'physical': 23, 'emotional': 28, 'intellectual': 33}
+_PERIODS = np.array(list(BIORHYTHM_CYCLES.values()), dtype=np.float64)
+
+PLANET_NAMES_RU = {
+    'Sun': 'Солнце', 'Moon': 'Луна', 'Mercury': 'Меркурий', 'Venus': 'Венера', 'Mars': 'Марс',
+    'Jupiter': 'Юпитер', 'Saturn': 'Сатурн', 'Uranus': 'Уран', 'Neptune': 'Нептун', 'Pluto': 'Плутон',
+    'North Node': 'Северный узел', 'Chiron': 'Хирон', 'Ascendant': 'Асцендент', 'MC': 'MC',
+}
+
+BIRTH_HOUR_UNKNOWN = 12  # Время рождения неизвестно - берем полдень (Луна точна до ~6°)
+
+ASPECT_LUT_STEP = 0.1  # Шаг таблицы вкладов аспектов по угловому расстоянию, градусы
+BULK_CHUNK = 16384  # Кандидатов за проход: ограничивает память матриц (кандидаты, тела, тела)
+JD_UNIX_NOON = 2440588.0  # Юлианский день 1970-01-01 12:00 UT
+
+
+@dataclass(frozen=True)
+class SynastryAspect:
+    """Аспект между планетой первой карты и планетой второй"""
+    planet1: str
+    planet2: str
+    aspect_type: str
+    orb: float
+    weight: float  # Вклад в оценку: >0 - гармония, <0 - напряжение
+    interpretation: str
+
+
+@dataclass(frozen=True)
+class Synastry:
+    """Синастрия пары. Общая для обоих порядков пары - ее нельзя менять"""
+    bodies1: Tuple[str, ...]
+    bodies2: Tuple[str, ...]
+    aspect_matrix: np.ndarray  # (тела1, тела2): индекс в ASPECT_TYPES или -1
+    aspects: List[SynastryAspect]  # Самые весомые первыми
+    elements1: Dict[str, float]
+    elements2: Dict[str, float]
+    aspect_score: int  # 0-100
+    element_score: int  # 0-100
+    biorhythm: Dict[str, int]  # Совпадение по циклам, 0-100
+    biorhythm_score: int
+
+    @property
+    def harmonious(self) -> List[SynastryAspect]:
+        return [a for a in self.aspects if a.weight > 0]
+
+    @property
+    def tense(self) -> List[SynastryAspect]:
+        return [a for a in self.aspects if a.weight < 0]
+
+    def swapped(self) -> "Synastry":
+        """Та же синастрия с точки зрения второй карты"""
+        return dataclasses.replace(
+            self,
+            bodies1=self.bodies2,
+            bodies2=self.bodies1,
+            aspect_matrix=self.aspect_matrix.T,
+            aspects=[dataclasses.replace(a, planet1=a.planet2, planet2=a.planet1) for a in self.aspects],
+            elements1=self.elements2,
+            elements2=self.elements1,
+        )
+
+
+@dataclass
+class BulkSynastry:
+    """Синастрия одной даты с N датами: оценки 0-100 массивами (N,) в порядке дат"""
+    aspect_score: np.ndarray
+    element_score: np.ndarray
+    biorhythm_score: np.ndarray
+
+
+def biorhythm_compatibility(birth1: datetime, birth2: datetime) -> Dict[str, int]:
+    """
+    Совпадение биоритмов по циклам, 0-100.
+    Кривая цикла - sin(2π·t/P) от дня рождения; корреляция двух таких кривых
+    на полном периоде равна cos(2π·Δ/P), где Δ - разница дней рождения.
+    """
+    delta = abs((birth1.date() - birth2.date()).days)
+    similarity = (1.0 + np.cos(2.0 * np.pi * delta / _PERIODS)) / 2.0
+    return {name: int(round(v * 100)) for name, v in zip(BIORHYTHM_CYCLES, similarity.tolist())}
+
+
+class SynastryEngine:
+    """Расчет синастрии с кэшем позиций по дате и кэшем результатов по паре"""
+
+    def __init__(self, max_pairs: int = 1024, max_positions: int = 2048):
+        self.max_pairs = max_pairs
+        self.max_positions = max_positions
+        self._pairs: "OrderedDict[frozenset, Tuple[Hashable, Synastry]]" = OrderedDict()
+        self._positions: "OrderedDict[datetime, Tuple[Tuple[str, ...], np.ndarray]]" = OrderedDict()
+        self._luts: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], np.ndarray] = {}
+        self.hits = 0
+        self.computed = 0
+
+    def compare(self, birth1: datetime, birth2: datetime) -> Synastry:
+        """Синастрия по датам рождения (без времени - на полдень UT)"""
+        return self._cached(
+            ('date', self._moment(birth1)),
+            ('date', self._moment(birth2)),
+            lambda: self._compute(birth1, birth2, *self._date_positions(birth1), *self._date_positions(birth2)),
+        )
+
+    def compare_charts(self, chart1: Union[NatalChart, datetime], chart2: Union[NatalChart, datetime]) -> Synastry:
+        """
+        Синастрия по натальным картам (с асцендентом и MC и точной Луной).
+        Если у одного из пары карты нет - вместо нее дата рождения (на полдень UT, как в compare)
+        """
+        key1, birth1, positions1 = self._side(chart1)
+        key2, birth2, positions2 = self._side(chart2)
+        return self._cached(key1, key2, lambda: self._compute(birth1, birth2, *positions1(), *positions2()))
+
+    def _side(self, birth: Union[NatalChart, datetime]):
+        """(ключ кэша, дата рождения, позиции) - позиции считаются лениво, только при промахе кэша"""
+        if isinstance(birth, NatalChart):
+            return (
+                ('chart', birth.birth_date, birth.latitude, birth.longitude),
+                birth.birth_date,
+                lambda: self._chart_positions(birth),
+            )
+        return ('date', self._moment(birth)), birth, lambda: self._date_positions(birth)
+
+    def compare_many(self, birth: datetime, dates: np.ndarray) -> BulkSynastry:
+        """
+        Синастрия даты рождения с массивом дат (datetime64[D], на полдень UT) за один векторный проход.
+        Вклад аспекта берется из таблицы по расстоянию с шагом ASPECT_LUT_STEP,
+        поэтому оценки могут отличаться от compare на единицу.
+        """
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        # Оценки зависят только от даты кандидата: считаем по уникальным датам
+        unique, inverse = np.unique(dates, return_inverse=True)
+        names1, lons1 = self._date_positions(birth)
+        lons2 = self._dates_longitudes(unique, names1)
+        # Тело, которого нет у части дат (нет в таблице и в swisseph), не учитываем
+        keep = ~np.isnan(lons2).any(axis=0)
+        names2 = tuple(name for name, k in zip(names1, keep) if k)
+        lons2 = lons2[:, keep]
+
+        lut = self._aspect_lut(names1, names2)
+        offsets = np.arange(len(names1) * len(names2), dtype=np.int32) * lut.shape[1]
+        w1 = self._weights(names1)
+        w2 = self._weights(names2)
+        elements1 = self._elements(lons1, w1)
+        affinity = ELEMENT_AFFINITY @ elements1
+
+        n = len(unique)
+        lons1 = lons1.astype(np.float32)
+        aspect_score = np.empty(n, dtype=np.float64)
+        element_score = np.empty(n, dtype=np.float64)
+        for start in range(0, n, BULK_CHUNK):
+            part = slice(start, start + BULK_CHUNK)
+            lons = lons2[part]
+            # Долготы в [0, 360): кратчайшее расстояние без взятия по модулю
+            d = np.abs(lons.astype(np.float32)[:, None, :] - lons1[None, :, None])
+            d = np.minimum(d, 360.0 - d)
+            index = (d * (1 / ASPECT_LUT_STEP) + 0.5).astype(np.int32).reshape(len(lons), -1) + offsets
+            weights = np.take(lut, index)
+            positive = np.where(weights > 0, weights, 0).sum(axis=1, dtype=np.float64)
+            negative = np.where(weights < 0, -weights, 0).sum(axis=1, dtype=np.float64)
+            aspect_score[part] = 50 + 50 * (positive - negative) / (positive + negative + 1.0)
+
+            element = (lons // 30).astype(np.intp) % 4
+            balance = np.stack([np.where(element == e, w2, 0).sum(axis=1) for e in range(len(ELEMENTS))], axis=1)
+            element_score[part] = 100 * (balance @ affinity) / (elements1.sum() * balance.sum(axis=1))
+
+        # Биоритмы: те же формулы, что в biorhythm_compatibility, по всем датам сразу
+        delta = np.abs(unique.astype(np.int64) - np.datetime64(birth.date(), 'D').astype(np.int64))
+        similarity = (1.0 + np.cos(2.0 * np.pi * delta[:, None] / _PERIODS)) / 2.0
+        biorhythm = np.rint(np.rint(similarity * 100).mean(axis=1))
+
+        return BulkSynastry(
+            aspect_score=np.rint(np.clip(aspect_score, 0, 100)).astype(np.int64)[inverse],
+            element_score=np.rint(element_score).astype(np.int64)[inverse],
+            biorhythm_score=biorhythm.astype(np.int64)[inverse],
+        )
+
+    def _dates_longitudes(self, dates: np.ndarray, names: Sequence[str]) -> np.ndarray:
+        """Долготы тел на полдень UT каждой даты: (N, тела); из таблицы, вне ее - swisseph по уникальным датам"""
+        jd = dates.astype(np.int64) + JD_UNIX_NOON
+        lons = np.full((len(jd), len(names)), np.nan)
+        covered = ephemeris.covers_many(jd)
+        if covered.any():
+            lons[covered] = ephemeris.longitudes_many(jd[covered], names)
+        if not covered.all():
+            outside, inverse = np.unique(jd[~covered], return_inverse=True)
+            rows = np.full((len(outside), len(names)), np.nan)
+            for r, day_jd in enumerate(outside.tolist()):
+                positions = body_positions(day_jd, names)
+                rows[r] = [positions[name][0] if positions[name] is not None else np.nan for name in names]
+            lons[~covered] = rows[inverse]
+        return lons
+
+    def _aspect_lut(self, names1: Tuple[str, ...], names2: Tuple[str, ...]) -> np.ndarray:
+        """
+        Вклад аспекта для каждой пары тел (names1 x names2) по сетке расстояний 0..180°:
+        (пары, узлы сетки), те же веса, что в _compute. Зависит только от набора тел - кэшируется.
+        """
+        key = (tuple(names1), tuple(names2))
+        lut = self._luts.get(key)
+        if lut is not None:
+            return lut
+
+        grid = np.arange(int(round(180 / ASPECT_LUT_STEP)) + 1) * ASPECT_LUT_STEP
+        pair_orb = ((aspect_engine.orbs(names1)[:, None] + aspect_engine.orbs(names2)[None, :]) / 2).ravel()
+        pair_weight = (self._weights(names1)[:, None] * self._weights(names2)[None, :]).ravel()
+        orb = np.repeat(pair_orb, len(grid))
+        hit, kind, deviation = aspect_engine.classify(np.tile(grid, len(pair_orb)), orb)
+
+        aspect_types = aspect_engine.aspect_types
+        harmony = np.array([ASPECT_HARMONY.get(a.name, 0.0) for a in aspect_types])
+        factors = np.array([a.orb_factor for a in aspect_types])
+        tightness = 1.0 - deviation / (orb * factors[kind])
+        weights = np.where(hit, harmony[kind] * np.repeat(pair_weight, len(grid)) * tightness, 0.0)
+
+        lut = self._luts[key] = weights.astype(np.float32).reshape(len(pair_orb), len(grid))
+        return lut
+
+    def _cached(self, key1: Hashable, key2: Hashable, compute) -> Synastry:
+        pair = frozenset((key1, key2))
+        entry = self._pairs.get(pair)
+        if entry is not None:
+            self._pairs.move_to_end(pair)
+            self.hits += 1
+            first, synastry = entry
+        else:
+            self.computed += 1
+            first, synastry = key1, compute()
+            self._pairs[pair] = (first, synastry)
+            while len(self._pairs) > self.max_pairs:
+                self._pairs.popitem(last=False)
+        # Пара считалась в другом порядке - разворачиваем
+        return synastry if first == key1 else synastry.swapped()
+
+    @staticmethod
+    def _moment(birth: datetime) -> datetime:
+        birth = birth.replace(tzinfo=None, microsecond=0)
+        if birth.hour == 0 and birth.minute == 0 and birth.second == 0:
+            birth = birth.replace(hour=BIRTH_HOUR_UNKNOWN)
+        return birth
+
+    def _date_positions(self, birth: datetime) -> Tuple[Tuple[str, ...], np.ndarray]:
+        moment = self._moment(birth)
+        cached = self._positions.get(moment)
+        if cached is not None:
+            self._positions.move_to_end(moment)
+            return cached
+        positions = body_positions(julian_day(moment), list(natal_astrology.PLANETS))
+        names = tuple(name for name, p in positions.items() if p is not None)
+        lons = np.array([positions[name][0] for name in names], dtype=np.float64)
+        self._positions[moment] = (names, lons)
+        while len(self._positions) > self.max_positions:
+            self._positions.popitem(last=False)
+        return names, lons
+
+    @staticmethod
+    def _chart_positions(chart: NatalChart) -> Tuple[Tuple[str, ...], np.ndarray]:
+        names = (*chart.planets, 'Ascendant', 'MC')
+        lons = [p.longitude for p in chart.planets.values()] + [chart.ascendant, chart.mc]
+        return names, np.array(lons, dtype=np.float64)
+
+    def _compute(
+        self,
+        birth1: datetime,
+        birth2: datetime,
+        names1: Sequence[str],
+        lons1: np.ndarray,
+        names2: Sequence[str],
+        lons2: np.ndarray
+    ) -> Synastry:
+        aspect_types = aspect_engine.aspect_types
+        hits = aspect_engine.synastry(names1, lons1, names2, lons2)
+
+        matrix = np.full((len(names1), len(names2)), -1, dtype=np.int8)
+        matrix[hits.first, hits.second] = hits.aspect
+
+        # Вес аспекта: гармоничность вида x важность тел x точность (1 - точный, 0 - край орбиса)
+        harmony = np.array([ASPECT_HARMONY.get(a.name, 0.0) for a in aspect_types])
+        factors = np.array([a.orb_factor for a in aspect_types])
+        w1 = self._weights(names1)
+        w2 = self._weights(names2)
+        allowed = (aspect_engine.orbs(names1)[hits.first] + aspect_engine.orbs(names2)[hits.second]) / 2
+        allowed = allowed * factors[hits.aspect]
+        tightness = 1.0 - hits.orb / allowed
+        weights = harmony[hits.aspect] * w1[hits.first] * w2[hits.second] * tightness
+
+        positive = float(weights[weights > 0].sum())
+        negative = float(-weights[weights < 0].sum())
+        aspect_score = 50 + 50 * (positive - negative) / (positive + negative + 1.0)
+
+        order = np.argsort(-np.abs(weights), kind='stable')
+        aspects = [
+            SynastryAspect(
+                planet1=names1[i],
+                planet2=names2[j],
+                aspect_type=aspect_types[k].name,
+                orb=orb,
+                weight=weight,
+                interpretation=aspect_types[k].interpretation,
+            )
+            for i, j, k, orb, weight in zip(
+                hits.first[order].tolist(), hits.second[order].tolist(), hits.aspect[order].tolist(),
+                hits.orb[order].tolist(), weights[order].tolist()
+            )
+        ]
+
+        elements1 = self._elements(lons1, w1)
+        elements2 = self._elements(lons2, w2)
+        element_score = 100 * (elements1 @ ELEMENT_AFFINITY @ elements2) / (elements1.sum() * elements2.sum())
+
+        biorhythm = biorhythm_compatibility(birth1, birth2)
+
+        return Synastry(
+            bodies1=tuple(names1),
+            bodies2=tuple(names2),
+            aspect_matrix=matrix,
+            aspects=aspects,
+            elements1=dict(zip(ELEMENTS, elements1.round(2).tolist())),
+            elements2=dict(zip(ELEMENTS, elements2.round(2).tolist())),
+            aspect_score=int(round(np.clip(aspect_score, 0, 100))),
+            element_score=int(round(element_score)),
+            biorhythm=biorhythm,
+            biorhythm_score=int(round(sum(biorhythm.values()) / len(biorhythm))),
+        )
+
+    @staticmethod
+    def _weights(names: Sequence[str]) -> np.ndarray:
+        return np.array([BODY_WEIGHTS.get(name, 0.3) for name in names], dtype=np.float64)
+
+    @staticmethod
+    def _elements(lons: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Взвешенный баланс стихий: знак = долгота // 30, стихия = знак % 4"""
+        element = (lons // 30).astype(np.intp) % 4
+        return np.bincount(element, weights=weights, minlength=4)
+
+
+# Singleton
+synastry_engine = SynastryEngine()
@@ -0,0 +1,80 @@
+"""
+Послание дня
+Генерируется один раз в сутки (по UTC) для каждого знака зодиака и одно общее,
+хранится в памяти и в БД, чтобы рассылка, кнопка меню и перезапуски бота
+получали один и тот же текст
+"""
+import asyncio
+from datetime import datetime, date
+from typing import Dict, Optional
+
+from loguru import logger
+
+from database.database import AsyncSessionLocal
+from database.models import DailyGuidance
+from oracle.horoscope.horoscope_parser import horoscope_parser
+from oracle.interpreter import oracle_interpreter
+from oracle.singleflight import SingleFlight
+
+
+GENERAL = ''  # Ключ общего послания (пользователи без даты рождения, кнопка меню)
+
+
+class DailyGuidanceStore:
+    """Хранилище посланий дня: (день, знак) -> текст"""
+
+    def __init__(self):
+        self._day: Optional[date] = None
+        self._texts: Dict[str, str] = {}  # Только за текущие сутки
+        # Один генератор на холодный ключ: остальные ждут его результата
+        self._flights = SingleFlight()
+
+    @staticmethod
+    def today() -> date:
+        return datetime.utcnow().date()
+
+    async def get(self, sign: Optional[str] = None) -> str:
+        """Получить послание на сегодня для знака (en, как в horoscope_parser) или общее"""
+        sign = sign or GENERAL
+        day = self.today()
+        if self._day != day:
+            self._day, self._texts = day, {}
+        text = self._texts.get(sign)
+        if text is not None:
+            return text
+
+        return await self._flights.do((day, sign), self._load_or_generate, day, sign)
+
+    async def _load_or_generate(self, day: date, sign: str) -> str:
+        text = await self._load(day, sign)
+        if text is None:
+            logger.info(f"Generating daily guidance for {day} ({sign or 'general'})")
+            sign_ru = horoscope_parser.SIGN_NAMES_RU.get(sign)
+            text = await oracle_interpreter.get_daily_guidance(sign_ru)
+            await self._store(day, sign, text)
+
+        if self._day == day:
+            self._texts[sign] = text
+        return text
+
+    async def precompute(self):
+        """Подготовить послания заранее (вызывается задачей до утренней рассылки)"""
+        signs = [GENERAL, *horoscope_parser.SIGN_NAMES_RU]
+        results = await asyncio.gather(*(self.get(sign) for sign in signs), return_exceptions=True)
+        for sign, result in zip(signs, results):
+            if isinstance(result, Exception):
+                logger.error(f"Daily guidance precompute failed ({sign or 'general'}): {result}")
+
+    async def _load(self, day: date, sign: str) -> Optional[str]:
+        async with AsyncSessionLocal() as session:
+            entry = await session.get(DailyGuidance, (day, sign))
+            return entry.text if entry else None
+
+    async def _store(self, day: date, sign: str, text: str):
+        async with AsyncSessionLocal() as session:
+            await session.merge(DailyGuidance(day=day, sign=sign, text=text))
+            await session.commit()
+
+
+# Singleton
+daily_guidance = DailyGuidanceStore()
@@ -0,0 +1,307 @@
+"""
+Таблица эфемерид
+Положения и скорости всех тел на каждые сутки 1900-2100 (float32, ~7 МБ),
+рассчитанные заранее через swisseph и открываемые через mmap.
+Положение на произвольный момент - кубическая интерполяция Эрмита по двум
+соседним суткам (используются и долготы, и скорости), без обращения к swisseph.
+Расхождение со swisseph - обычно сотые доли угловой секунды, в худших точках до ~2″
+(Юпитер, Нептун); при сборке оно проверяется по случайной выборке (MAX_ERROR_ARCSEC).
+swisseph остается для домов и для дат вне таблицы.
+
+Сборка таблицы (один раз, при сборке образа):
+    python -m oracle.ephemeris [путь к .npy]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import swisseph as swe
+from loguru import logger
+
+
+BODIES: Dict[str, int] = {
+    'Sun': swe.SUN,
+    'Moon': swe.MOON,
+    'Mercury': swe.MERCURY,
+    'Venus': swe.VENUS,
+    'Mars': swe.MARS,
+    'Jupiter': swe.JUPITER,
+    'Saturn': swe.SATURN,
+    'Uranus': swe.URANUS,
+    'Neptune': swe.NEPTUNE,
+    'Pluto': swe.PLUTO,
+    'North Node': swe.TRUE_NODE,
+    'Chiron': swe.CHIRON
+}
+
+START_YEAR = 1900
+END_YEAR = 2100
+STEP_DAYS = 1.0
+
+# Проверка собранной таблицы: моментов на тело и допустимое расхождение со swisseph
+CHECK_SAMPLES = 500
+MAX_ERROR_ARCSEC = 5.0
+
+# Путь берется из окружения, а не из settings: сборка таблицы идет без токенов бота
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data" / "ephemeris.npy"
+EPHEMERIS_PATH = Path(os.environ.get("EPHEMERIS_PATH", DEFAULT_PATH))
+
+
+def julian_day(dt) -> float:
+    """Julian Day (UT) для datetime, как в расчетах карт"""
+    return swe.julday(dt.year, dt.month, dt.day, dt.hour + dt.minute / 60.0 + dt.second / 3600.0)
+
+
+def _meta_path(path: Path) -> Path:
+    return path.with_suffix(".json")
+
+
+def build(path: Path = EPHEMERIS_PATH, start_year: int = START_YEAR, end_year: int = END_YEAR,
+          step_days: float = STEP_DAYS) -> Path:
+    """
+    Рассчитать таблицу: массив (сутки, тело, [долгота, скорость в °/сутки]) float32 + JSON с параметрами.
+    Тела, которые swisseph не может рассчитать (Хирон без файлов эфемерид), заполняются NaN.
+    """
+    swe.set_ephe_path(None)
+    start_jd = swe.julday(start_year, 1, 1, 0.0)
+    end_jd = swe.julday(end_year + 1, 1, 1, 0.0)
+    rows = int(round((end_jd - start_jd) / step_days)) + 1
+    names = list(BODIES)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp.npy")
+    table = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(rows, len(names), 2))
+
+    started = time.monotonic()
+    missing = []
+    for b, name in enumerate(names):
+        body = BODIES[name]
+        try:
+            swe.calc_ut(start_jd, body)
+        except swe.Error as e:
+            logger.warning(
+                f"Ephemeris: {name} unavailable, filled with NaN - every {name} lookup "
+                f"will fall back to swisseph ({e})"
+            )
+            table[:, b, :] = np.nan
+            missing.append(name)
+            continue
+        column = np.empty((rows, 2), dtype=np.float64)
+        for i in range(rows):
+            position = swe.calc_ut(start_jd + i * step_days, body)[0]
+            column[i, 0] = position[0]
+            column[i, 1] = position[3]
+        table[:, b, :] = column
+        logger.info(f"Ephemeris: {name} done ({time.monotonic() - started:.0f}s)")
+
+    table.flush()
+    try:
+        errors = check(table, start_jd, step_days, names)
+    finally:
+        del table
+    worst = max(errors, key=errors.get)
+    if errors[worst] > MAX_ERROR_ARCSEC:
+        tmp_path.unlink()
+        raise ValueError(
+            f"Ephemeris table too inaccurate: {worst} off by {errors[worst]:.2f}\" "
+            f"(limit {MAX_ERROR_ARCSEC}\", step {step_days} days)"
+        )
+    logger.info("Ephemeris accuracy (max, arcsec): " + ", ".join(f"{n} {e:.2f}" for n, e in errors.items()))
+
+    os.replace(tmp_path, path)
+    _meta_path(path).write_text(json.dumps({
+        "start_jd": start_jd,
+        "step_days": step_days,
+        "bodies": names,
+        "missing": missing,
+    }))
+    logger.info(f"Ephemeris table written: {path} ({rows} rows, {path.stat().st_size / 1e6:.1f} MB)")
+    return path
+
+
+def check(table: np.ndarray, start_jd: float, step_days: float, names: Sequence[str],
+          samples: int = CHECK_SAMPLES, seed: int = 0) -> Dict[str, float]:
+    """Наибольшее расхождение интерполяции со swisseph (угловые секунды) по случайным моментам, по телам"""
+    reader = EphemerisTable()
+    reader._table, reader._loaded = table, True
+    reader.start_jd, reader.step_days = start_jd, step_days
+    reader.bodies = {name: i for i, name in enumerate(names)}
+
+    rng = np.random.default_rng(seed)
+    jds = start_jd + rng.uniform(0, (len(table) - 1) * step_days, samples)
+    errors = {}
+    for name in names:
+        if np.isnan(table[0, reader.bodies[name], 0]):
+            continue
+        lons = reader.longitudes(jds, name)
+        exact = np.array([swe.calc_ut(jd, BODIES[name])[0][0] for jd in jds.tolist()])
+        errors[name] = float(np.abs((lons - exact + 180.0) % 360.0 - 180.0).max() * 3600)
+    return errors
+
+
+class EphemerisTable:
+    """Чтение таблицы эфемерид (файл открывается лениво через mmap)"""
+
+    def __init__(self, path: Path = EPHEMERIS_PATH):
+        self.path = Path(path)
+        self._table: Optional[np.ndarray] = None
+        self._loaded = False
+        self.start_jd = 0.0
+        self.step_days = STEP_DAYS
+        self.bodies: Dict[str, int] = {}
+
+    def _load(self) -> Optional[np.ndarray]:
+        if not self._loaded:
+            self._loaded = True
+            try:
+                meta = json.loads(_meta_path(self.path).read_text())
+                self._table = np.load(self.path, mmap_mode="r")
+                self.start_jd = meta["start_jd"]
+                self.step_days = meta["step_days"]
+                self.bodies = {name: i for i, name in enumerate(meta["bodies"])}
+                for name in meta.get("missing", []):
+                    logger.info(f"Ephemeris table has no {name} (built without its ephemeris files), using swisseph")
+            except FileNotFoundError:
+                logger.info(f"Ephemeris table not found at {self.path}, using swisseph")
+            except Exception as e:
+                logger.warning(f"Ephemeris table unusable ({e}), using swisseph")
+                self._table = None
+        return self._table
+
+    @property
+    def available(self) -> bool:
+        return self._load() is not None
+
+    def covers(self, jd: float) -> bool:
+        table = self._load()
+        if table is None:
+            return False
+        return self.start_jd <= jd < self.start_jd + (len(table) - 1) * self.step_days
+
+    def covers_many(self, jds: Sequence[float]) -> np.ndarray:
+        """Маска моментов, попадающих в таблицу"""
+        jd = np.asarray(jds, dtype=np.float64)
+        table = self._load()
+        if table is None:
+            return np.zeros(jd.shape, dtype=bool)
+        return (jd >= self.start_jd) & (jd < self.start_jd + (len(table) - 1) * self.step_days)
+
+    @staticmethod
+    def _hermite(t, p0, v0, p1, v1) -> Tuple[np.ndarray, np.ndarray]:
+        """Кубический полином Эрмита на отрезке суток: долгота и производная по t"""
+        # Переход через 0°: второй узел берем в той же "обмотке", что и первый
+        p1 = p0 + ((p1 - p0 + 180.0) % 360.0 - 180.0)
+        t2, t3 = t * t, t * t * t
+        lon = (2 * t3 - 3 * t2 + 1) * p0 + (t3 - 2 * t2 + t) * v0 + (-2 * t3 + 3 * t2) * p1 + (t3 - t2) * v1
+        speed = (6 * t2 - 6 * t) * p0 + (3 * t2 - 4 * t + 1) * v0 + (-6 * t2 + 6 * t) * p1 + (3 * t2 - 2 * t) * v1
+        return lon % 360.0, speed
+
+    def _interpolate(self, jd: np.ndarray, bodies: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Интерполяция на много моментов: jd (N,), индексы тел (B,) -> долготы и скорости (N, B)"""
+        x = (jd - self.start_jd) / self.step_days
+        i = np.floor(x).astype(np.intp)
+        t = (x - i)[:, None]
+        r0 = self._table[i][:, bodies].astype(np.float64)
+        r1 = self._table[i + 1][:, bodies].astype(np.float64)
+        lon, speed = self._hermite(
+            t, r0[..., 0], r0[..., 1] * self.step_days, r1[..., 0], r1[..., 1] * self.step_days
+        )
+        return lon, speed / self.step_days
+
+    def positions(self, jd: float, bodies: Optional[Sequence[str]] = None) -> Dict[str, Optional[Tuple[float, float]]]:
+        """
+        (долгота, скорость °/сутки) тел на момент jd.
+        None - тела нет в таблице (NaN) или дата вне таблицы: такие считаются через swisseph.
+        """
+        names = list(bodies) if bodies is not None else list(BODIES)
+        if not self.covers(jd):
+            return {name: None for name in names}
+
+        # Две соседние строки таблицы - одно чтение из mmap
+        x = (jd - self.start_jd) / self.step_days
+        i = int(x)
+        rows = np.asarray(self._table[i:i + 2], dtype=np.float64)
+        lon, speed = self._hermite(
+            x - i, rows[0, :, 0], rows[0, :, 1] * self.step_days, rows[1, :, 0], rows[1, :, 1] * self.step_days
+        )
+        result = {}
+        for name in names:
+            b = self.bodies.get(name)
+            if b is None or np.isnan(lon[b]):
+                result[name] = None
+            else:
+                result[name] = (float(lon[b]), float(speed[b]) / self.step_days)
+        return result
+
+    def longitudes(self, jds: Sequence[float], body: str) -> np.ndarray:
+        """Долготы одного тела на много моментов сразу (транзиты, поиск дат)"""
+        return self.longitudes_many(jds, [body])[:, 0]
+
+    def longitudes_many(self, jds: Sequence[float], bodies: Sequence[str]) -> np.ndarray:
+        """
+        Долготы нескольких тел на много моментов: (N, B). Все jd должны попадать в таблицу (covers);
+        NaN - тела нет в таблице.
+        """
+        self._load()
+        jd = np.asarray(jds, dtype=np.float64)
+        lon, _ = self._interpolate(jd, np.array([self.bodies[body] for body in bodies], dtype=np.intp))
+        return lon
+
+    def sign_index(self, jd: float, body: str) -> Optional[int]:
+        """Номер знака (0 - Овен) тела на момент jd, None - нет в таблице"""
+        position = self.positions(jd, [body])[body]
+        return int(position[0] // 30) if position is not None else None
+
+    def is_retrograde(self, jd: float, body: str) -> Optional[bool]:
+        position = self.positions(jd, [body])[body]
+        return position[1] < 0 if position is not None else None
+
+
+# swisseph хранит глобальное состояние (путь к эфемеридам, топоцентр, кэш файлов) и не потокобезопасен:
+# все вызовы расчетов идут под этой блокировкой (расчеты идут и в пуле потоков, и в event loop)
+swe_lock = threading.RLock()
+
+
+def calc_houses(jd: float, latitude: float, longitude: float, house_system: bytes = b'P') -> List[float]:
+    """12 куспидов домов через swisseph"""
+    with swe_lock:
+        return list(swe.houses(jd, latitude, longitude, house_system)[0])
+
+
+def calc_body(jd: float, name: str) -> Optional[Tuple[float, float]]:
+    """Положение тела через swisseph: (долгота, скорость) или None, если тело недоступно"""
+    try:
+        with swe_lock:
+            position = swe.calc_ut(jd, BODIES[name])[0]
+    except swe.Error as e:
+        if name not in _unavailable:
+            _unavailable.add(name)
+            logger.warning(f"swisseph: {name} unavailable ({e})")
+        return None
+    return position[0], position[3]
+
+
+_unavailable = set()
+
+
+def body_positions(jd: float, bodies: Optional[Sequence[str]] = None) -> Dict[str, Optional[Tuple[float, float]]]:
+    """Положения тел: из таблицы, чего в ней нет - через swisseph"""
+    result = ephemeris.positions(jd, bodies)
+    for name, position in result.items():
+        if position is None and name not in _unavailable:
+            result[name] = calc_body(jd, name)
+    return result
+
+
+# Singleton
+ephemeris = EphemerisTable()
+
+
+if __name__ == "__main__":
+    build(Path(sys.argv[1]) if len(sys.argv) > 1 else EPHEMERIS_PATH)
@@ -0,0 +1,97 @@
+"""
+Общие пулы для тяжелой синхронной работы
+Процессы - для чистого Python (разбор HTML, сборка карт): не держат GIL основного процесса.
+Потоки - для вызовов C-расширений, которые сами отпускают GIL, и для коротких блокирующих вызовов.
+Обработчики ждут результат через await, event loop в это время обслуживает других пользователей.
+
+В процесс передаются только функции уровня модуля (pickle по имени) и простые аргументы.
+Пул процессов включается настройкой executor_processes (по умолчанию 0 - все идет в потоках):
+воркер spawn импортирует main.py заново, то есть держит в памяти весь бот.
+"""
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+from config.settings import settings
+
+
+def _ready() -> bool:
+    return True
+
+
+class ExecutorService:
+    """Пул процессов и пул потоков приложения (создаются при первом использовании)"""
+
+    def __init__(self, processes: int = 0, threads: int = 8):
+        self.processes = processes
+        self.threads = threads
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def process_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Пул процессов; None - процессы отключены (processes=0), работа идет в потоках"""
+        if self._process_pool is None and self.processes > 0:
+            # spawn: воркеры не наследуют потоки, блокировки и сокеты основного процесса
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Process pool started ({self.processes} workers)")
+        return self._process_pool
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="oracle")
+        return self._thread_pool
+
+    async def start(self):
+        """Поднять воркеры заранее (вызывается из post_init), чтобы первый пользователь не ждал spawn"""
+        if self.process_pool is not None:
+            await asyncio.gather(*(self.run_cpu(_ready) for _ in range(self.processes)))
+
+    async def run_cpu(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполнить func в пуле процессов (func и аргументы должны сериализоваться pickle)"""
+        pool = self.process_pool
+        if pool is None:
+            return await self.run_thread(func, *args, **kwargs)
+        try:
+            return await self._run(pool, func, *args, **kwargs)
+        except BrokenProcessPool:
+            # Воркер упал (OOM, сигнал) - пересоздаем пул и повторяем один раз
+            logger.warning("Process pool broken, restarting")
+            self._process_pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            return await self._run(self.process_pool, func, *args, **kwargs)
+
+    async def run_thread(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполнить func в пуле потоков"""
+        return await self._run(self.thread_pool, func, *args, **kwargs)
+
+    @staticmethod
+    async def _run(pool: Executor, func: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+
+    async def close(self):
+        """Остановить пулы (вызывается из post_shutdown)"""
+        pools = [pool for pool in (self._process_pool, self._thread_pool) if pool is not None]
+        self._process_pool = None
+        self._thread_pool = None
+        for pool in pools:
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+        if pools:
+            logger.info("Executor pools closed")
+
+
+# Singleton
+executors = ExecutorService(
+    processes=settings.executor_processes,
+    threads=settings.executor_threads,
+)
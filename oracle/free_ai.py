@@ -1,13 +1,37 @@
 """
 Бесплатные AI альтернативы для снижения затрат
 """
-import aiohttp
 import asyncio
 from typing import Optional
 
+from oracle.llm_client import LLMProvider, LLMProviderError, build_provider
+
+
+# Клиенты создаются один раз и переиспользуют свои пулы соединений
+_providers: dict[str, Optional[LLMProvider]] = {}
+
 
 class FreeAIProviders:
-    """Бесплатные AI провайдеры"""
+    """
+    Бесплатные AI провайдеры
+    Ключи берутся из настроек (.env); в рабочем потоке эти провайдеры
+    используются роутером (oracle/llm_router.py) наравне с платными
+    """
+    
+    @staticmethod
+    async def _complete(name: str, prompt: str, system_prompt: str) -> Optional[str]:
+        if name not in _providers:
+            _providers[name] = build_provider(name)
+        provider = _providers[name]
+        if provider is None:
+            return None
+        
+        try:
+            return await provider.complete(system_prompt, prompt, temperature=0.8, max_tokens=400)
+        except LLMProviderError as e:
+            print(f"{name} API error: {e}")
+        
+        return None
     
     @staticmethod
     async def groq_completion(prompt: str, system_prompt: str = "") -> Optional[str]:
@@ -17,38 +41,7 @@ class FreeAIProviders:
         
         БЕСПЛАТНО: До 14,400 запросов в день!
         """
-        api_key = "YOUR_GROQ_API_KEY"  # Получить на https://console.groq.com/
-        
-        if not api_key or api_key == "YOUR_GROQ_API_KEY":
-            return None
-        
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "llama3-70b-8192",  # Или mixtral-8x7b-32768
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.8,
-            "max_tokens": 400
-        }
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data, timeout=30) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result['choices'][0]['message']['content']
-        except Exception as e:
-            print(f"Groq API error: {e}")
-        
-        return None
+        return await FreeAIProviders._complete("groq", prompt, system_prompt)
     
     @staticmethod
     async def together_completion(prompt: str, system_prompt: str = "") -> Optional[str]:
@@ -58,38 +51,7 @@ class FreeAIProviders:
         
         Модели: Llama-3, Mixtral, и другие open-source модели
         """
-        api_key = "YOUR_TOGETHER_API_KEY"
-        
-        if not api_key or api_key == "YOUR_TOGETHER_API_KEY":
-            return None
-        
-        url = "https://api.together.xyz/v1/chat/completions"
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "meta-llama/Llama-3-70b-chat-hf",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.8,
-            "max_tokens": 400
-        }
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data, timeout=30) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result['choices'][0]['message']['content']
-        except Exception as e:
-            print(f"Together AI error: {e}")
-        
-        return None
+        return await FreeAIProviders._complete("together", prompt, system_prompt)
     
     @staticmethod
     async def huggingface_completion(prompt: str, system_prompt: str = "") -> Optional[str]:
@@ -99,41 +61,7 @@ class FreeAIProviders:
         
         Rate limit: Зависит от модели, но обычно достаточно для малых проектов
         """
-        api_key = "YOUR_HF_API_KEY"
-        
-        if not api_key or api_key == "YOUR_HF_API_KEY":
-            return None
-        
-        # Используем бесплатную модель
-        url = "https://api-inference.huggingface.co/models/mistralai/Mixtral-8x7B-Instruct-v0.1"
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        full_prompt = f"{system_prompt}\n\nUser: {prompt}\n\nAssistant:"
-        
-        data = {
-            "inputs": full_prompt,
-            "parameters": {
-                "max_new_tokens": 400,
-                "temperature": 0.8,
-                "return_full_text": False
-            }
-        }
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data, timeout=30) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if isinstance(result, list) and len(result) > 0:
-                            return result[0].get('generated_text', '')
-        except Exception as e:
-            print(f"HuggingFace API error: {e}")
-        
-        return None
+        return await FreeAIProviders._complete("huggingface", prompt, system_prompt)
 
 
 # Вспомогательные функции для настройки
@@ -158,9 +86,8 @@ TOGETHER_API_KEY=your_together_api_key
 # Лимит: Зависит от модели
 HUGGINGFACE_API_KEY=your_hf_api_key
 
-# Приоритет использования:
-# 1. Пробуем Groq (быстро, бесплатно)
-# 2. Если не работает -> OpenAI/Anthropic (платно)
+# Все провайдеры с ключами подключаются к роутеру:
+# запрос уходит самому быстрому здоровому, при 429/5xx -> следующему
 """
 
 
@@ -3,11 +3,16 @@
 Анализ вопроса по времени его задания
 """
 import swisseph as swe
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import pytz
 
+from oracle.ephemeris import body_positions, calc_houses, julian_day
+from oracle.executors import executors
+from oracle.singleflight import SingleFlight
+
 
 @dataclass
 class Planet:
@@ -28,6 +33,7 @@ class HoraryChart:
     planets: Dict[str, Planet]
     houses: List[float]
     interpretation: str
+    formatted: Optional[str] = None  # Текст format_chart (считается один раз)
 
 
 class HoraryAstrology:
@@ -54,12 +60,110 @@ class HoraryAstrology:
         'Стрелец', 'Козерог', 'Водолей', 'Рыбы'
     ]
     
+    # Место по умолчанию - Москва
+    DEFAULT_LATITUDE = 55.75
+    DEFAULT_LONGITUDE = 37.62
+    
+    # Кэш карт: за минуту положение планет и куспиды меняются меньше, чем видно в тексте
+    CACHE_SIZE = 64
+    COORD_PRECISION = 2  # Знаков после запятой у широты/долготы в ключе (~1 км)
+    
     def __init__(self):
         # Устанавливаем путь к эфемеридам Swiss Ephemeris
         # В продакшене нужно будет скачать файлы эфемерид
         swe.set_ephe_path(None)  # Использует встроенные данные
+        self._charts: "OrderedDict[Tuple[datetime, float, float, bytes], HoraryChart]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Одновременные промахи по одной минуте ждут один расчет
+        self._flights = SingleFlight()
     
-    def calculate_chart(self, dt: datetime, latitude: float = 55.75, longitude: float = 37.62) -> HoraryChart:
+    @staticmethod
+    def minute_bucket(dt: datetime) -> datetime:
+        return dt.replace(second=0, microsecond=0)
+    
+    def get_chart(
+        self,
+        dt: datetime,
+        latitude: float = DEFAULT_LATITUDE,
+        longitude: float = DEFAULT_LONGITUDE,
+        house_system: bytes = b'P'
+    ) -> HoraryChart:
+        """
+        Хорарная карта на минуту вопроса из кэша (при промахе - расчет и сохранение).
+        Карта общая для всех вопросов этой минуты и места - ее нельзя менять.
+        """
+        key = self._key(dt, latitude, longitude, house_system)
+        chart = self._cached(key)
+        if chart is None:
+            chart = self._store(key, self.calculate_chart(*key))
+        return chart
+    
+    async def get_chart_async(
+        self,
+        dt: datetime,
+        latitude: float = DEFAULT_LATITUDE,
+        longitude: float = DEFAULT_LONGITUDE,
+        house_system: bytes = b'P'
+    ) -> HoraryChart:
+        """get_chart, при промахе кэша расчет идет в пуле процессов (event loop не блокируется)"""
+        key = self._key(dt, latitude, longitude, house_system)
+        chart = self._cached(key)
+        if chart is None:
+            chart = await self._flights.do(key, self._calculate_async, key)
+        return chart
+    
+    async def _calculate_async(self, key: Tuple[datetime, float, float, bytes]) -> HoraryChart:
+        chart = self._cached(key, count=False)
+        if chart is None:
+            chart = self._store(key, await executors.run_cpu(_calculate_chart, *key))
+        return chart
+    
+    def _key(self, dt: datetime, latitude: float, longitude: float, house_system: bytes):
+        return (
+            self.minute_bucket(dt),
+            round(latitude, self.COORD_PRECISION),
+            round(longitude, self.COORD_PRECISION),
+            house_system,
+        )
+    
+    def _cached(self, key, count: bool = True) -> Optional[HoraryChart]:
+        chart = self._charts.get(key)
+        if chart is not None:
+            self._charts.move_to_end(key)
+        if count:
+            if chart is not None:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+        return chart
+    
+    def _store(self, key, chart: HoraryChart) -> HoraryChart:
+        self.format_chart(chart)
+        self._charts[key] = chart
+        while len(self._charts) > self.CACHE_SIZE:
+            self._charts.popitem(last=False)
+        return chart
+    
+    def precompute(self, now: Optional[datetime] = None) -> HoraryChart:
+        """Рассчитать карты текущей и следующей минуты заранее (вызывается фоновой задачей)"""
+        now = now or datetime.now()
+        self.get_chart(now)
+        return self.get_chart(now + timedelta(minutes=1))
+    
+    async def precompute_async(self, now: Optional[datetime] = None) -> HoraryChart:
+        """precompute в пуле процессов"""
+        now = now or datetime.now()
+        await self.get_chart_async(now)
+        return await self.get_chart_async(now + timedelta(minutes=1))
+    
+    def calculate_chart(
+        self,
+        dt: datetime,
+        latitude: float = DEFAULT_LATITUDE,
+        longitude: float = DEFAULT_LONGITUDE,
+        house_system: bytes = b'P'
+    ) -> HoraryChart:
         """
         Рассчитать хорарную карту
         
@@ -67,17 +171,17 @@ class HoraryAstrology:
             dt: Время вопроса
             latitude: Широта места (по умолчанию Москва)
             longitude: Долгота места (по умолчанию Москва)
+            house_system: Система домов Swiss Ephemeris (по умолчанию Плацидус)
         """
         # Преобразуем время в Julian Day
-        jd = swe.julday(dt.year, dt.month, dt.day, 
-                       dt.hour + dt.minute/60.0 + dt.second/3600.0)
+        jd = julian_day(dt)
         
-        # Рассчитываем планеты
+        # Рассчитываем планеты (из таблицы эфемерид, вне ее - через swisseph)
         planets = {}
-        for name, planet_id in self.PLANETS.items():
-            position = swe.calc_ut(jd, planet_id)[0]
-            lon = position[0]  # Эклиптическая долгота
-            speed = position[3]  # Скорость (для определения ретроградности)
+        for name, position in body_positions(jd, list(self.PLANETS)).items():
+            if position is None:
+                continue
+            lon, speed = position  # Эклиптическая долгота и скорость (для ретроградности)
             
             planets[name] = Planet(
                 name=name,
@@ -87,8 +191,8 @@ class HoraryAstrology:
                 retrograde=(speed < 0)
             )
         
-        # Рассчитываем дома (система Плацидуса)
-        houses_cusps = swe.houses(jd, latitude, longitude, b'P')[0]  # 'P' = Placidus
+        # Рассчитываем дома (по умолчанию система Плацидуса)
+        houses_cusps = calc_houses(jd, latitude, longitude, house_system)  # 'P' = Placidus
         ascendant = houses_cusps[0]
         mc = houses_cusps[9]  # 10-й дом (MC)
         
@@ -161,6 +265,9 @@ class HoraryAstrology:
     
     def format_chart(self, chart: HoraryChart) -> str:
         """Форматировать карту для отображения"""
+        if chart.formatted is not None:
+            return chart.formatted
+        
         result = f"""
 ⭐ **Хорарная карта**
 Время вопроса: {chart.question_time.strftime('%Y-%m-%d %H:%M:%S')}
@@ -176,7 +283,8 @@ class HoraryAstrology:
         
         result += f"\n\n{chart.interpretation}"
         
-        return result.strip()
+        chart.formatted = result.strip()
+        return chart.formatted
     
     def _format_degree(self, longitude: float) -> str:
         """Форматировать градус"""
@@ -187,3 +295,10 @@ class HoraryAstrology:
 
 # Singleton
 horary = HoraryAstrology()
+
+
+def _calculate_chart(*args) -> HoraryChart:
+    """Точка входа для пула процессов (функция модуля сериализуется по имени); текст карты - там же"""
+    chart = horary.calculate_chart(*args)
+    horary.format_chart(chart)
+    return chart
@@ -2,13 +2,16 @@
 Модуль парсинга гороскопов
 Получение ежедневных гороскопов с различных сайтов
 """
-import aiohttp
 from bs4 import BeautifulSoup
 from dataclasses import dataclass
 from typing import Optional, Dict
 from datetime import datetime
 import random
 
+from oracle.executors import executors
+from oracle.http_client import http_client
+from oracle.singleflight import SingleFlight
+
 
 @dataclass
 class Horoscope:
@@ -26,9 +29,30 @@ class Horoscope:
     source: str = "horo.mail.ru"
 
 
+def parse_horo_mail_ru_text(html: str) -> Optional[str]:
+    """Текст гороскопа со страницы horo.mail.ru (выполняется в пуле процессов)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Ищем текст гороскопа
+    # Структура сайта может меняться, поэтому это упрощенный парсинг
+    text_blocks = soup.find_all('p', class_='article__text')
+    
+    if not text_blocks:
+        # Пробуем альтернативный селектор
+        text_blocks = soup.find_all('div', class_='article__item__text')
+    
+    if text_blocks:
+        return ' '.join([block.get_text(strip=True) for block in text_blocks[:2]])
+    return None
+
+
 class HoroscopeParser:
     """Парсер гороскопов"""
     
+    def __init__(self):
+        # Одновременные запросы одного знака и периода ждут один парсинг
+        self._flights = SingleFlight()
+    
     ZODIAC_SIGNS = {
         'овен': 'aries',
         'телец': 'taurus',
@@ -172,7 +196,7 @@ class HoroscopeParser:
         
         # Пытаемся спарсить с сайта
         try:
-            horoscope = await self._parse_horo_mail_ru(sign_en, period)
+            horoscope = await self._flights.do((sign_en, period), self._parse_horo_mail_ru, sign_en, period)
             if horoscope:
                 return horoscope
         except Exception as e:
@@ -195,32 +219,21 @@ class HoroscopeParser:
         url = f"https://horo.mail.ru/prediction/{sign}/{url_period}/"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=10) as response:
-                    if response.status != 200:
-                        return None
-                    
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    # Ищем текст гороскопа
-                    # Структура сайта может меняться, поэтому это упрощенный парсинг
-                    text_blocks = soup.find_all('p', class_='article__text')
-                    
-                    if not text_blocks:
-                        # Пробуем альтернативный селектор
-                        text_blocks = soup.find_all('div', class_='article__item__text')
-                    
-                    if text_blocks:
-                        general_text = ' '.join([block.get_text(strip=True) for block in text_blocks[:2]])
-                        
-                        return Horoscope(
-                            sign=self.SIGN_NAMES_RU.get(sign, sign),
-                            period=period,
-                            date=datetime.now(),
-                            general=general_text,
-                            source='horo.mail.ru'
-                        )
+            async with http_client.session.get(url, timeout=10) as response:
+                if response.status != 200:
+                    return None
+                
+                html = await response.text()
+                # Разбор HTML - чистый Python, в пуле процессов
+                general_text = await executors.run_cpu(parse_horo_mail_ru_text, html)
+                if general_text:
+                    return Horoscope(
+                        sign=self.SIGN_NAMES_RU.get(sign, sign),
+                        period=period,
+                        date=datetime.now(),
+                        general=general_text,
+                        source='horo.mail.ru'
+                    )
         
         except Exception as e:
             print(f"Ошибка при парсинге: {e}")
@@ -1,12 +1,15 @@
 """
 Модуль для получения лунного календаря
 """
-import aiohttp
 from bs4 import BeautifulSoup
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+from oracle.executors import executors
+from oracle.http_client import http_client
+from oracle.singleflight import SingleFlight
+
 @dataclass
 class MoonInfo:
     """Информация о Луне"""
@@ -16,94 +19,107 @@ class MoonInfo:
     description: str
     recommendations: str
 
+def parse_moon_page(html: str) -> MoonInfo:
+    """Разобрать страницу лунного календаря (выполняется в пуле процессов)"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    lunar_day = "Неизвестно"
+    phase = "Неизвестно"
+    sign = "Неизвестно"
+    description = ""
+    recommendations = ""
+
+    # 1. Извлекаем основные данные из таблицы .moon-day-info-2
+    info_table = soup.select_one('table.moon-day-info-2')
+    if info_table:
+        for row in info_table.find_all('tr'):
+            cells = row.find_all('td')
+            if len(cells) >= 2:
+                label = cells[0].get_text(strip=True).lower()
+                value = cells[1].get_text(strip=True)
+
+                if "лунные сутки" in label:
+                    lunar_day = value
+                elif "фаза луны" in label:
+                    phase = value
+                elif "луна в знаке" in label:
+                    sign = value
+
+    # 2. Общее описание (первый абзац после таблиц)
+    main_container = soup.select_one('article.moon-day')
+    if main_container:
+        # Ищем первый p, который не внутри таблиц
+        summary_p = main_container.find('p', recursive=False)
+        if not summary_p:
+             # Если не нашли напрямую, ищем любой p в начале
+             summary_p = main_container.find('p')
+        if summary_p:
+            description = summary_p.get_text(strip=True)
+
+    # 3. Детальные рекомендации (из блоков влияния .moon-effect)
+    influence_sections = soup.select('section.moon-effect')
+    if influence_sections:
+        recs_list = []
+        for section in influence_sections:
+            h2 = section.find('h2')
+            p_div = section.select_one('div p')
+            if h2 and p_div:
+                title = h2.get_text(strip=True)
+                text = p_div.get_text(strip=True)
+                # Ограничиваем длину
+                if len(text) > 250:
+                    text = text[:247] + "..."
+                recs_list.append(f"🔹 *{title}:*\n{text}")
+
+        if recs_list:
+            # Берем самые важные (обычно первые 3: сутки, фаза, знак)
+            recommendations = "\n\n".join(recs_list[:4])
+
+    # Если рекомендаций нет в блоке влияния, пробуем найти другие абзацы
+    if not recommendations and main_container:
+        all_ps = main_container.find_all('p')
+        if len(all_ps) > 1:
+            recommendations = all_ps[1].get_text(strip=True)
+
+    return MoonInfo(
+        lunar_day=lunar_day,
+        phase=phase,
+        sign=sign,
+        description=description,
+        recommendations=recommendations
+    )
+
+
 class MoonParser:
     """Парсер лунного календаря с my-calend.ru"""
     
     BASE_URL = "https://my-calend.ru/moon"
 
+    def __init__(self):
+        # Все, кто открыл /moon одновременно, ждут один запрос к сайту
+        self._flights = SingleFlight()
+
     async def get_moon_info(self, date_str: str = None) -> Optional[MoonInfo]:
         """
         Получить информацию о Луне.
         date_str: 'today', 'tomorrow' или 'yesterday' (или None для сегодня)
         """
         period = date_str if date_str in ['today', 'tomorrow', 'yesterday'] else 'today'
+        return await self._flights.do(period, self._fetch_moon_info, period)
+
+    async def _fetch_moon_info(self, period: str) -> Optional[MoonInfo]:
+        """Загрузить и разобрать страницу лунного календаря"""
         url = f"{self.BASE_URL}/{period}"
             
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=15) as response:
-                    if response.status != 200:
-                        return None
-                    
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    lunar_day = "Неизвестно"
-                    phase = "Неизвестно"
-                    sign = "Неизвестно"
-                    description = ""
-                    recommendations = ""
-
-                    # 1. Извлекаем основные данные из таблицы .moon-day-info-2
-                    info_table = soup.select_one('table.moon-day-info-2')
-                    if info_table:
-                        for row in info_table.find_all('tr'):
-                            cells = row.find_all('td')
-                            if len(cells) >= 2:
-                                label = cells[0].get_text(strip=True).lower()
-                                value = cells[1].get_text(strip=True)
-                                
-                                if "лунные сутки" in label:
-                                    lunar_day = value
-                                elif "фаза луны" in label:
-                                    phase = value
-                                elif "луна в знаке" in label:
-                                    sign = value
-
-                    # 2. Общее описание (первый абзац после таблиц)
-                    main_container = soup.select_one('article.moon-day')
-                    if main_container:
-                        # Ищем первый p, который не внутри таблиц
-                        summary_p = main_container.find('p', recursive=False)
-                        if not summary_p:
-                             # Если не нашли напрямую, ищем любой p в начале
-                             summary_p = main_container.find('p')
-                        if summary_p:
-                            description = summary_p.get_text(strip=True)
-
-                    # 3. Детальные рекомендации (из блоков влияния .moon-effect)
-                    influence_sections = soup.select('section.moon-effect')
-                    if influence_sections:
-                        recs_list = []
-                        for section in influence_sections:
-                            h2 = section.find('h2')
-                            p_div = section.select_one('div p')
-                            if h2 and p_div:
-                                title = h2.get_text(strip=True)
-                                text = p_div.get_text(strip=True)
-                                # Ограничиваем длину
-                                if len(text) > 250:
-                                    text = text[:247] + "..."
-                                recs_list.append(f"🔹 *{title}:*\n{text}")
-                        
-                        if recs_list:
-                            # Берем самые важные (обычно первые 3: сутки, фаза, знак)
-                            recommendations = "\n\n".join(recs_list[:4])
-
-                    # Если рекомендаций нет в блоке влияния, пробуем найти другие абзацы
-                    if not recommendations and main_container:
-                        all_ps = main_container.find_all('p')
-                        if len(all_ps) > 1:
-                            recommendations = all_ps[1].get_text(strip=True)
-
-                    return MoonInfo(
-                        lunar_day=lunar_day,
-                        phase=phase,
-                        sign=sign,
-                        description=description,
-                        recommendations=recommendations
-                    )
-                    
+            async with http_client.session.get(url, timeout=15) as response:
+                if response.status != 200:
+                    return None
+                
+                html = await response.text()
+                # Разбор HTML - чистый Python, в пуле процессов
+                return await executors.run_cpu(parse_moon_page, html)
+                
         except Exception as e:
             print(f"Ошибка при получении лунного календаря: {e}")
             return None
@@ -0,0 +1,72 @@
+"""
+Общий HTTP клиент приложения
+Одна aiohttp-сессия с пулом соединений (keep-alive, лимиты на хост, кэш DNS)
+вместо новой сессии и нового TLS-рукопожатия на каждый запрос
+"""
+from typing import Optional
+
+import aiohttp
+from loguru import logger
+
+from config.settings import settings
+
+
+class HTTPClient:
+    """Пул исходящих HTTP соединений (парсеры, Whisper, HuggingFace)"""
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        dns_ttl: int = 300,
+        keepalive_timeout: float = 30.0,
+        timeout: float = 30.0
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Открыть сессию (вызывается из post_init приложения)"""
+        self._open()
+
+    def _open(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            logger.info(f"HTTP pool opened (limit={self.limit}, per host={self.limit_per_host})")
+        return self._session
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Общая сессия. Если приложение ее еще не открыло (скрипты, тесты),
+        она создается при первом обращении внутри event loop.
+        """
+        return self._open()
+
+    async def close(self):
+        """Закрыть сессию и все соединения (вызывается из post_shutdown)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("HTTP pool closed")
+        self._session = None
+
+
+# Singleton
+http_client = HTTPClient(
+    limit=settings.http_pool_limit,
+    limit_per_host=settings.http_pool_limit_per_host,
+    dns_ttl=settings.http_dns_cache_ttl,
+)
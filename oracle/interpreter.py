@@ -1,81 +1,42 @@
 """
 AI Интерпретатор - объединяет все методы гадания
 """
-from typing import Dict, Any
+import time
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
 from datetime import datetime
-import openai
-from anthropic import Anthropic
+
+from loguru import logger
 
 from config.settings import settings
+from oracle.llm_scheduler import llm_scheduler
+from oracle.response_cache import response_cache, make_cache_key
+from oracle.singleflight import SingleFlight
+from oracle.metrics import metrics
 from oracle.iching.iching import iching, Hexagram
 from oracle.tarot.tarot import tarot, TarotCard
 from oracle.horary.horary import horary, HoraryChart
 
 
+INTERPRETATION_ERROR_TEXT = "Взору моему предстала пелена (Ошибка связи с Источником). Попробуй позже."
+
+# Меняется при правке промпта сфер - старые ответы в кэше перестают совпадать
+SPHERE_PROMPT_VERSION = 1
+
+
 class OracleInterpreter:
     """Интерпретатор оракула, объединяющий все методы"""
     
     def __init__(self):
-        # 1. Авто-определение провайдера если ключи не совпадают с настройками
-        provider = settings.ai_provider
-        
-        # Если выбран OpenAI, но ключа нет, а Groq есть -> переключаем на Groq
-        if provider == "openai" and not settings.openai_api_key and settings.groq_api_key:
-            print("🔄 OpenAI key missing, switching to GROQ")
-            provider = "groq"
-            
-        # 2. Инициализация клиента
-        if provider == "groq":
-            if not settings.groq_api_key:
-                 # Если и Groq ключа нет, но есть OpenAI (на всякий случай)
-                 if settings.openai_api_key:
-                     print("⚠️ Groq key missing, falling back to OpenAI")
-                     provider = "openai"
-                 else:
-                     raise ValueError("❌ AI Error: No API keys found! Set GROQ_API_KEY or OPENAI_API_KEY.")
-            
-            if provider == "groq":
-                self.client = openai.OpenAI(
-                    api_key=settings.groq_api_key,
-                    base_url="https://api.groq.com/openai/v1"
-                )
-                self.ai_provider = "openai" # Технически используем OpenAI либу
-                self.is_groq = True
-                print("🚀 Groq API initialized")
-
-        if provider == "openai":
-            if not settings.openai_api_key:
-                 raise ValueError("❌ AI Error: OpenAI API key missing!")
-            self.client = openai.OpenAI(api_key=settings.openai_api_key)
-            self.ai_provider = "openai"
-            self.is_groq = False
-            
-        elif provider == "anthropic":
-            if not settings.anthropic_api_key:
-                 raise ValueError("❌ AI Error: Anthropic API key missing!")
-            self.client = Anthropic(api_key=settings.anthropic_api_key)
-            self.ai_provider = "anthropic"
-            self.is_groq = False
-
-        # 3. Настройка модели
-        self.model = settings.ai_model
-        
-        # Если включен Groq, но модель от OpenAI -> меняем на Llama
-        if getattr(self, 'is_groq', False) and self.model.startswith("gpt"):
-             print(f"⚠️ Switching model {self.model} -> llama-3.3-70b-versatile (Groq compatible)")
-             self.model = "llama-3.3-70b-versatile"
+        # Очередь с приоритетами -> роутер провайдеров (самый быстрый здоровый, хедж, переключение)
+        self.llm = llm_scheduler
+        # Одинаковые одновременные запросы (та же сфера и те же данные) ждут один ответ модели
+        self._flights = SingleFlight()
 
-        # --- DIAGNOSTIC LOGGING ---
-        try:
-            censored_groq = f"{settings.groq_api_key[:4]}...{settings.groq_api_key[-4:]}" if settings.groq_api_key else "None"
-            censored_openai = f"{settings.openai_api_key[:4]}...{settings.openai_api_key[-4:]}" if settings.openai_api_key else "None"
-            print(f"DEBUG: Oracle Init Complete.")
-            print(f"DEBUG: Config Provider={settings.ai_provider} -> Final Provider={self.ai_provider} (is_groq={getattr(self, 'is_groq', False)})")
-            print(f"DEBUG: Keys -> Groq={censored_groq}, OpenAI={censored_openai}")
-            print(f"DEBUG: Selected Model={self.model}")
-        except Exception as e:
-            print(f"DEBUG: Logging error: {e}")
-        # --------------------------
+        logger.info(
+            f"Oracle init: config provider={settings.ai_provider}, "
+            f"providers={[f'{p.name}:{p.model}' for p in self.llm.providers]}"
+        )
 
     
     async def process_question(self, question: str, user_name: str = "Искатель", is_premium: bool = False) -> Dict[str, Any]:
@@ -90,69 +51,63 @@ class OracleInterpreter:
             Словарь с результатами гадания и интерпретацией
         """
         try:
-            print(f"DEBUG: Starting process_question for {user_name}")
-            
-            # 1. И-Цзин - бросаем монеты
-            print("DEBUG: Step 1 - Iching casting...")
-            try:
-                primary_hex, secondary_hex = iching.cast_coins()
-                print(f"DEBUG: Iching done (Hex {primary_hex.number})")
-            except Exception as e:
-                print(f"❌ DEBUG: Iching failed: {e}")
-                # We can potentially continue even if Iching fails, but for now let's re-raise
-                # To be robust, one could set dummy values here.
-                raise e
+            result = await self.cast_divination(question)
             
-            # 2. Таро - карта дня
-            print("DEBUG: Step 2 - Tarot drawing...")
-            try:
-                tarot_card = tarot.card_of_the_day()
-                print(f"DEBUG: Tarot done ({tarot_card.name})")
-            except Exception as e:
-                print(f"❌ DEBUG: Tarot failed: {e}")
-                raise e
-            
-            # 3. Хорарная астрология
-            print("DEBUG: Step 3 - Horary casting...")
-            horary_chart = None
-            try:
-                now = datetime.now()
-                # Use a safeguard for horary as it relies on external C library/files
-                if hasattr(horary, 'calculate_chart'):
-                     horary_chart = horary.calculate_chart(now)
-                     print("DEBUG: Horary done")
-                else:
-                     print("DEBUG: Horary module seems incomplete, skipping.")
-            except Exception as e:
-                 print(f"❌ DEBUG: Horary failed: {e}")
-                 print("⚠️ Proceeding without Horary chart due to error.")
-                 # Fail-open: create a dummy chart or just pass None if handled downstream
-                 # For now, let's allow it to be None and handle it in formatting
+            # 5. Получаем интерпретацию от AI
+            result['interpretation'] = await self._get_ai_interpretation(
+                question, result['divination_data'], user_name, is_premium
+            )
             
-            # 4. Формируем промпт для AI
-            print("DEBUG: Step 4 - Prompt construction...")
-            # Handle potential None in horary_chart if we failed open
+            return result
+        except Exception as e:
+            logger.exception(f"CRITICAL ERROR in process_question: {e}")
+            raise e
+    
+    async def cast_divination(self, question: str) -> Dict[str, Any]:
+        """
+        Провести гадание (И-Цзин, Таро, хорарная карта) без обращения к AI
+        
+        Returns:
+            Словарь с результатами гадания и текстом для промпта ('divination_data')
+        """
+        # 1. И-Цзин - бросаем монеты
+        with metrics.span("iching"):
+            primary_hex, secondary_hex = iching.cast_coins()
+        
+        # 2. Таро - карта дня
+        with metrics.span("tarot"):
+            tarot_card = tarot.card_of_the_day()
+        
+        # 3. Хорарная астрология
+        horary_chart = None
+        now = datetime.now()
+        try:
+            # Use a safeguard for horary as it relies on external C library/files
+            # Карта на минуту вопроса обычно уже посчитана фоновой задачей (иначе - в пуле процессов)
+            with metrics.span("horary"):
+                horary_chart = await horary.get_chart_async(now)
+        except Exception as e:
+            # Fail-open: без хорарной карты гадание все равно состоится
+            logger.warning(f"Horary failed, proceeding without chart: {e}")
+        
+        # 4. Формируем промпт для AI
+        with metrics.span("prompt"):
             if horary_chart:
-                 divination_data = self._format_divination_data(
+                divination_data = self._format_divination_data(
                     question, primary_hex, secondary_hex, tarot_card, horary_chart
-                 )
+                )
             else:
-                 # Manually construct prompt without horary
-                 divination_data = f"""
-                 1. Гексаграмма И-Цзин: {primary_hex.number} ({primary_hex.name})
-                 {primary_hex.description}
-                 
-                 2. Карта Таро: {tarot_card.name} ({tarot_card.position})
-                 {tarot_card.meaning}
-                 
-                 3. Хорарная карта: Не удалось построить (техническая заминка).
-                 """
-            
-            # 5. Получаем интерпретацию от AI
-            print(f"DEBUG: Step 5 - AI Inference ({self.ai_provider})...")
-            ai_interpretation = await self._get_ai_interpretation(question, divination_data, user_name, is_premium)
-            print("DEBUG: AI Inference done")
-            
+                # Manually construct prompt without horary
+                divination_data = f"""
+             1. Гексаграмма И-Цзин: {primary_hex.number} ({primary_hex.name})
+             {primary_hex.description}
+             
+             2. Карта Таро: {tarot_card.name} ({tarot_card.position})
+             {tarot_card.meaning}
+             
+             3. Хорарная карта: Не удалось построить (техническая заминка).
+             """
+        
             return {
                 'question': question,
                 'timestamp': now,
@@ -170,13 +125,8 @@ class OracleInterpreter:
                     # Safe formatting if chart is None
                     'formatted': horary.format_chart(horary_chart) if horary_chart else "Хорарная карта временно недоступна"
                 },
-                'interpretation': ai_interpretation
+                'divination_data': divination_data
             }
-        except Exception as e:
-            print(f"❌ CRITICAL ERROR in process_question: {e}")
-            import traceback
-            traceback.print_exc()
-            raise e
     
     def _format_divination_data(
         self, 
@@ -210,8 +160,8 @@ class OracleInterpreter:
         
         return data
     
-    async def _get_ai_interpretation(self, question: str, divination_data: str, user_name: str, is_premium: bool = False) -> str:
-        """Получить AI интерпретацию"""
+    def _interpretation_prompts(self, divination_data: str, is_premium: bool = False) -> Tuple[str, str, int]:
+        """Промпты и лимит длины для основной интерпретации"""
         
         style = "Глубоко, подробно, раскрывая скрытые смыслы." if is_premium else "Кратко (до 120 слов), конкретно."
         max_len = 800 if is_premium else 400
@@ -225,42 +175,50 @@ class OracleInterpreter:
 3. Магическое действие: Что, когда и как изменить в реальности (даты, символы, ритуальные жесты)."""
 
         user_prompt = f"{divination_data}\n\nДай свою интерпретацию, о мудрый Оракул."
+        return system_prompt, user_prompt, max_len
+    
+    async def _get_ai_interpretation(self, question: str, divination_data: str, user_name: str, is_premium: bool = False) -> str:
+        """Получить AI интерпретацию"""
+        system_prompt, user_prompt, max_len = self._interpretation_prompts(divination_data, is_premium)
         
-        if self.ai_provider == "openai":
-            try:
-                print(f"DEBUG: sending request to {self.ai_provider} with model {self.model}...")
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.8,
-                    max_tokens=max_len
+        try:
+            with metrics.span("llm"):
+                return await self.llm.complete(
+                    system_prompt, user_prompt, temperature=0.8, max_tokens=max_len, premium=is_premium
                 )
-                print("DEBUG: Request successful.")
-                return response.choices[0].message.content
-            except Exception as e:
-                print(f"❌ API ERROR ({self.ai_provider}): {e}")
-                import traceback
-                traceback.print_exc()
-                return "Взору моему предстала пелена (Ошибка связи с Источником). Попробуй позже."
+        except Exception as e:
+            logger.exception(f"API ERROR: {e}")
+            return INTERPRETATION_ERROR_TEXT
+    
+    async def stream_interpretation(self, question: str, divination_data: str, user_name: str, is_premium: bool = False) -> AsyncIterator[str]:
+        """Потоковая AI интерпретация: отдает фрагменты текста по мере генерации"""
+        system_prompt, user_prompt, max_len = self._interpretation_prompts(divination_data, is_premium)
         
-        elif self.ai_provider == "anthropic":
-            try:
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=max_len,
-                    temperature=0.8,
-                    system=system_prompt,
-                    messages=[
-                        {"role": "user", "content": user_prompt}
-                    ]
-                )
-                return response.content[0].text
-            except Exception as e:
-                print(f"❌ API ERROR (Anthropic): {e}")
-                return "Источник временно недоступен."
+        received = False
+        has_text = False
+        started = time.perf_counter()
+        try:
+            async with aclosing(self.llm.stream(
+                system_prompt, user_prompt, temperature=0.8, max_tokens=max_len, premium=is_premium
+            )) as chunks:
+                async for chunk in chunks:
+                    if not received:
+                        received = True
+                        metrics.observe("llm_ttft", time.perf_counter() - started)
+                    has_text = has_text or bool(chunk.strip())
+                    yield chunk
+            metrics.observe("llm", time.perf_counter() - started)
+        except Exception as e:
+            logger.error(f"API ERROR (stream): {e}")
+            # Если текст уже пошел - оставляем то, что успели получить
+            if not received:
+                yield INTERPRETATION_ERROR_TEXT
+            return
+        
+        # Поток закончился без текста (пустой ответ модели) - пустое сообщение Telegram не примет
+        if not has_text:
+            logger.warning("LLM stream ended without text, falling back to complete()")
+            yield await self._get_ai_interpretation(question, divination_data, user_name, is_premium=is_premium)
     
     async def generate_followup_response(self, original_question: str, followup_question: str, context: Dict[str, Any]) -> str:
         """Ответить на уточняющий вопрос"""
@@ -273,33 +231,56 @@ class OracleInterpreter:
 
 Ответь коротко и точно."""
         
-        if self.ai_provider == "openai":
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=300  # Уменьшено с 800 до 300
-            )
-            return response.choices[0].message.content
-        elif self.ai_provider == "anthropic":
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=300,
-                temperature=0.7,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-            return response.content[0].text
-        return "Источник временно молчит..."
+        return await self.llm.complete(system_prompt, user_prompt, temperature=0.7, max_tokens=300)
             
-    async def get_sphere_interpretation(self, sphere_name: str, calc_type: str, calc_data: str, user_name: str = "Искатель", is_premium: bool = False) -> str:
-        """Получить интерпретацию конкретной сферы жизни"""
+    async def get_sphere_interpretation(
+        self,
+        sphere_name: str,
+        calc_type: str,
+        calc_data: Any,
+        user_name: str = "Искатель",
+        is_premium: bool = False,
+        period: str | None = None
+    ) -> str:
+        """
+        Получить интерпретацию конкретной сферы жизни
         
+        Расчеты Сюцай/Матрицы - чистые функции даты рождения, поэтому ответ кэшируется
+        по (тип расчета, данные, сфера, период, тариф, версия промпта) и делится между
+        пользователями. Имя пользователя в промпт не попадает.
+        
+        Args:
+            calc_data: Результат расчета (dataclass, dict или строка)
+            period: None - общий разбор, 'week'/'month' - прогноз на период
+        """
+        cache_key = make_cache_key(
+            kind="sphere",
+            calc_type=calc_type,
+            calc_data=calc_data,
+            sphere=sphere_name,
+            period=period,
+            premium=is_premium,
+            prompt_version=SPHERE_PROMPT_VERSION
+        )
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        return await self._flights.do(
+            cache_key, self._generate_sphere_interpretation,
+            cache_key, sphere_name, calc_type, calc_data, is_premium, period
+        )
+    
+    async def _generate_sphere_interpretation(
+        self,
+        cache_key: str,
+        sphere_name: str,
+        calc_type: str,
+        calc_data: Any,
+        is_premium: bool,
+        period: str | None
+    ) -> str:
+        """Запрос интерпретации сферы к модели (с сохранением в кэш)"""
         spheres_ru = {
             "health": "Здоровье и Энергия",
             "career": "Карьера и Реализация",
@@ -324,33 +305,20 @@ class OracleInterpreter:
 
 СФЕРА ДЛЯ АНАЛИЗА: {sphere_label}
 
-Дай глубокую интерпретацию для {user_name}."""
-
-        if self.ai_provider == "openai":
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8,
-                max_tokens=max_len
-            )
-            return response.choices[0].message.content
-        elif self.ai_provider == "anthropic":
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=max_len,
-                temperature=0.8,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}]
-            )
-            return response.content[0].text
-            
-        return "Источник сейчас в тишине..."
+Дай глубокую интерпретацию для Искателя."""
 
-    async def get_daily_guidance(self) -> str:
-        """Получить послание дня (карта Таро + трактовка)"""
+        if period:
+            period_ru = "неделю" if period == "week" else "месяц"
+            user_prompt += f"\n\nВАЖНО: Дай рекомендации именно на предстоящий {period_ru}."
+
+        interpretation = await self.llm.complete(
+            system_prompt, user_prompt, temperature=0.8, max_tokens=max_len, premium=is_premium
+        )
+        await response_cache.set(cache_key, interpretation)
+        return interpretation
+
+    async def get_daily_guidance(self, sign_ru: Optional[str] = None) -> str:
+        """Получить послание дня (карта Таро + трактовка), общее или для знака зодиака"""
         # Тянем карту
         card = tarot.card_of_the_day()
         card_info = tarot.deck.format_card(card)
@@ -358,27 +326,14 @@ class OracleInterpreter:
         system_prompt = """Ты — Оракул Источника. Твоя задача: дать мудрое напутствие на день.
 Стиль: Б. Виноградский. Лаконично, метафорично. Не называй карту. Дай один совет (до 70 слов)."""
 
+        addressee = f"\nПослание для знака зодиака: {sign_ru}. Учитывай его природу, но не называй знак.\n" if sign_ru else ""
         user_prompt = f"""
 Энергия дня (карта Таро):
 {card_info}
-
+{addressee}
 Дай мудрое послание на этот день."""
 
-        if self.ai_provider == "openai":
-            response = self.client.chat.completions.create(
-                model=settings.ai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8,
-                max_tokens=200
-            )
-            return response.choices[0].message.content
-        else:
-             # Fallback для антропика если используется
-             pass
-        return "Сегодня день тишины. Прислушайся к себе."
+        return await self.llm.complete(system_prompt, user_prompt, temperature=0.8, max_tokens=200)
 
 
     async def get_tarot_spread_interpretation(self, sphere_name: str, cards: list, user_name: str = "Искатель", is_premium: bool = False) -> str:
@@ -403,27 +358,9 @@ class OracleInterpreter:
 
 О Мудрый Оракул, пролей свет на путь {user_name} в этой сфере."""
 
-        if self.ai_provider == "openai":
-            response = self.client.chat.completions.create(
-                model=settings.ai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8,
-                max_tokens=max_len
-            )
-            return response.choices[0].message.content
-        elif self.ai_provider == "anthropic":
-            response = self.client.messages.create(
-                model=settings.ai_model,
-                max_tokens=max_len,
-                temperature=0.8,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}]
-            )
-            return response.content[0].text
-        return "Карты молчат, но Источник все помнит..."
+        return await self.llm.complete(
+            system_prompt, user_prompt, temperature=0.8, max_tokens=max_len, premium=is_premium
+        )
 
 
     async def interpret_dream(self, dream_text: str, user_name: str = "Искатель", is_premium: bool = False, personal_data: Dict[str, Any] = None) -> str:
@@ -453,27 +390,9 @@ class OracleInterpreter:
 
 Раскрой этот сон максимально глубоко, учитывая эти личные данные. Объясни, как сон резонирует с Личностью Искателя и текущим моментом."""
 
-        if self.ai_provider == "openai":
-            response = self.client.chat.completions.create(
-                model=settings.ai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8,
-                max_tokens=max_len
-            )
-            return response.choices[0].message.content
-        elif self.ai_provider == "anthropic":
-            response = self.client.messages.create(
-                model=settings.ai_model,
-                max_tokens=max_len,
-                temperature=0.8,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}]
-            )
-            return response.content[0].text
-        return "Сновидения ускользают от меня сейчас..."
+        return await self.llm.complete(
+            system_prompt, user_prompt, temperature=0.8, max_tokens=max_len, premium=is_premium
+        )
 
 
 # Singleton
@@ -0,0 +1,245 @@
+"""
+Асинхронный слой LLM-провайдеров
+Неблокирующие клиенты для OpenAI-совместимых API (OpenAI, Groq, Together),
+Anthropic и HuggingFace Inference API
+"""
+from typing import AsyncIterator, List, Optional
+
+import anthropic
+import openai
+
+from config.settings import settings
+from oracle.http_client import http_client
+
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+TOGETHER_BASE_URL = "https://api.together.xyz/v1"
+HUGGINGFACE_BASE_URL = "https://api-inference.huggingface.co/models"
+
+# Модели по умолчанию (AI_MODEL применяется только к провайдеру из AI_PROVIDER)
+DEFAULT_MODELS = {
+    "groq": "llama-3.3-70b-versatile",
+    "openai": "gpt-4-turbo-preview",
+    "anthropic": "claude-3-haiku-20240307",
+    "together": "meta-llama/Llama-3-70b-chat-hf",
+    "huggingface": "mistralai/Mixtral-8x7B-Instruct-v0.1",
+}
+GROQ_DEFAULT_MODEL = DEFAULT_MODELS["groq"]
+
+# Порядок опроса провайдеров, если AI_PROVIDER не задает другой
+PROVIDER_PRIORITY = ["groq", "openai", "anthropic", "together", "huggingface"]
+
+
+class LLMProviderError(Exception):
+    """Ошибка обращения к провайдеру (с HTTP статусом, если он известен)"""
+
+    def __init__(self, provider: str, message: str, status: int | None = None, retry_after: float | None = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        """Временная ошибка (лимиты, 5xx, сеть) - имеет смысл переключиться на другой провайдер"""
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+def _as_provider_error(provider: str, error: Exception) -> LLMProviderError:
+    """Привести исключение SDK/HTTP клиента к LLMProviderError"""
+    if isinstance(error, LLMProviderError):
+        return error
+
+    status = getattr(error, 'status_code', None) or getattr(error, 'status', None)
+    retry_after = None
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers is not None:
+        try:
+            retry_after = float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            retry_after = None
+
+    return LLMProviderError(provider, str(error) or error.__class__.__name__, status, retry_after)
+
+
+class LLMProvider:
+    """Асинхронный LLM провайдер с единым интерфейсом"""
+
+    def __init__(self, name: str, kind: str, client, model: str):
+        self.name = name  # groq, openai, anthropic, together, huggingface
+        self.kind = kind  # openai (OpenAI-совместимый API), anthropic или huggingface
+        self.client = client  # Для huggingface - API ключ (запросы идут через общий HTTP пул)
+        self.model = model
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.8,
+        max_tokens: int = 400
+    ) -> str:
+        """
+        Получить ответ модели, не блокируя event loop
+
+        Args:
+            system_prompt: Системный промпт (может быть пустым)
+            user_prompt: Сообщение пользователя
+            temperature: Температура генерации
+            max_tokens: Максимальная длина ответа
+
+        Raises:
+            LLMProviderError: при любой ошибке обращения к API
+        """
+        try:
+            if self.kind == "anthropic":
+                response = await self.client.messages.create(
+                    **self._anthropic_kwargs(system_prompt, user_prompt, temperature, max_tokens)
+                )
+                return response.content[0].text
+
+            if self.kind == "huggingface":
+                return await self._huggingface_complete(system_prompt, user_prompt, temperature, max_tokens)
+
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self._openai_messages(system_prompt, user_prompt),
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            raise _as_provider_error(self.name, e) from e
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.8,
+        max_tokens: int = 400
+    ) -> AsyncIterator[str]:
+        """Потоковая генерация: отдает фрагменты текста по мере их появления"""
+        try:
+            if self.kind == "anthropic":
+                async with self.client.messages.stream(
+                    **self._anthropic_kwargs(system_prompt, user_prompt, temperature, max_tokens)
+                ) as stream:
+                    async for text in stream.text_stream:
+                        yield text
+                return
+
+            if self.kind == "huggingface":
+                # Inference API не стримит - отдаем ответ целиком
+                yield await self._huggingface_complete(system_prompt, user_prompt, temperature, max_tokens)
+                return
+
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self._openai_messages(system_prompt, user_prompt),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            async for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except Exception as e:
+            raise _as_provider_error(self.name, e) from e
+
+    def _openai_messages(self, system_prompt: str, user_prompt: str) -> list:
+        """Сообщения в формате OpenAI Chat Completions"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": user_prompt})
+        return messages
+
+    def _anthropic_kwargs(self, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int) -> dict:
+        """Параметры запроса в формате Anthropic Messages"""
+        kwargs = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": [{"role": "user", "content": user_prompt}]
+        }
+        if system_prompt:
+            kwargs["system"] = system_prompt
+        return kwargs
+
+    async def _huggingface_complete(self, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int) -> str:
+        """HuggingFace Inference API (text-generation)"""
+        url = f"{HUGGINGFACE_BASE_URL}/{self.model}"
+        headers = {
+            "Authorization": f"Bearer {self.client}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "inputs": f"{system_prompt}\n\nUser: {user_prompt}\n\nAssistant:",
+            "parameters": {
+                "max_new_tokens": max_tokens,
+                "temperature": temperature,
+                "return_full_text": False
+            }
+        }
+
+        async with http_client.session.post(url, headers=headers, json=data, timeout=30) as response:
+            if response.status != 200:
+                raise LLMProviderError(self.name, await response.text(), response.status)
+            result = await response.json()
+
+        if isinstance(result, list) and result:
+            return result[0].get('generated_text', '').strip()
+        raise LLMProviderError(self.name, f"Unexpected response: {result}")
+
+    def __repr__(self):
+        return f"<LLMProvider(name={self.name}, model={self.model})>"
+
+
+def _provider_model(name: str) -> str:
+    """Модель для провайдера: AI_MODEL для основного, иначе модель по умолчанию"""
+    model = settings.ai_model
+    if name != settings.ai_provider:
+        return DEFAULT_MODELS[name]
+    # Если включен Groq/Together, но модель от OpenAI -> меняем на Llama
+    if name in ("groq", "together", "huggingface") and model.startswith("gpt"):
+        print(f"⚠️ Switching model {model} -> {DEFAULT_MODELS[name]} ({name} compatible)")
+        return DEFAULT_MODELS[name]
+    return model
+
+
+def build_provider(name: str) -> Optional[LLMProvider]:
+    """Создать провайдера, если для него задан ключ"""
+    if name == "groq" and settings.groq_api_key:
+        client = openai.AsyncOpenAI(api_key=settings.groq_api_key, base_url=GROQ_BASE_URL)
+        return LLMProvider("groq", "openai", client, _provider_model("groq"))
+    if name == "openai" and settings.openai_api_key:
+        client = openai.AsyncOpenAI(api_key=settings.openai_api_key)
+        return LLMProvider("openai", "openai", client, _provider_model("openai"))
+    if name == "anthropic" and settings.anthropic_api_key:
+        client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
+        return LLMProvider("anthropic", "anthropic", client, _provider_model("anthropic"))
+    if name == "together" and settings.together_api_key:
+        client = openai.AsyncOpenAI(api_key=settings.together_api_key, base_url=TOGETHER_BASE_URL)
+        return LLMProvider("together", "openai", client, _provider_model("together"))
+    if name == "huggingface" and settings.huggingface_api_key:
+        return LLMProvider("huggingface", "huggingface", settings.huggingface_api_key, _provider_model("huggingface"))
+    return None
+
+
+def create_providers() -> List[LLMProvider]:
+    """
+    Создать всех провайдеров, для которых есть ключи.
+    Первым идет AI_PROVIDER (если для него есть ключ), дальше - по PROVIDER_PRIORITY.
+    """
+    order = [settings.ai_provider] + [name for name in PROVIDER_PRIORITY if name != settings.ai_provider]
+    providers = [p for p in (build_provider(name) for name in order) if p]
+
+    if not providers:
+        raise ValueError("❌ AI Error: No API keys found! Set GROQ_API_KEY, OPENAI_API_KEY or ANTHROPIC_API_KEY.")
+
+    if providers[0].name != settings.ai_provider:
+        print(f"🔄 {settings.ai_provider} key missing, switching to {providers[0].name.upper()}")
+    return providers
@@ -0,0 +1,313 @@
+"""
+Роутер LLM-провайдеров
+Отслеживает задержку (p50/p95) и долю ошибок каждого провайдера, отправляет запрос
+самому быстрому здоровому, дублирует его на второго провайдера, если первый
+отвечает дольше своего p95, и переключается при 429/5xx, таймаутах и недоступном
+ключе или модели (401/403/404/410) без перезапуска бота.
+Прочие 4xx (400, 422...) - ошибка самого запроса: она отдается вызывающему без
+переключения, другой провайдер получил бы тот же запрос.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional
+
+from loguru import logger
+
+from config.settings import settings
+from oracle.llm_client import LLMProvider, LLMProviderError, create_providers
+
+
+# Ключ отозван или модель снята - провайдер бесполезен надолго, переключаемся
+PROVIDER_FAULT_STATUSES = (401, 403, 404, 410)
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    """Перцентиль по отсортированной выборке (None, если данных нет)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ProviderStats:
+    """Скользящая статистика провайдера за последние WINDOW запросов"""
+
+    WINDOW = 50
+
+    def __init__(self):
+        self.latencies = deque(maxlen=self.WINDOW)  # Длительность успешных запросов, сек
+        self.ttfts = deque(maxlen=self.WINDOW)  # Время до первого фрагмента при стриминге
+        self.outcomes = deque(maxlen=self.WINDOW)  # True - успех, False - ошибка
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def p50(self) -> Optional[float]:
+        return _percentile(self.latencies, 0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return _percentile(self.latencies, 0.95)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def score(self) -> float:
+        """
+        Чем меньше, тем лучше. Провайдер без запросов идет первым, чтобы получить замер;
+        без единого успеха, но с ошибками - последним (иначе он навсегда остался бы первым)
+        """
+        if self.p50 is None:
+            return float('inf') if self.error_rate > 0 else 0.0
+        return self.p50 * (1 + 3 * self.error_rate)
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+
+    def record_failure(self, error: LLMProviderError):
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        self.last_error = str(error)
+
+    def cool_down(self, seconds: float):
+        if seconds > 0:
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+
+
+class LLMRouter:
+    """Маршрутизация запросов между провайдерами с хеджированием и переключением"""
+
+    # Задержка хеджа, пока у провайдера нет замеров
+    UNMEASURED_HEDGE_DELAY = 8.0
+    # Столько ошибок запроса (4xx) подряд - уже не запрос плохой, а провайдер (например, модель снята)
+    PERSISTENT_FAILURES = 3
+
+    def __init__(self, providers: List[LLMProvider]):
+        self.providers = providers
+        self.stats: Dict[str, ProviderStats] = {p.name: ProviderStats() for p in providers}
+        self.hedge_enabled = settings.llm_hedge_enabled
+        self.hedge_min_delay = settings.llm_hedge_min_delay
+        self.cooldown = settings.llm_provider_cooldown
+        self.auth_cooldown = settings.llm_auth_cooldown
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        # Лимиты запросов в минуту по провайдерам (TokenBucket, задаются планировщиком)
+        self.limiters: Dict[str, object] = {}
+
+    @property
+    def primary(self) -> LLMProvider:
+        """Провайдер, которому сейчас ушел бы запрос"""
+        return self._ranked()[0]
+
+    def _ranked(self) -> List[LLMProvider]:
+        """Здоровые провайдеры по возрастанию задержки; если здоровых нет - тот, кто раньше вернется"""
+        now = time.monotonic()
+        order = {p.name: i for i, p in enumerate(self.providers)}
+        healthy = [p for p in self.providers if self.stats[p.name].healthy(now)]
+        if not healthy:
+            return sorted(self.providers, key=lambda p: self.stats[p.name].cooldown_until)
+        # Провайдеры, упершиеся в свой лимит запросов, уходят в конец
+        return sorted(healthy, key=lambda p: (self._throttled(p), self.stats[p.name].score(), order[p.name]))
+
+    def _throttled(self, provider: LLMProvider) -> bool:
+        limiter = self.limiters.get(provider.name)
+        return limiter is not None and limiter.time_until_available() > 0
+
+    async def _acquire(self, provider: LLMProvider):
+        limiter = self.limiters.get(provider.name)
+        if limiter is not None:
+            await limiter.acquire()
+
+    def _hedge_delay(self, provider: LLMProvider) -> float:
+        p95 = self.stats[provider.name].p95
+        return max(p95 if p95 is not None else self.UNMEASURED_HEDGE_DELAY, self.hedge_min_delay)
+
+    @staticmethod
+    def _fails_over(error: LLMProviderError) -> bool:
+        """Имеет ли смысл спросить другого провайдера (иначе ошибка в самом запросе)"""
+        return error.retryable or error.status in PROVIDER_FAULT_STATUSES
+
+    def _cooldown_for(self, error: LLMProviderError, stats: ProviderStats) -> float:
+        if error.status in PROVIDER_FAULT_STATUSES:
+            return self.auth_cooldown
+        if error.retryable:
+            return error.retry_after or self.cooldown
+        if stats.consecutive_failures >= self.PERSISTENT_FAILURES:
+            return self.auth_cooldown
+        return 0.0
+
+    def _record_failure(self, provider: LLMProvider, error: LLMProviderError):
+        stats = self.stats[provider.name]
+        stats.record_failure(error)
+        cooldown = self._cooldown_for(error, stats)
+        stats.cool_down(cooldown)
+        logger.warning(f"LLM provider {provider.name} failed (status={error.status}, cooldown={cooldown:.0f}s): {error}")
+
+    async def _timed_complete(self, provider: LLMProvider, *args, **kwargs) -> str:
+        await self._acquire(provider)
+        stats = self.stats[provider.name]
+        stats.in_flight += 1
+        started = time.monotonic()
+        try:
+            result = await provider.complete(*args, **kwargs)
+        except LLMProviderError as e:
+            self._record_failure(provider, e)
+            raise
+        except asyncio.CancelledError:
+            # Проиграл хедж: реальная задержка не меньше прошедшего времени
+            stats.latencies.append(time.monotonic() - started)
+            raise
+        finally:
+            stats.in_flight -= 1
+        stats.record_success(time.monotonic() - started)
+        return result
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.8,
+        max_tokens: int = 400
+    ) -> str:
+        """
+        Получить ответ от самого быстрого провайдера.
+        Если он не ответил за свой p95 - параллельно спрашиваем следующего, берем первый ответ.
+        При 429/5xx, таймауте или недоступной модели сразу переходим к следующему провайдеру;
+        ошибка самого запроса (400, 422...) пробрасывается без переключения.
+
+        Raises:
+            LLMProviderError: если ни один провайдер не ответил или запрос отклонен
+        """
+        candidates = self._ranked()
+        pending: Dict[asyncio.Task, LLMProvider] = {}
+        hedges = set()
+        next_index = 0
+        last_error: Optional[LLMProviderError] = None
+        request_error = False
+
+        def launch() -> asyncio.Task:
+            nonlocal next_index
+            provider = candidates[next_index]
+            next_index += 1
+            task = asyncio.create_task(
+                self._timed_complete(provider, system_prompt, user_prompt, temperature=temperature, max_tokens=max_tokens)
+            )
+            pending[task] = provider
+            return task
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if (self.hedge_enabled and len(pending) == 1 and next_index < len(candidates)
+                        and not self._throttled(candidates[next_index])):
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    slow = next(iter(pending.values()))
+                    logger.info(f"LLM hedge: {slow.name} slower than {timeout:.1f}s, asking {candidates[next_index].name}")
+                    self.hedges_fired += 1
+                    hedges.add(launch())
+                    continue
+
+                for task in done:
+                    pending.pop(task)
+                    try:
+                        result = task.result()
+                    except LLMProviderError as e:
+                        last_error = e
+                        request_error = request_error or not self._fails_over(e)
+                        continue
+                    if task in hedges:
+                        self.hedges_won += 1
+                    return result
+
+                # Все запущенные упали - переключаемся на следующего (если дело не в самом запросе)
+                if not pending and next_index < len(candidates) and not request_error:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error or LLMProviderError("router", "No LLM providers available")
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.8,
+        max_tokens: int = 400
+    ) -> AsyncIterator[str]:
+        """
+        Потоковая генерация с переключением провайдера до первого фрагмента.
+        Ошибка после начала ответа или ошибка самого запроса пробрасывается.
+        """
+        last_error: Optional[LLMProviderError] = None
+
+        for provider in self._ranked():
+            await self._acquire(provider)
+            stats = self.stats[provider.name]
+            stats.in_flight += 1
+            started = time.monotonic()
+            received = False
+            try:
+                async with aclosing(
+                    provider.stream(system_prompt, user_prompt, temperature=temperature, max_tokens=max_tokens)
+                ) as chunks:
+                    async for chunk in chunks:
+                        if not received:
+                            received = True
+                            stats.ttfts.append(time.monotonic() - started)
+                        yield chunk
+            except LLMProviderError as e:
+                self._record_failure(provider, e)
+                if received or not self._fails_over(e):
+                    raise
+                last_error = e
+                continue
+            finally:
+                stats.in_flight -= 1
+
+            stats.record_success(time.monotonic() - started)
+            return
+
+        raise last_error or LLMProviderError("router", "No LLM providers available")
+
+    def snapshot(self) -> List[dict]:
+        """Текущая статистика провайдеров (для отладочных команд)"""
+        now = time.monotonic()
+        rows = []
+        for provider in self.providers:
+            stats = self.stats[provider.name]
+            rows.append({
+                "name": provider.name,
+                "model": provider.model,
+                "p50": stats.p50,
+                "p95": stats.p95,
+                "ttft_p50": _percentile(stats.ttfts, 0.5),
+                "error_rate": stats.error_rate,
+                "samples": len(stats.outcomes),
+                "in_flight": stats.in_flight,
+                "cooldown": max(0.0, stats.cooldown_until - now),
+                "last_error": stats.last_error,
+            })
+        return rows
+
+
+# Singleton
+llm_router = LLMRouter(create_providers())
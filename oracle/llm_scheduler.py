@@ -0,0 +1,193 @@
+"""
+Планировщик LLM-запросов
+Ограничивает число одновременных обращений к моделям, ставит лишние запросы
+в очередь (премиум-пользователи идут вперед) и держит лимит запросов в минуту
+для каждого провайдера, чтобы всплески после рассылки не упирались в 429
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from config.settings import settings
+from oracle.llm_client import LLMProvider
+from oracle.llm_router import LLMRouter, llm_router, _percentile
+
+
+PREMIUM_LANE = 0
+BASIC_LANE = 1
+
+
+class TokenBucket:
+    """Ведро токенов: rate_per_minute запросов в минуту, всплеск до capacity"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until_available(self) -> float:
+        """Сколько секунд ждать до следующего свободного токена (0 - можно сейчас)"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        if self.time_until_available() > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def acquire(self):
+        """Дождаться токена"""
+        while not self.try_acquire():
+            await asyncio.sleep(self.time_until_available())
+
+
+class LLMScheduler:
+    """Очередь с приоритетами перед роутером: не больше max_concurrency запросов одновременно"""
+
+    def __init__(self, router: LLMRouter, max_concurrency: int, rate_limits: Dict[str, int]):
+        self.router = router
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self._queue: list = []  # Куча (полоса, номер, future)
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=200)  # Время ожидания в очереди, сек
+        self._service = deque(maxlen=200)  # Время обработки запроса, сек
+        self.served = 0
+
+        router.limiters = {
+            provider.name: TokenBucket(rate_limits[provider.name])
+            for provider in router.providers
+            if rate_limits.get(provider.name)
+        }
+
+    @property
+    def providers(self) -> List[LLMProvider]:
+        return self.router.providers
+
+    @property
+    def primary(self) -> LLMProvider:
+        return self.router.primary
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def position(self, premium: bool = False) -> int:
+        """
+        Сколько запросов окажется впереди нового запроса (0 - будет обслужен сразу).
+        Премиум обгоняет всех обычных, поэтому перед ним только другие премиум.
+        """
+        if self.active < self.max_concurrency and not self._queue:
+            return 0
+        if premium:
+            ahead = sum(1 for lane, _, _ in self._queue if lane == PREMIUM_LANE)
+        else:
+            ahead = len(self._queue)
+        return ahead + 1
+
+    def estimated_wait(self, position: int) -> float:
+        """Оценка ожидания (сек) для запроса на данной позиции очереди"""
+        if position <= 0:
+            return 0.0
+        service = sum(self._service) / len(self._service) if self._service else 5.0
+        return service * math.ceil(position / self.max_concurrency)
+
+    async def _acquire(self, premium: bool):
+        if self.active < self.max_concurrency and not self._queue:
+            self.active += 1
+            self._waits.append(0.0)
+            return
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        entry = (PREMIUM_LANE if premium else BASIC_LANE, next(self._seq), future)
+        heapq.heappush(self._queue, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже выдан, но запрос отменили - возвращаем слот следующему
+                self._release()
+            elif entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+            raise
+        self._waits.append(time.monotonic() - started)
+
+    def _release(self):
+        self.active -= 1
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+                break
+
+    @asynccontextmanager
+    async def slot(self, premium: bool = False):
+        """Занять место среди одновременных запросов (с ожиданием в очереди)"""
+        await self._acquire(premium)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service.append(time.monotonic() - started)
+            self.served += 1
+            self._release()
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.8,
+        max_tokens: int = 400,
+        premium: bool = False
+    ) -> str:
+        """Ответ модели через очередь (premium - приоритетная полоса)"""
+        async with self.slot(premium):
+            return await self.router.complete(system_prompt, user_prompt, temperature=temperature, max_tokens=max_tokens)
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.8,
+        max_tokens: int = 400,
+        premium: bool = False
+    ) -> AsyncIterator[str]:
+        """Потоковый ответ через очередь: слот занят до конца генерации"""
+        async with self.slot(premium), aclosing(
+            self.router.stream(system_prompt, user_prompt, temperature=temperature, max_tokens=max_tokens)
+        ) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    def snapshot(self) -> dict:
+        """Состояние очереди (для отладочных команд)"""
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "premium_waiting": sum(1 for lane, _, _ in self._queue if lane == PREMIUM_LANE),
+            "wait_p50": _percentile(self._waits, 0.5),
+            "wait_p95": _percentile(self._waits, 0.95),
+            "served": self.served,
+        }
+
+
+# Singleton
+llm_scheduler = LLMScheduler(llm_router, settings.llm_max_concurrency, settings.llm_rate_limits)
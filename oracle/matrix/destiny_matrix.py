@@ -6,6 +6,10 @@ from datetime import datetime
 from dataclasses import dataclass
 from typing import Dict, List, Tuple
 
+import numpy as np
+
+from oracle.matrix.matrix_table import matrix_table
+
 
 @dataclass
 class DestinyMatrix:
@@ -187,53 +191,34 @@ class MatrixOfDestiny:
         }
     }
     
+    def __init__(self):
+        # Строки интерпретаций одни и те же для каждого аркана - собираем один раз
+        self._energies = {
+            arcana: f"{meaning['name']}: {meaning['energy']}" for arcana, meaning in self.ARCANA_MEANINGS.items()
+        }
+    
     def calculate_matrix(self, birth_date: datetime) -> DestinyMatrix:
-        """Рассчитать Матрицу Судьбы"""
-        
-        day = birth_date.day
-        month = birth_date.month
-        year = birth_date.year
+        """Рассчитать Матрицу Судьбы (арканы по дате - из таблицы matrix_table)"""
         
-        # 1. Личный Аркан (день рождения)
-        personal_arcana = self._reduce_to_arcana(day)
-        
-        # 2. Аркан Судьбы (месяц)
-        destiny_arcana = self._reduce_to_arcana(month)
-        
-        # 3. Социальный Аркан (год)
-        social_arcana = self._reduce_to_arcana(year)
-        
-        # 4. Духовный Аркан (сумма всех)
-        spiritual_arcana = self._reduce_to_arcana(
-            personal_arcana + destiny_arcana + social_arcana
-        )
+        # Основные энергии, чакровая линия, здоровье, деньги и программы (поля MATRIX_DTYPE)
+        (
+            personal_arcana, destiny_arcana, social_arcana, spiritual_arcana, chakra_line,
+            health_arcana, money_arcana, parent_program, love_program, talent_program
+        ) = matrix_table.row(birth_date).item()
+        chakra_line = chakra_line.tolist()
         
-        # 5. Чакровая линия (7 чакр)
-        chakra_line = self._calculate_chakra_line(birth_date)
-        
-        # 6. Здоровье
-        health_arcana = self._reduce_to_arcana(day + month)
-        
-        # 7. Деньги
-        money_arcana = self._reduce_to_arcana(day + year)
-        
-        # 8. Программы
-        parent_program = self._reduce_to_arcana(day + month + year)
-        love_program = self._reduce_to_arcana(personal_arcana + destiny_arcana)
-        talent_program = self._reduce_to_arcana(personal_arcana + social_arcana)
-        
-        # 9. Текущий год
+        # Аркан текущего года зависит от года расчета - считается отдельно
         current_year = datetime.now().year
         current_year_arcana = self._reduce_to_arcana(
-            day + month + current_year
+            birth_date.day + birth_date.month + current_year
         )
         
         # Формируем интерпретации
         arcana_meanings = {
-            'personal': f"{self.ARCANA_MEANINGS[personal_arcana]['name']}: {self.ARCANA_MEANINGS[personal_arcana]['energy']}",
-            'destiny': f"{self.ARCANA_MEANINGS[destiny_arcana]['name']}: {self.ARCANA_MEANINGS[destiny_arcana]['energy']}",
-            'social': f"{self.ARCANA_MEANINGS[social_arcana]['name']}: {self.ARCANA_MEANINGS[social_arcana]['energy']}",
-            'spiritual': f"{self.ARCANA_MEANINGS[spiritual_arcana]['name']}: {self.ARCANA_MEANINGS[spiritual_arcana]['energy']}"
+            'personal': self._energies[personal_arcana],
+            'destiny': self._energies[destiny_arcana],
+            'social': self._energies[social_arcana],
+            'spiritual': self._energies[spiritual_arcana]
         }
         
         # Вызовы
@@ -271,30 +256,16 @@ class MatrixOfDestiny:
             purpose=purpose
         )
     
+    def calculate_many(self, dates) -> np.ndarray:
+        """Арканы, чакровые линии и программы для массива дат (структурный массив, см. matrix_table)"""
+        return matrix_table.lookup_many(dates)
+    
     def _reduce_to_arcana(self, number: int) -> int:
         """Свести число к Аркану (0-22)"""
         while number > 22:
             number = sum(int(digit) for digit in str(number))
         return number
     
-    def _calculate_chakra_line(self, birth_date: datetime) -> List[int]:
-        """Рассчитать линию чакр"""
-        day = birth_date.day
-        month = birth_date.month
-        year = birth_date.year
-        
-        # 7 чакр
-        chakras = []
-        chakras.append(self._reduce_to_arcana(day))  # Муладхара (корневая)
-        chakras.append(self._reduce_to_arcana(month))  # Свадхистана (сакральная)
-        chakras.append(self._reduce_to_arcana(year))  # Манипура (солнечное сплетение)
-        chakras.append(self._reduce_to_arcana(day + month))  # Анахата (сердечная)
-        chakras.append(self._reduce_to_arcana(month + year))  # Вишудха (горловая)
-        chakras.append(self._reduce_to_arcana(day + year))  # Аджна (третий глаз)
-        chakras.append(self._reduce_to_arcana(day + month + year))  # Сахасрара (коронная)
-        
-        return chakras
-    
     def format_matrix(self, matrix: DestinyMatrix) -> str:
         """Форматировать Матрицу Судьбы для отображения"""
         result = f"""
@@ -0,0 +1,180 @@
+"""
+Таблица Матрицы Судьбы
+Все арканы, чакровая линия и программы для каждой даты 1900-2100 (uint8, ~1.2 МБ),
+рассчитанные заранее и открываемые через mmap: матрица по дате - одна строка таблицы.
+Аркан текущего года зависит от года расчета и в таблицу не входит (см. year_arcana).
+
+Сборка таблицы (один раз, при сборке образа):
+    python -m oracle.matrix.matrix_table [путь к .npy]
+Без файла таблица считается в памяти при первом обращении (векторно, доли секунды).
+"""
+import json
+import os
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+START_YEAR = 1900
+END_YEAR = 2100
+
+# Путь берется из окружения, а не из settings: сборка таблицы идет без токенов бота
+DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "destiny_matrix.npy"
+MATRIX_TABLE_PATH = Path(os.environ.get("MATRIX_TABLE_PATH", DEFAULT_PATH))
+
+# Строка таблицы: арканы 0-22
+MATRIX_DTYPE = np.dtype([
+    ('personal', np.uint8),
+    ('destiny', np.uint8),
+    ('social', np.uint8),
+    ('spiritual', np.uint8),
+    ('chakra_line', np.uint8, (7,)),
+    ('health', np.uint8),
+    ('money', np.uint8),
+    ('parent_program', np.uint8),
+    ('love_program', np.uint8),
+    ('talent_program', np.uint8),
+])
+
+
+def reduce_to_arcana(numbers) -> np.ndarray:
+    """Свести массив чисел к Арканам 0-22 (сумма цифр, пока число больше 22)"""
+    numbers = np.array(numbers, dtype=np.int64)
+    large = numbers > 22
+    while large.any():
+        n = numbers[large]
+        total = np.zeros_like(n)
+        while n.any():
+            n, digit = np.divmod(n, 10)
+            total += digit
+        numbers[large] = total
+        large = numbers > 22
+    return numbers
+
+
+def date_parts(dates) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Даты (datetime64[D] / datetime / date) -> массивы (день, месяц, год)"""
+    dates = np.atleast_1d(np.asarray(dates, dtype='datetime64[D]'))
+    months = dates.astype('datetime64[M]')
+    day = (dates - months).astype(np.int64) + 1
+    month = months.astype(np.int64) % 12 + 1
+    year = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    return day, month, year
+
+
+def compute(dates) -> np.ndarray:
+    """Строки таблицы для массива дат - те же формулы, что в MatrixOfDestiny"""
+    day, month, year = date_parts(dates)
+    rows = np.empty(len(day), dtype=MATRIX_DTYPE)
+
+    # Основные энергии: день, месяц, год и их сумма
+    personal = reduce_to_arcana(day)
+    destiny = reduce_to_arcana(month)
+    social = reduce_to_arcana(year)
+    rows['personal'] = personal
+    rows['destiny'] = destiny
+    rows['social'] = social
+    rows['spiritual'] = reduce_to_arcana(personal + destiny + social)
+
+    # Чакровая линия: Муладхара (день), Свадхистана (месяц), Манипура (год), Анахата (день + месяц),
+    # Вишудха (месяц + год), Аджна (день + год), Сахасрара (день + месяц + год)
+    health = reduce_to_arcana(day + month)
+    money = reduce_to_arcana(day + year)
+    parent = reduce_to_arcana(day + month + year)
+    rows['chakra_line'] = np.stack(
+        [personal, destiny, social, health, reduce_to_arcana(month + year), money, parent], axis=1
+    )
+
+    rows['health'] = health
+    rows['money'] = money
+    rows['parent_program'] = parent
+    rows['love_program'] = reduce_to_arcana(personal + destiny)
+    rows['talent_program'] = reduce_to_arcana(personal + social)
+    return rows
+
+
+def year_arcana(dates, year: int) -> np.ndarray:
+    """Аркан года (день + месяц + год расчета) для массива дат"""
+    day, month, _ = date_parts(dates)
+    return reduce_to_arcana(day + month + year)
+
+
+def _meta_path(path: Path) -> Path:
+    return path.with_suffix(".json")
+
+
+def build(path: Path = MATRIX_TABLE_PATH, start_year: int = START_YEAR, end_year: int = END_YEAR) -> Path:
+    """Рассчитать таблицу на каждые сутки start_year..end_year + JSON с первой датой"""
+    start = np.datetime64(f"{start_year:04d}-01-01")
+    dates = np.arange(start, np.datetime64(f"{end_year + 1:04d}-01-01"))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp.npy")
+    np.save(tmp_path, compute(dates))
+    os.replace(tmp_path, path)
+    _meta_path(path).write_text(json.dumps({"start": str(start)}))
+    logger.info(f"Destiny matrix table written: {path} ({len(dates)} rows, {path.stat().st_size / 1e6:.1f} MB)")
+    return path
+
+
+class MatrixTable:
+    """Чтение таблицы матриц (файл открывается лениво через mmap)"""
+
+    def __init__(self, path: Path = MATRIX_TABLE_PATH):
+        self.path = Path(path)
+        self._table: Optional[np.ndarray] = None
+        self._start = np.datetime64(f"{START_YEAR:04d}-01-01")
+        self._start_ordinal = date(START_YEAR, 1, 1).toordinal()
+
+    def _load(self) -> np.ndarray:
+        if self._table is None:
+            try:
+                meta = json.loads(_meta_path(self.path).read_text())
+                table = np.load(self.path, mmap_mode="r")
+                if table.dtype != MATRIX_DTYPE:
+                    raise ValueError(f"unexpected dtype {table.dtype}")
+                self._start = np.datetime64(meta["start"], 'D')
+                self._table = table
+            except FileNotFoundError:
+                logger.info(f"Destiny matrix table not found at {self.path}, computing in memory")
+            except Exception as e:
+                logger.warning(f"Destiny matrix table unusable ({e}), computing in memory")
+            if self._table is None:
+                self._start = np.datetime64(f"{START_YEAR:04d}-01-01")
+                self._table = compute(np.arange(self._start, np.datetime64(f"{END_YEAR + 1:04d}-01-01")))
+            self._start_ordinal = self._start.item().toordinal()
+        return self._table
+
+    def row(self, birth_date: date) -> np.void:
+        """Строка матрицы для одной даты (datetime/date); вне таблицы - расчет на лету"""
+        table = self._load()
+        i = birth_date.toordinal() - self._start_ordinal
+        if 0 <= i < len(table):
+            return table[i]
+        return compute([birth_date])[0]
+
+    def lookup_many(self, dates) -> np.ndarray:
+        """Строки матрицы для массива дат (структурный массив MATRIX_DTYPE, в порядке дат)"""
+        table = self._load()
+        dates = np.atleast_1d(np.asarray(dates, dtype='datetime64[D]'))
+        index = (dates - self._start).astype(np.int64)
+        inside = (index >= 0) & (index < len(table))
+        if inside.all():
+            return table[index]
+        rows = np.empty(len(dates), dtype=MATRIX_DTYPE)
+        rows[inside] = table[index[inside]]
+        rows[~inside] = compute(dates[~inside])
+        return rows
+
+
+# Singleton
+matrix_table = MatrixTable()
+
+
+if __name__ == "__main__":
+    build(Path(sys.argv[1]) if len(sys.argv) > 1 else MATRIX_TABLE_PATH)
@@ -0,0 +1,107 @@
+"""
+Метрики задержек
+Гистограммы длительности этапов обработки вопроса (p50/p95/p99) в памяти процесса
+"""
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+def _bucket_bounds() -> List[float]:
+    """Экспоненциальные границы корзин: от 0.5 мс до ~5 минут, шаг x1.25"""
+    bounds = []
+    bound = 0.0005
+    while bound < 300:
+        bounds.append(bound)
+        bound *= 1.25
+    return bounds
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными корзинами (память O(1), погрешность ~12%)"""
+
+    BOUNDS = _bucket_bounds()
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)  # Последняя корзина - все, что дольше
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Оценка перцентиля (верхняя граница корзины, но не больше максимума)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                upper = self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+                return min(upper, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+
+class Metrics:
+    """Реестр гистограмм по именам этапов"""
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.started_at = time.time()
+
+    def observe(self, name: str, seconds: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, name: str):
+        """Замерить длительность блока (и синхронного, и с await внутри)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "count": h.count,
+                "p50": h.percentile(0.5),
+                "p95": h.percentile(0.95),
+                "p99": h.percentile(0.99),
+                "max": h.max,
+            }
+            for name, h in self.histograms.items()
+        }
+
+    def format_report(self) -> str:
+        """Таблица для Telegram (моноширинный блок)"""
+        def ms(value: Optional[float]) -> str:
+            if value is None:
+                return "-"
+            return f"{value * 1000:.1f}" if value < 0.01 else f"{value * 1000:.0f}"
+
+        rows = [f"{'stage':<14}{'n':>6}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}"]
+        for name, row in sorted(self.snapshot().items()):
+            rows.append(
+                f"{name:<14}{row['count']:>6}{ms(row['p50']):>8}{ms(row['p95']):>8}{ms(row['p99']):>8}{ms(row['max']):>8}"
+            )
+        uptime_min = (time.time() - self.started_at) / 60
+        return "\n".join(rows) + f"\n\nмс, с запуска {uptime_min:.0f} мин"
+
+
+# Singleton
+metrics = Metrics()
@@ -0,0 +1,179 @@
+"""
+Векторный расчет аспектов (NumPy)
+Угловые расстояния между всеми парами тел считаются одним векторным проходом,
+мажорные и минорные аспекты с орбисами по телам подбираются сразу для всех пар.
+Работает и для одной карты (натал), и для пары карт (синастрия, транзиты).
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class AspectType:
+    """Вид аспекта"""
+    name: str
+    angle: float
+    orb_factor: float  # Доля орбиса тел, допустимая для этого аспекта
+    major: bool
+    interpretation: str
+
+
+ASPECT_TYPES: List[AspectType] = [
+    AspectType('conjunction', 0, 1.0, True, 'Соединение - слияние энергий'),
+    AspectType('sextile', 60, 0.75, True, 'Секстиль - гармоничная возможность'),
+    AspectType('square', 90, 1.0, True, 'Квадрат - напряжение и вызов'),
+    AspectType('trine', 120, 1.0, True, 'Трин - гармония и поток'),
+    AspectType('opposition', 180, 1.0, True, 'Оппозиция - противостояние и баланс'),
+    AspectType('semisextile', 30, 0.3, False, 'Полусекстиль - тонкая настройка'),
+    AspectType('semisquare', 45, 0.3, False, 'Полуквадрат - скрытое трение'),
+    AspectType('quintile', 72, 0.25, False, 'Квинтиль - творческий дар'),
+    AspectType('sesquiquadrate', 135, 0.3, False, 'Полутораквадрат - внутреннее беспокойство'),
+    AspectType('biquintile', 144, 0.25, False, 'Биквинтиль - талант в развитии'),
+    AspectType('quincunx', 150, 0.4, False, 'Квинконс - необходимость адаптации'),
+]
+
+# Орбис тела (для мажорных аспектов); орбис пары - среднее орбисов двух тел
+BODY_ORBS: Dict[str, float] = {
+    'Sun': 10.0, 'Moon': 10.0,
+    'Mercury': 7.0, 'Venus': 7.0, 'Mars': 7.0,
+    'Jupiter': 9.0, 'Saturn': 9.0,
+    'Uranus': 5.0, 'Neptune': 5.0, 'Pluto': 5.0,
+    'North Node': 3.0, 'Chiron': 3.0,
+    'Ascendant': 8.0, 'MC': 8.0,
+}
+DEFAULT_ORB = 5.0
+
+
+@dataclass
+class AspectHits:
+    """Найденные аспекты в виде параллельных массивов (индексы тел и вида аспекта)"""
+    first: np.ndarray  # Индекс тела первой карты
+    second: np.ndarray  # Индекс тела второй карты (той же - для натала)
+    aspect: np.ndarray  # Индекс в ASPECT_TYPES
+    orb: np.ndarray  # Отклонение от точного угла, градусы
+
+    def __len__(self):
+        return len(self.first)
+
+
+def angular_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Матрица кратчайших угловых расстояний (0..180) между долготами a[i] и b[j]"""
+    d = np.abs(a[:, None] - b[None, :]) % 360.0
+    return np.minimum(d, 360.0 - d)
+
+
+class AspectEngine:
+    """
+    Поиск аспектов по вектору расстояний между парами тел.
+    Для каждой пары проверяются только два ближайших по углу вида аспекта
+    (соседи в отсортированной таблице): более далекие не проходят по орбису,
+    пока орбис меньше промежутка между соседними видами.
+    """
+
+    def __init__(
+        self,
+        aspect_types: Sequence[AspectType] = ASPECT_TYPES,
+        body_orbs: Optional[Dict[str, float]] = None,
+        default_orb: float = DEFAULT_ORB
+    ):
+        self.aspect_types = list(aspect_types)
+        self.body_orbs = body_orbs if body_orbs is not None else BODY_ORBS
+        self.default_orb = default_orb
+        self._tables = {
+            True: self._table(range(len(self.aspect_types))),
+            False: self._table([k for k, a in enumerate(self.aspect_types) if a.major]),
+        }
+        self._orbs_cache: Dict[tuple, np.ndarray] = {}
+        self._pairs_cache: Dict[int, tuple] = {}
+
+    def _table(self, indices):
+        """(углы по возрастанию, доли орбиса, индексы в aspect_types)"""
+        indices = sorted(indices, key=lambda k: self.aspect_types[k].angle)
+        return (
+            np.array([self.aspect_types[k].angle for k in indices], dtype=np.float64),
+            np.array([self.aspect_types[k].orb_factor for k in indices], dtype=np.float64),
+            np.array(indices, dtype=np.intp),
+        )
+
+    def orbs(self, bodies: Sequence[str]) -> np.ndarray:
+        key = tuple(bodies)
+        orbs = self._orbs_cache.get(key)
+        if orbs is None:
+            orbs = np.array([self.body_orbs.get(b, self.default_orb) for b in bodies], dtype=np.float64)
+            self._orbs_cache[key] = orbs
+        return orbs
+
+    def _pairs(self, n: int):
+        """Индексы пар i < j внутри одной карты"""
+        pairs = self._pairs_cache.get(n)
+        if pairs is None:
+            pairs = self._pairs_cache[n] = np.triu_indices(n, k=1)
+        return pairs
+
+    def _classify(self, dist: np.ndarray, pair_orb: np.ndarray, include_minor: bool):
+        """Для каждой пары - самый точный (относительно допуска) аспект: (есть ли, индекс вида, отклонение)"""
+        angles, factors, kinds = self._tables[include_minor]
+        pos = np.searchsorted(angles, dist)
+        lo = np.clip(pos - 1, 0, len(angles) - 1)
+        hi = np.clip(pos, 0, len(angles) - 1)
+
+        dev_lo = np.abs(dist - angles[lo])
+        dev_hi = np.abs(dist - angles[hi])
+        allow_lo = pair_orb * factors[lo]
+        allow_hi = pair_orb * factors[hi]
+        # Относительная точность: 0 - точный аспект, 1 - на границе орбиса
+        t_lo = np.where(dev_lo <= allow_lo, dev_lo / allow_lo, np.inf)
+        t_hi = np.where(dev_hi <= allow_hi, dev_hi / allow_hi, np.inf)
+
+        use_hi = t_hi < t_lo
+        hit = np.isfinite(np.minimum(t_lo, t_hi))
+        kind = kinds[np.where(use_hi, hi, lo)]
+        deviation = np.where(use_hi, dev_hi, dev_lo)
+        return hit, kind, deviation
+
+    def classify(self, distances, pair_orbs, include_minor: bool = True):
+        """Самый точный аспект для произвольных расстояний и орбисов пар (таблицы по сетке углов)"""
+        return self._classify(
+            np.asarray(distances, dtype=np.float64), np.asarray(pair_orbs, dtype=np.float64), include_minor
+        )
+
+    @staticmethod
+    def _hits(first, second, hit, kind, deviation) -> AspectHits:
+        first, second, kind, orb = first[hit], second[hit], kind[hit], deviation[hit]
+        # Самые точные аспекты - первыми
+        order = np.argsort(orb, kind='stable')
+        return AspectHits(first[order], second[order], kind[order], orb[order])
+
+    def natal(self, bodies: Sequence[str], longitudes: Sequence[float], include_minor: bool = True) -> AspectHits:
+        """Аспекты внутри одной карты (каждая пара один раз)"""
+        lons = np.asarray(longitudes, dtype=np.float64)
+        orbs = self.orbs(bodies)
+        first, second = self._pairs(len(lons))
+
+        d = np.abs(lons[first] - lons[second]) % 360.0
+        dist = np.minimum(d, 360.0 - d)
+        pair_orb = (orbs[first] + orbs[second]) / 2
+        return self._hits(first, second, *self._classify(dist, pair_orb, include_minor))
+
+    def synastry(
+        self,
+        bodies_a: Sequence[str],
+        longitudes_a: Sequence[float],
+        bodies_b: Sequence[str],
+        longitudes_b: Sequence[float],
+        include_minor: bool = True
+    ) -> AspectHits:
+        """Аспекты между двумя картами (синастрия, транзиты к наталу): все пары A x B"""
+        lons_a = np.asarray(longitudes_a, dtype=np.float64)
+        lons_b = np.asarray(longitudes_b, dtype=np.float64)
+        dist = angular_distance(lons_a, lons_b).ravel()
+        pair_orb = ((self.orbs(bodies_a)[:, None] + self.orbs(bodies_b)[None, :]) / 2).ravel()
+
+        first, second = np.divmod(np.arange(dist.size), len(lons_b))
+        return self._hits(first, second, *self._classify(dist, pair_orb, include_minor))
+
+
+# Singleton
+aspect_engine = AspectEngine()
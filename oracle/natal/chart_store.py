@@ -0,0 +1,252 @@
+"""
+Хранилище натальных карт
+LRU в памяти -> таблица natal_charts -> расчет через swisseph.
+В БД лежат только сырые позиции планет и куспиды домов (~300 байт),
+дома, аспекты и балансы собираются из них без обращения к swisseph
+"""
+import dataclasses
+import math
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import select
+
+from database.database import AsyncSessionLocal
+from database.models import NatalChartEntry
+from database.user_manager import user_manager
+from oracle.natal.gazetteer import resolve_birth
+from oracle.natal.natal_chart import NatalChart, natal_astrology
+from oracle.response_cache import make_cache_key
+
+
+# Меняется вместе с расчетом: старые записи перестают совпадать по хэшу
+CHART_VERSION = 1
+COORD_PRECISION = 4  # Знаков после запятой у координат (~10 м)
+ANONYMOUS = 0  # telegram_id карты без владельца
+
+
+def chart_input_hash(birth_date: datetime, latitude: float, longitude: float) -> str:
+    """Хэш входных данных карты (дата, место, система домов, набор планет)"""
+    return make_cache_key(
+        kind='natal',
+        version=CHART_VERSION,
+        birth_date=birth_date.replace(microsecond=0, tzinfo=None),
+        latitude=round(latitude, COORD_PRECISION),
+        longitude=round(longitude, COORD_PRECISION),
+        house_system='P',
+        bodies=list(natal_astrology.PLANETS),
+    )
+
+
+def pack_positions(positions: List[Optional[Tuple[float, float]]]) -> bytes:
+    values = array('d')
+    for position in positions:
+        values.extend(position if position is not None else (math.nan, math.nan))
+    return values.tobytes()
+
+
+def unpack_positions(blob: bytes) -> List[Optional[Tuple[float, float]]]:
+    values = array('d')
+    values.frombytes(blob)
+    return [
+        None if math.isnan(lon) else (lon, speed)
+        for lon, speed in zip(values[0::2], values[1::2])
+    ]
+
+
+def pack_cusps(cusps: List[float]) -> bytes:
+    return array('d', cusps).tobytes()
+
+
+def unpack_cusps(blob: bytes) -> List[float]:
+    values = array('d')
+    values.frombytes(blob)
+    return list(values)
+
+
+@dataclasses.dataclass
+class _StoredChart:
+    chart: NatalChart
+    positions: bytes
+    cusps: bytes
+    owners: set  # telegram_id, за которыми карта уже записана в БД
+
+
+class NatalChartStore:
+    """
+    Натальные карты для всех функций (натал, совместимость, транзиты, сферы).
+    Возвращаемая карта может быть общей для нескольких вызовов - ее нельзя менять.
+    """
+
+    def __init__(self, max_items: int = 256):
+        self.max_items = max_items
+        self._memory: "OrderedDict[str, _StoredChart]" = OrderedDict()
+        self.hits = 0
+        self.loaded = 0
+        self.computed = 0
+
+    async def get(
+        self,
+        birth_date: datetime,
+        latitude: float,
+        longitude: float,
+        location: str = "Unknown",
+        telegram_id: Optional[int] = None
+    ) -> NatalChart:
+        """Карта по данным рождения: из памяти, из БД или рассчитать (и сохранить за пользователем)"""
+        key = chart_input_hash(birth_date, latitude, longitude)
+        owner = telegram_id if telegram_id is not None else ANONYMOUS
+
+        stored = self._get_memory(key)
+        if stored is not None:
+            self.hits += 1
+        else:
+            entries = await self._load(key)
+            if entries:
+                self.loaded += 1
+                stored = _StoredChart(
+                    chart=self._build(entries[0], location),
+                    positions=entries[0].positions,
+                    cusps=entries[0].cusps,
+                    owners={entry.telegram_id for entry in entries},
+                )
+            else:
+                self.computed += 1
+                positions, cusps = await natal_astrology.calculate_positions_async(birth_date, latitude, longitude)
+                stored = _StoredChart(
+                    chart=natal_astrology.build_chart(birth_date, latitude, longitude, location, positions, cusps),
+                    positions=pack_positions(positions),
+                    cusps=pack_cusps(cusps),
+                    owners=set(),
+                )
+            self._put_memory(key, stored)
+
+        if owner not in stored.owners:
+            await self._save(key, stored, owner)
+        return self._with_location(stored.chart, location)
+
+    async def get_for_place(
+        self,
+        birth_local: datetime,
+        place: str,
+        telegram_id: Optional[int] = None
+    ) -> Optional[NatalChart]:
+        """
+        Карта по местному времени и городу рождения (офлайн-справочник, перевод в UT по
+        истории пояса). None - город не найден. В возвращаемой карте birth_date - местное время.
+        """
+        resolved = resolve_birth(birth_local, place)
+        if resolved is None:
+            return None
+        birth_ut, city = resolved
+        chart = await self.get(birth_ut, city.latitude, city.longitude, city.name, telegram_id)
+        return dataclasses.replace(chart, birth_date=birth_local.replace(tzinfo=None))
+
+    async def for_user(self, telegram_id: int) -> Optional[NatalChart]:
+        """
+        Карта по сохраненным данным рождения (user_details): местные дата, время и город
+        переводятся в UT через справочник. None - даты или города нет, либо город не найден.
+        Время рождения не указано - берется полдень.
+        """
+        data = await user_manager.get_user_data(telegram_id)
+        if data is None or data.birth_date is None or not data.birth_location:
+            return None
+        birth_local = data.birth_date.replace(hour=12, minute=0, second=0, microsecond=0)
+        if data.birth_time:
+            try:
+                parsed = datetime.strptime(data.birth_time.strip(), "%H:%M")
+                birth_local = birth_local.replace(hour=parsed.hour, minute=parsed.minute)
+            except ValueError:
+                logger.warning(f"Unparsable birth time {data.birth_time!r} for {telegram_id}, using noon")
+        return await self.get_for_place(birth_local, data.birth_location, telegram_id)
+
+    async def latest_for_user(self, telegram_id: int) -> Optional[NatalChart]:
+        """Последняя карта пользователя (без данных рождения на руках)"""
+        try:
+            async with AsyncSessionLocal() as session:
+                entry = await session.scalar(
+                    select(NatalChartEntry)
+                    .where(NatalChartEntry.telegram_id == telegram_id)
+                    .order_by(NatalChartEntry.created_at.desc())
+                    .limit(1)
+                )
+        except Exception as e:
+            logger.warning(f"Natal chart read failed: {e}")
+            return None
+        if entry is None:
+            return None
+
+        stored = self._get_memory(entry.input_hash)
+        if stored is None:
+            stored = _StoredChart(self._build(entry, entry.location), entry.positions, entry.cusps, {telegram_id})
+            self._put_memory(entry.input_hash, stored)
+        return self._with_location(stored.chart, entry.location)
+
+    @staticmethod
+    def _build(entry: NatalChartEntry, location: Optional[str]) -> NatalChart:
+        return natal_astrology.build_chart(
+            entry.birth_date,
+            entry.latitude,
+            entry.longitude,
+            location or entry.location or "Unknown",
+            unpack_positions(entry.positions),
+            unpack_cusps(entry.cusps),
+        )
+
+    @staticmethod
+    def _with_location(chart: NatalChart, location: Optional[str]) -> NatalChart:
+        # Тот же город может быть записан по-разному - на расчет это не влияет
+        if not location or location == chart.location:
+            return chart
+        return dataclasses.replace(chart, location=location)
+
+    def _get_memory(self, key: str) -> Optional[_StoredChart]:
+        stored = self._memory.get(key)
+        if stored is not None:
+            self._memory.move_to_end(key)
+        return stored
+
+    def _put_memory(self, key: str, stored: _StoredChart):
+        self._memory[key] = stored
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    async def _load(self, key: str) -> List[NatalChartEntry]:
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(NatalChartEntry).where(NatalChartEntry.input_hash == key)
+                )
+                return list(result.scalars())
+        except Exception as e:
+            logger.warning(f"Natal chart read failed: {e}")
+            return []
+
+    async def _save(self, key: str, stored: _StoredChart, telegram_id: int):
+        """Записать карту за владельцем"""
+        chart = stored.chart
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.merge(NatalChartEntry(
+                    telegram_id=telegram_id,
+                    input_hash=key,
+                    birth_date=chart.birth_date.replace(tzinfo=None),
+                    latitude=chart.latitude,
+                    longitude=chart.longitude,
+                    location=chart.location,
+                    positions=stored.positions,
+                    cusps=stored.cusps,
+                    created_at=datetime.utcnow(),
+                ))
+                await session.commit()
+            stored.owners.add(telegram_id)
+        except Exception as e:
+            logger.warning(f"Natal chart write failed: {e}")
+
+
+# Singleton
+natal_chart_store = NatalChartStore()
@@ -0,0 +1,196 @@
+"""
+Офлайн-справочник городов для натальных карт
+Место рождения (свободный текст, кириллица или латиница) -> координаты и часовой пояс IANA,
+местное время рождения -> UT с учетом исторических смещений (декретное, летнее время, LMT).
+Без внешних сервисов геокодинга: список городов лежит рядом с модулем (cities.json).
+
+Поиск: точное имя/синоним -> префикс -> нечеткое совпадение по триграммам.
+"""
+import json
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import pytz
+from loguru import logger
+
+
+CITIES_PATH = Path(__file__).resolve().parent / "cities.json"
+
+MIN_PREFIX = 3  # Короче - слишком много городов на префикс
+MIN_SIMILARITY = 0.45  # Порог сходства по триграммам (коэффициент Дайса)
+
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p',
+    'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch',
+    'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+
+_PLACE_PREFIX = re.compile(r'^(г|гор|город|пгт|с|пос|поселок|city of)\s+')
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+@dataclass(frozen=True)
+class City:
+    """Город справочника"""
+    name: str
+    name_en: str
+    country: str  # ISO 3166-1 alpha-2
+    latitude: float
+    longitude: float
+    timezone: str  # IANA
+
+
+def normalize(text: str) -> str:
+    """Ключ поиска: нижний регистр, ё -> е, без пунктуации и сокращений 'г.'/'город'"""
+    text = text.lower().replace('ё', 'е')
+    text = _NON_WORD.sub(' ', text).replace('_', ' ').strip()
+    return _PLACE_PREFIX.sub('', text)
+
+
+def transliterate(text: str) -> str:
+    return ''.join(TRANSLIT.get(ch, ch) for ch in text)
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Gazetteer:
+    """Индекс городов (строится один раз при первом обращении)"""
+
+    def __init__(self, path: Path = CITIES_PATH):
+        self.path = path
+        self.cities: List[City] = []
+        self._exact: Dict[str, int] = {}
+        self._keys: List[Tuple[str, int]] = []  # Отсортированы - для поиска по префиксу
+        self._trigrams: Dict[str, List[int]] = defaultdict(list)  # триграмма -> номера ключей
+        self._key_trigrams: List[int] = []  # Число триграмм ключа
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        data = json.loads(self.path.read_text(encoding='utf-8'))
+        keys: Dict[str, int] = {}
+        for index, (name, name_en, country, lat, lon, tz, aliases) in enumerate(data['cities']):
+            self.cities.append(City(name, name_en, country, lat, lon, tz))
+            for alias in (name, name_en, *aliases):
+                key = normalize(alias)
+                # Одинаковые имена: выигрывает город выше в списке (крупнее)
+                keys.setdefault(key, index)
+                keys.setdefault(transliterate(key), index)
+
+        self._exact = keys
+        self._keys = sorted(keys.items())
+        for k, (key, _) in enumerate(self._keys):
+            grams = trigrams(key)
+            self._key_trigrams.append(len(grams))
+            for gram in grams:
+                self._trigrams[gram].append(k)
+        self._loaded = True
+        logger.info(f"Gazetteer loaded: {len(self.cities)} cities, {len(self._keys)} names")
+
+    def lookup(self, query: str) -> Optional[City]:
+        """Лучший город по запросу ('Москва', 'г. Санкт-Петербург', 'Ekaterinburg', 'Киев, Украина')"""
+        found = self.search(query, limit=1)
+        return found[0] if found else None
+
+    def search(self, query: str, limit: int = 5) -> List[City]:
+        """Города по запросу: точное совпадение, затем префикс, затем похожие по триграммам"""
+        self._load()
+        if not query:
+            return []
+        # 'Город, Страна' / 'Город (область)' - ищем по первой части, потом по всему тексту
+        head = re.split(r'[,(]', query, maxsplit=1)[0]
+        for text in dict.fromkeys((head, query)):
+            key = normalize(text)
+            if not key:
+                continue
+            indices = self._search_key(key, limit)
+            if indices:
+                return [self.cities[i] for i in indices]
+        return []
+
+    def _search_key(self, key: str, limit: int) -> List[int]:
+        result: List[int] = []
+
+        def add(index: int):
+            if index not in result:
+                result.append(index)
+
+        exact = self._exact.get(key)
+        if exact is None and not key.isascii():
+            exact = self._exact.get(transliterate(key))
+        if exact is not None:
+            add(exact)
+
+        if len(key) >= MIN_PREFIX:
+            start = bisect_left(self._keys, (key, -1))
+            # Крупные города (выше в списке) - первыми
+            prefixed = []
+            for name, index in self._keys[start:]:
+                if not name.startswith(key):
+                    break
+                prefixed.append(index)
+            for index in sorted(set(prefixed)):
+                add(index)
+
+        if len(result) < limit:
+            for index in self._fuzzy(key):
+                add(index)
+        return result[:limit]
+
+    def _fuzzy(self, key: str) -> List[int]:
+        """Номера городов по убыванию сходства триграмм (опечатки, другая транслитерация)"""
+        grams = trigrams(key)
+        if not key.isascii():
+            grams |= trigrams(transliterate(key))
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for k in self._trigrams.get(gram, ()):
+                shared[k] += 1
+
+        best: Dict[int, float] = {}
+        for k, count in shared.items():
+            score = 2 * count / (len(grams) + self._key_trigrams[k])
+            if score >= MIN_SIMILARITY:
+                index = self._keys[k][1]
+                best[index] = max(best.get(index, 0.0), score)
+        return sorted(best, key=lambda i: (-best[i], i))
+
+
+@lru_cache(maxsize=8192)
+def _utc_offset(timezone: str, year: int, month: int, day: int, hour: int) -> timedelta:
+    """
+    Смещение пояса от UT в этот местный час (история переходов pytz: LMT до 1920-х,
+    декретное и летнее время). Переходы бывают на границе часа, поэтому ключ - час.
+    """
+    tz = pytz.timezone(timezone)
+    return tz.localize(datetime(year, month, day, hour), is_dst=False).utcoffset()
+
+
+def to_ut(local: datetime, timezone: str) -> datetime:
+    """Местное время рождения -> UT (naive), как ждут расчеты swisseph"""
+    if local.tzinfo is not None:
+        return local.astimezone(pytz.utc).replace(tzinfo=None)
+    return local - _utc_offset(timezone, local.year, local.month, local.day, local.hour)
+
+
+def resolve_birth(local: datetime, place: str) -> Optional[Tuple[datetime, City]]:
+    """(время рождения в UT, город) или None, если место не найдено"""
+    city = gazetteer.lookup(place)
+    if city is None:
+        return None
+    return to_ut(local, city.timezone), city
+
+
+# Singleton
+gazetteer = Gazetteer()
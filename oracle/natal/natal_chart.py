@@ -5,9 +5,13 @@
 import swisseph as swe
 from datetime import datetime
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import pytz
 
+from oracle.ephemeris import body_positions, calc_houses, julian_day
+from oracle.executors import executors
+from oracle.natal.aspects import aspect_engine
+
 
 @dataclass
 class NatalPlanet:
@@ -118,42 +122,83 @@ class NatalAstrology:
         longitude: float,
         location: str = "Unknown"
     ) -> NatalChart:
-        """Рассчитать натальную карту"""
-        
+        """Рассчитать натальную карту (birth_date - в UT, см. gazetteer.to_ut)"""
+        positions, houses_cusps = self.calculate_positions(birth_date, latitude, longitude)
+        return self.build_chart(birth_date, latitude, longitude, location, positions, houses_cusps)
+    
+    async def calculate_async(
+        self,
+        birth_date: datetime,
+        latitude: float,
+        longitude: float,
+        location: str = "Unknown"
+    ) -> NatalChart:
+        """calculate_natal_chart в пуле процессов (event loop не блокируется)"""
+        return await executors.run_cpu(_calculate_natal_chart, birth_date, latitude, longitude, location)
+    
+    async def calculate_positions_async(
+        self,
+        birth_date: datetime,
+        latitude: float,
+        longitude: float
+    ) -> Tuple[List[Optional[Tuple[float, float]]], List[float]]:
+        """calculate_positions в пуле процессов"""
+        return await executors.run_cpu(_calculate_positions, birth_date, latitude, longitude)
+    
+    def calculate_positions(
+        self,
+        birth_date: datetime,
+        latitude: float,
+        longitude: float
+    ) -> Tuple[List[Optional[Tuple[float, float]]], List[float]]:
+        """
+        Сырые данные карты (все обращения к swisseph): (долгота, скорость) для каждой
+        планеты в порядке PLANETS (None - не рассчиталась) и 12 куспидов домов
+        """
         # Конвертируем в Julian Day
-        jd = swe.julday(
-            birth_date.year, birth_date.month, birth_date.day,
-            birth_date.hour + birth_date.minute/60.0 + birth_date.second/3600.0
-        )
-        
-        # Рассчитываем планеты
+        jd = julian_day(birth_date)
+
+        # Планеты - из таблицы эфемерид, недостающие - через swisseph
+        # (None - тело недоступно, например Хирон без файлов эфемерид)
+        bodies = body_positions(jd, list(self.PLANETS))
+        positions = [bodies[name] for name in self.PLANETS]
+
+        # Рассчитываем дома
+        houses_cusps = calc_houses(jd, latitude, longitude, b'P')
+        return positions, houses_cusps
+    
+    def build_chart(
+        self,
+        birth_date: datetime,
+        latitude: float,
+        longitude: float,
+        location: str,
+        positions: List[Optional[Tuple[float, float]]],
+        houses_cusps: List[float]
+    ) -> NatalChart:
+        """Собрать карту из сырых позиций и куспидов (без swisseph)"""
         planets = {}
-        for name, planet_id in self.PLANETS.items():
-            try:
-                position = swe.calc_ut(jd, planet_id)[0]
-                lon = position[0]
-                speed = position[3]
-                
-                sign = self._get_sign(lon)
-                degree = int(lon % 30)
-                minute = int((lon % 1) * 60)
-                
-                planets[name] = NatalPlanet(
-                    name=name,
-                    longitude=lon,
-                    sign=sign,
-                    house=0,  # Будет рассчитан позже
-                    degree=degree,
-                    minute=minute,
-                    retrograde=(speed < 0),
-                    element=self.ELEMENTS.get(sign, 'unknown'),
-                    quality=self.QUALITIES.get(sign, 'unknown')
-                )
-            except:
+        for name, position in zip(self.PLANETS, positions):
+            if position is None:
                 continue
+            lon, speed = position
+            
+            sign = self._get_sign(lon)
+            degree = int(lon % 30)
+            minute = int((lon % 1) * 60)
+            
+            planets[name] = NatalPlanet(
+                name=name,
+                longitude=lon,
+                sign=sign,
+                house=0,  # Будет рассчитан позже
+                degree=degree,
+                minute=minute,
+                retrograde=(speed < 0),
+                element=self.ELEMENTS.get(sign, 'unknown'),
+                quality=self.QUALITIES.get(sign, 'unknown')
+            )
         
-        # Рассчитываем дома
-        houses_cusps = swe.houses(jd, latitude, longitude, b'P')[0]
         ascendant = houses_cusps[0]
         mc = houses_cusps[9]
         descendant = (ascendant + 180) % 360
@@ -220,34 +265,20 @@ class NatalAstrology:
         return 1
     
     def _calculate_aspects(self, planets: Dict[str, NatalPlanet]) -> List[NatalAspect]:
-        """Рассчитать аспекты между планетами"""
-        aspects = []
-        aspect_types = {
-            0: ('conjunction', 8, 'Соединение - слияние энергий'),
-            60: ('sextile', 6, 'Секстиль - гармоничная возможность'),
-            90: ('square', 8, 'Квадрат - напряжение и вызов'),
-            120: ('trine', 8, 'Трин - гармония и поток'),
-            180: ('opposition', 8, 'Оппозиция - противостояние и баланс')
-        }
-        
-        planet_list = list(planets.items())
-        for i, (name1, planet1) in enumerate(planet_list):
-            for name2, planet2 in planet_list[i+1:]:
-                angle = abs(planet1.longitude - planet2.longitude)
-                if angle > 180:
-                    angle = 360 - angle
-                
-                for aspect_angle, (asp_type, orb, interp) in aspect_types.items():
-                    if abs(angle - aspect_angle) <= orb:
-                        aspects.append(NatalAspect(
-                            planet1=name1,
-                            planet2=name2,
-                            aspect_type=asp_type,
-                            orb=abs(angle - aspect_angle),
-                            interpretation=interp
-                        ))
-                        break
+        """Рассчитать аспекты между планетами (мажорные, орбисы по планетам, самые точные первыми)"""
+        names = list(planets)
+        hits = aspect_engine.natal(names, [p.longitude for p in planets.values()], include_minor=False)
         
+        aspects = []
+        for i, j, k, orb in zip(hits.first.tolist(), hits.second.tolist(), hits.aspect.tolist(), hits.orb.tolist()):
+            aspect_type = aspect_engine.aspect_types[k]
+            aspects.append(NatalAspect(
+                planet1=names[i],
+                planet2=names[j],
+                aspect_type=aspect_type.name,
+                orb=orb,
+                interpretation=aspect_type.interpretation
+            ))
         return aspects
     
     def _calculate_element_balance(self, planets: Dict[str, NatalPlanet]) -> Dict[str, int]:
@@ -323,3 +354,12 @@ class NatalAstrology:
 
 # Singleton
 natal_astrology = NatalAstrology()
+
+
+# Точки входа для пула процессов (функции модуля сериализуются по имени)
+def _calculate_natal_chart(*args) -> NatalChart:
+    return natal_astrology.calculate_natal_chart(*args)
+
+
+def _calculate_positions(*args):
+    return natal_astrology.calculate_positions(*args)
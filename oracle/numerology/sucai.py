@@ -1,11 +1,37 @@
 """
 Китайская нумерология Сюцай (Suanming / Chinese Numerology)
-Расчет числа судьбы, личности и жизненного пути по дате рождения
+Расчет числа судьбы, личности и жизненного пути по дате рождения.
+calculate_sucai_many - те же числа для массива дат (сегменты рассылки, аналитика, массовая совместимость).
 """
 from datetime import datetime
 from dataclasses import dataclass
 from typing import Dict, List
 
+import numpy as np
+
+from oracle.matrix.matrix_table import date_parts
+
+
+# Названия по индексу в структурном массиве calculate_sucai_many
+SUCAI_ELEMENTS = ('Вода', 'Земля', 'Дерево', 'Металл', 'Огонь')
+YIN_YANG = ("Ян (♂)", "Инь (♀)")  # Индекс: 1 - Инь (четный жизненный путь)
+
+SUCAI_DTYPE = np.dtype([
+    ('life_path', np.uint8),
+    ('destiny', np.uint8),
+    ('soul', np.uint8),
+    ('personality', np.uint8),
+    ('maturity', np.uint8),
+    ('element', np.uint8),  # Индекс в SUCAI_ELEMENTS
+    ('yin_yang', np.uint8),  # Индекс в YIN_YANG
+])
+
+
+def reduce_to_single(numbers) -> np.ndarray:
+    """Векторный _reduce_to_single: повторная сумма цифр - это цифровой корень, 0 -> 9"""
+    numbers = np.asarray(numbers, dtype=np.int64)
+    return np.where(numbers > 0, (numbers - 1) % 9 + 1, 9)
+
 
 @dataclass
 class SucaiNumbers:
@@ -74,6 +100,12 @@ class ChineseNumerology:
         9: ('Огонь', ['красный', 'оранжевый'], ['Юг'])
     }
     
+    def __init__(self):
+        # Жизненный путь (0-9) -> индекс элемента в SUCAI_ELEMENTS
+        self._element_index = np.array(
+            [SUCAI_ELEMENTS.index(self.ELEMENTS.get(n, ('Земля',))[0]) for n in range(10)], dtype=np.uint8
+        )
+    
     def calculate_sucai(self, birth_date: datetime, full_name: str = "") -> SucaiNumbers:
         """Рассчитать числа Сюцай"""
         
@@ -120,6 +152,48 @@ class ChineseNumerology:
             lucky_directions=directions
         )
     
+    def calculate_sucai_many(self, dates) -> np.ndarray:
+        """
+        Числа Сюцай для массива дат (datetime/date или datetime64[D]) за один проход:
+        структурный массив SUCAI_DTYPE. Толкования и символы - по индексу через sucai_at.
+        """
+        day, month, year = date_parts(dates)
+        rows = np.empty(len(day), dtype=SUCAI_DTYPE)
+
+        life_path = reduce_to_single(reduce_to_single(day) + reduce_to_single(month) + reduce_to_single(year))
+        # Сумма цифр даты сравнима с днем + месяцем + годом по модулю 9 - цифровой корень тот же
+        destiny = reduce_to_single(day + month + year)
+        rows['life_path'] = life_path
+        rows['destiny'] = destiny
+        rows['soul'] = reduce_to_single(day)
+        rows['personality'] = reduce_to_single(month)
+        rows['maturity'] = reduce_to_single(life_path + destiny)
+        rows['element'] = self._element_index[life_path]
+        rows['yin_yang'] = life_path % 2 == 0
+        return rows
+
+    def sucai_at(self, rows: np.ndarray, index: int) -> SucaiNumbers:
+        """Полный SucaiNumbers (толкования, счастливые числа, цвета) для одной строки calculate_sucai_many"""
+        life_path, destiny, soul, personality, maturity, element, yin_yang = rows[index].item()
+        _, colors, directions = self.ELEMENTS.get(life_path, ('Земля', ['желтый'], ['Центр']))
+        return SucaiNumbers(
+            life_path=life_path,
+            destiny=destiny,
+            soul=soul,
+            personality=personality,
+            maturity=maturity,
+            element=SUCAI_ELEMENTS[element],
+            yin_yang=YIN_YANG[yin_yang],
+            life_path_meaning=self.LIFE_PATH_MEANINGS.get(life_path, ""),
+            destiny_meaning=self.DESTINY_MEANINGS.get(destiny, ""),
+            soul_meaning=self.LIFE_PATH_MEANINGS.get(soul, ""),
+            personality_meaning=self.LIFE_PATH_MEANINGS.get(personality, ""),
+            lucky_numbers=self._get_lucky_numbers(life_path),
+            unlucky_numbers=self._get_unlucky_numbers(life_path),
+            lucky_colors=colors,
+            lucky_directions=directions
+        )
+
     def _calculate_life_path(self, birth_date: datetime) -> int:
         """Рассчитать число жизненного пути"""
         # Складываем все цифры даты рождения
@@ -144,9 +218,8 @@ class ChineseNumerology:
     
     def _reduce_to_single(self, number: int) -> int:
         """Свести число к одной цифре (1-9)"""
-        while number > 9:
-            number = sum(int(digit) for digit in str(number))
-        return number if number > 0 else 9
+        # Повторная сумма цифр - цифровой корень
+        return (number - 1) % 9 + 1 if number > 0 else 9
     
     def _get_lucky_numbers(self, life_path: int) -> List[int]:
         """Получить счастливые числа"""
@@ -0,0 +1,128 @@
+"""
+Кэш ответов LLM для детерминированных расчетов (Сюцай, Матрица Судьбы)
+Два уровня: LRU в памяти процесса + таблица в SQLite с TTL
+"""
+import dataclasses
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from enum import Enum
+from typing import Any, Optional
+
+from loguru import logger
+from sqlalchemy import delete
+
+from config.settings import settings
+from database.database import AsyncSessionLocal
+from database.models import LLMCacheEntry
+
+
+def canonicalize(value: Any) -> Any:
+    """Привести данные расчета к каноническому JSON-виду (порядок ключей и типы не влияют на ключ)"""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        value = dataclasses.asdict(value)
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(canonicalize(v) for v in value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return canonicalize(value.value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def make_cache_key(**parts) -> str:
+    """Контентный ключ: SHA-256 от канонизированных частей запроса"""
+    payload = json.dumps(canonicalize(parts), ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Двухуровневый кэш ответов: память (LRU) -> SQLite (TTL)"""
+
+    PURGE_INTERVAL = timedelta(hours=1)
+
+    def __init__(self, max_items: int = 1000, ttl: timedelta = timedelta(days=30)):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple[datetime, str]]" = OrderedDict()
+        self._last_purge = datetime.min
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        """Получить ответ из кэша (None, если нет или истек)"""
+        value = self._get_memory(key)
+        if value is None:
+            try:
+                entry = await self._load(key)
+            except Exception as e:
+                logger.warning(f"Response cache read failed: {e}")
+                entry = None
+            if entry:
+                value, expires_at = entry
+                self._put_memory(key, value, expires_at)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        """Сохранить ответ в оба уровня кэша"""
+        expires_at = datetime.utcnow() + self.ttl
+        self._put_memory(key, value, expires_at)
+        try:
+            await self._store(key, value, expires_at)
+        except Exception as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        item = self._memory.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= datetime.utcnow():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _put_memory(self, key: str, value: str, expires_at: datetime):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    async def _load(self, key: str):
+        async with AsyncSessionLocal() as session:
+            entry = await session.get(LLMCacheEntry, key)
+            if not entry or entry.expires_at <= datetime.utcnow():
+                return None
+            return entry.value, entry.expires_at
+
+    async def _store(self, key: str, value: str, expires_at: datetime):
+        async with AsyncSessionLocal() as session:
+            await session.merge(LLMCacheEntry(key=key, value=value, expires_at=expires_at))
+
+            # Периодически вычищаем просроченные записи
+            now = datetime.utcnow()
+            if now - self._last_purge > self.PURGE_INTERVAL:
+                await session.execute(delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= now))
+                self._last_purge = now
+
+            await session.commit()
+
+
+# Singleton
+response_cache = ResponseCache(
+    max_items=settings.llm_cache_memory_items,
+    ttl=timedelta(days=settings.llm_cache_ttl_days)
+)
@@ -3,22 +3,15 @@
 Основано на методе Бронислава Виногродского
 """
 from typing import Dict, Any
-import openai
-from anthropic import Anthropic
 
-from config.settings import settings
+from oracle.llm_scheduler import llm_scheduler
 
 
 class RitualGenerator:
     """Генератор психологических ритуалов для решения проблем"""
     
     def __init__(self):
-        if settings.ai_provider == "openai":
-            self.client = openai.OpenAI(api_key=settings.openai_api_key)
-            self.ai_provider = "openai"
-        else:
-            self.client = Anthropic(api_key=settings.anthropic_api_key)
-            self.ai_provider = "anthropic"
+        self.llm = llm_scheduler
     
     async def generate_ritual(self, question: str, oracle_response: Dict[str, Any]) -> str:
         """
@@ -83,29 +76,7 @@ class RitualGenerator:
 Создай персональный психологический ритуал для этого человека, который поможет ему трансформировать ситуацию.
 Используй символизм из гадания (гексаграммы, карты, стихии)."""
         
-        if self.ai_provider == "openai":
-            response = self.client.chat.completions.create(
-                model=settings.ai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.85,
-                max_tokens=2000
-            )
-            return response.choices[0].message.content
-        
-        else:  # anthropic
-            response = self.client.messages.create(
-                model=settings.ai_model,
-                max_tokens=2000,
-                temperature=0.85,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-            return response.content[0].text
+        return await self.llm.complete(system_prompt, user_prompt, temperature=0.85, max_tokens=2000)
 
 
 # Singleton
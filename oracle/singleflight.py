@@ -0,0 +1,42 @@
+"""
+Склейка одинаковых одновременных запросов (single-flight)
+Пока работа по ключу выполняется, остальные вызовы с тем же ключом ждут
+ее результат, а не запускают свой парсинг или запрос к модели
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Группа одновременных вызовов: по каждому ключу выполняется не больше одной задачи"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0  # Сколько раз работа реально выполнялась
+        self.shared = 0  # Сколько вызовов получили чужой результат
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Выполнить func(*args, **kwargs) или дождаться уже идущего вызова с тем же ключом.
+        Ошибка общей задачи получает каждый ожидающий.
+        Отмена одного вызывающего не отменяет работу для остальных.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(func(*args, **kwargs))
+            self._inflight[key] = task
+            self.started += 1
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Забираем исключение, если все ожидающие уже ушли (иначе asyncio пишет warning)
+        if not task.cancelled():
+            task.exception()
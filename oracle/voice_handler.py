@@ -8,6 +8,7 @@ import tempfile
 from telegram import File as TelegramFile
 
 from config.settings import settings
+from oracle.http_client import http_client
 
 class VoiceHandler:
     """Обработчик голосовых сообщений"""
@@ -36,14 +37,14 @@ class VoiceHandler:
                         "Authorization": f"Bearer {api_key}"
                     }
                     
-                    # Формируем multipart form data руками или через aiohttp
-                    data = aiohttp.FormData()
-                    data.add_field('file', open(file_path, 'rb'), filename='voice.ogg')
-                    data.add_field('model', 'whisper-large-v3')
-                    data.add_field('response_format', 'text')
-                    
-                    async with aiohttp.ClientSession() as session:
-                        async with session.post(url, headers=headers, data=data) as response:
+                    with open(file_path, 'rb') as audio_file:
+                        # Формируем multipart form data руками или через aiohttp
+                        data = aiohttp.FormData()
+                        data.add_field('file', audio_file, filename='voice.ogg')
+                        data.add_field('model', 'whisper-large-v3')
+                        data.add_field('response_format', 'text')
+                        
+                        async with http_client.session.post(url, headers=headers, data=data) as response:
                             if response.status == 200:
                                 text = await response.text()
                                 return text.strip()
@@ -57,11 +58,11 @@ class VoiceHandler:
         if settings.openai_api_key:
             try:
                 logger.info("🎤 Используем OpenAI Whisper для транскрипции...")
-                from openai import OpenAI
-                client = OpenAI(api_key=settings.openai_api_key)
+                from openai import AsyncOpenAI
+                client = AsyncOpenAI(api_key=settings.openai_api_key)
                 
                 with open(file_path, "rb") as audio_file:
-                    transcription = client.audio.transcriptions.create(
+                    transcription = await client.audio.transcriptions.create(
                         model="whisper-1", 
                         file=audio_file
                     )
@@ -0,0 +1,32 @@
+"""
+Общие настройки тестов
+Настройки бота читаются при импорте модулей, поэтому окружение (токены-заглушки,
+временная SQLite-база) задается до импорта чего-либо из проекта.
+"""
+import os
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="oracle-tests-")
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-token")
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR}/oracle.db"
+
+
+@pytest.fixture
+async def db():
+    """Чистая база на каждый тест"""
+    from database.database import AsyncSessionLocal, close_db, engine, init_db
+    from database.models import Base
+    from database.user_cache import user_cache
+
+    init_db()
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    user_cache.clear()
+    yield AsyncSessionLocal
+    # Соединения aiosqlite привязаны к event loop теста
+    await close_db()
@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from database.models import QuestionSession, User
+from database.user_manager import UserManager, _new_user
+
+
+def tg_user(telegram_id=1001):
+    return SimpleNamespace(id=telegram_id, username="seeker", first_name="Seeker", last_name=None)
+
+
+async def _admit_concurrently(n, user, free_limit=2):
+    return await asyncio.gather(*(UserManager.admit_question(user, free_limit=free_limit) for _ in range(n)))
+
+
+async def test_concurrent_questions_never_exceed_daily_limit(db):
+    user = tg_user()
+    async with db() as session:
+        session.add(_new_user(user))
+        await session.commit()
+
+    admissions = await _admit_concurrently(20, user)
+
+    assert sum(a.allowed for a in admissions) == 2
+    async with db() as session:
+        row = await session.scalar(select(User).where(User.telegram_id == user.id))
+    assert row.questions_today == 2
+    assert row.total_questions_asked == 2
+
+
+async def test_concurrent_first_questions_of_new_user(db):
+    # Пользователя еще нет: параллельные запросы одновременно пытаются его создать
+    admissions = await _admit_concurrently(10, tg_user())
+
+    assert sum(a.allowed for a in admissions) == 2
+    async with db() as session:
+        rows = (await session.scalars(select(User))).all()
+    assert len(rows) == 1
+    assert rows[0].questions_today == 2
+
+
+async def test_bonus_questions_spent_exactly_once(db):
+    user = tg_user()
+    async with db() as session:
+        session.add(_new_user(user, bonus_questions=3))
+        await session.commit()
+
+    admissions = await _admit_concurrently(20, user)
+
+    assert sum(a.allowed for a in admissions) == 5
+    assert sum(a.used_bonus for a in admissions) == 3
+    async with db() as session:
+        row = await session.scalar(select(User).where(User.telegram_id == user.id))
+    assert row.bonus_questions == 0
+    assert row.total_questions_asked == 5
+
+
+async def test_answer_is_recorded_for_existing_user(db):
+    user = tg_user()
+    await UserManager.admit_question(user)
+
+    assert await UserManager.record_answer(user.id, "Что меня ждет?", {'interpretation': "Путь"})
+    async with db() as session:
+        saved = (await session.scalars(select(QuestionSession))).all()
+    assert [(s.question, s.interpretation) for s in saved] == [("Что меня ждет?", "Путь")]
+
+
+async def test_answer_for_missing_user_is_skipped(db):
+    # Допуск упал и вопрос пропущен без строки в users - запись истории не падает
+    assert not await UserManager.record_answer(4242, "Вопрос", {'interpretation': "Ответ"})
+    async with db() as session:
+        assert (await session.scalars(select(QuestionSession))).all() == []
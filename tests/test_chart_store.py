@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from bot.extended_handlers import parse_birth_input
+from oracle.natal.chart_store import NatalChartStore
+
+BIRTH_UT = datetime(1990, 3, 15, 11, 30)
+MOSCOW = (55.7558, 37.6173)
+
+
+async def test_chart_is_computed_once_and_reused(db):
+    store = NatalChartStore()
+    first = await store.get(BIRTH_UT, *MOSCOW, "Москва", telegram_id=42)
+    again = await store.get(BIRTH_UT, *MOSCOW, "Москва", telegram_id=42)
+
+    assert again is first
+    assert (store.computed, store.hits) == (1, 1)
+
+    # Новый процесс: карта читается из БД, swisseph не вызывается
+    restarted = NatalChartStore()
+    loaded = await restarted.get(BIRTH_UT, *MOSCOW, "Москва", telegram_id=42)
+    assert (restarted.computed, restarted.loaded) == (0, 1)
+    assert loaded.ascendant == first.ascendant
+    assert {name: p.longitude for name, p in loaded.planets.items()} == {
+        name: p.longitude for name, p in first.planets.items()
+    }
+
+    latest = await NatalChartStore().latest_for_user(42)
+    assert latest.mc == first.mc
+
+
+def test_parse_birth_input():
+    assert parse_birth_input("15.03.1990 14:30 Москва") == (datetime(1990, 3, 15, 14, 30), "Москва")
+    assert parse_birth_input("1.2.1985 Санкт-Петербург, Россия") == (datetime(1985, 2, 1, 12, 0), "Санкт-Петербург, Россия")
+    assert parse_birth_input("31.02.1990 10:00 Москва") is None
+    assert parse_birth_input("когда-то в Москве") is None
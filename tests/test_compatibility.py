@@ -0,0 +1,72 @@
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from database.user_manager import user_manager
+from oracle.compatibility.compatibility import compatibility
+
+BIRTH = datetime(1990, 5, 17, 14, 30)
+
+# Разные эпохи, граница года, високосный день и повтор даты
+CANDIDATES = [
+    date(1950, 1, 1), date(1969, 12, 31), date(1984, 2, 29), date(1990, 5, 17), date(1995, 8, 8),
+    date(1999, 12, 31), date(2000, 1, 1), date(2003, 11, 23), date(2010, 6, 30), date(1995, 8, 8),
+] + [date(1970, 1, 1) + timedelta(days=733 * i) for i in range(15)]
+
+
+@pytest.fixture(scope="module")
+def bulk():
+    return compatibility.calculate_many(BIRTH, CANDIDATES)
+
+
+@pytest.mark.parametrize("i", range(len(CANDIDATES)))
+def test_bulk_matches_single(bulk, i):
+    # Карта кандидата в пакетном режиме строится на полдень UT
+    candidate = datetime.combine(CANDIDATES[i], datetime.min.time()).replace(hour=12)
+    single = compatibility.calculate(BIRTH, candidate)["details"]
+    details = bulk.details(i)
+
+    for key in ("elements", "sucai", "matrix", "biorhythm"):
+        assert details[key] == single[key], key
+    # Орбы пакетного режима берутся из таблицы с шагом 0.1° - на границе орба аспект может сдвинуться
+    assert abs(details["aspects"] - single["aspects"]) <= 1
+    assert abs(details["astro"] - single["astro"]) <= 1
+
+
+def test_top_matches_are_sorted_and_consistent(bulk):
+    top = compatibility.top_matches(BIRTH, CANDIDATES, k=5)
+
+    scores = [m["total_score"] for m in top]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] == bulk.total_score.max()
+    for match in top:
+        assert match["birth_date"] == CANDIDATES[match["index"]]
+        assert match["details"] == bulk.details(match["index"])
+
+
+def test_accepts_datetime64_candidates(bulk):
+    again = compatibility.calculate_many(BIRTH, np.array(CANDIDATES, dtype='datetime64[D]'))
+    np.testing.assert_array_equal(again.total_score, bulk.total_score)
+
+
+async def test_saved_natal_chart_feeds_synastry(db):
+    await user_manager.get_or_create_user(SimpleNamespace(id=91, username=None, first_name="Seeker", last_name=None))
+    await user_manager.save_user_data(91, birth_date=datetime(1990, 5, 17), birth_time="14:30", birth_location="Москва")
+    partner = datetime(1995, 8, 8)
+
+    result = await compatibility.calculate_for_user(91, datetime(1990, 5, 17), partner)
+    synastry = result["synastry"]
+    # Своя сторона - натальная карта (есть асцендент и MC), партнер - только дата
+    assert {"Ascendant", "MC"} <= set(synastry.bodies1)
+    assert "Ascendant" not in synastry.bodies2
+
+    # Порядок дат не важен: та же пара из кэша, развернутая
+    reverse = (await compatibility.calculate_for_user(91, partner, datetime(1990, 5, 17)))["synastry"]
+    assert reverse.bodies2 == synastry.bodies1
+    assert reverse.aspect_score == synastry.aspect_score
+
+    # Без сохраненных данных - синастрия по датам
+    plain = (await compatibility.calculate_for_user(92, datetime(1990, 5, 17), partner))["synastry"]
+    assert "Ascendant" not in plain.bodies1
@@ -0,0 +1,84 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from oracle.matrix import matrix_table as mt
+from oracle.matrix.destiny_matrix import matrix_of_destiny
+
+
+FIELDS = {
+    'personal': 'personal_arcana',
+    'destiny': 'destiny_arcana',
+    'social': 'social_arcana',
+    'spiritual': 'spiritual_arcana',
+    'health': 'health_arcana',
+    'money': 'money_arcana',
+    'parent_program': 'parent_program',
+    'love_program': 'love_program',
+    'talent_program': 'talent_program',
+}
+
+
+def reference(d: datetime) -> dict:
+    """Арканы по исходным формулам (сумма цифр строкой), без таблицы"""
+    reduce = matrix_of_destiny._reduce_to_arcana
+    personal, destiny, social = reduce(d.day), reduce(d.month), reduce(d.year)
+    return {
+        'personal': personal,
+        'destiny': destiny,
+        'social': social,
+        'spiritual': reduce(personal + destiny + social),
+        'chakra_line': [personal, destiny, social, reduce(d.day + d.month), reduce(d.month + d.year),
+                        reduce(d.day + d.year), reduce(d.day + d.month + d.year)],
+        'health': reduce(d.day + d.month),
+        'money': reduce(d.day + d.year),
+        'parent_program': reduce(d.day + d.month + d.year),
+        'love_program': reduce(personal + destiny),
+        'talent_program': reduce(personal + social),
+    }
+
+
+def sample_dates():
+    # Каждые 97 дней по всей таблице + края и даты вне ее
+    dates = [date(1900, 1, 1) + timedelta(days=97 * i) for i in range(760)]
+    return dates + [date(1900, 1, 1), date(2100, 12, 31), date(1899, 12, 31), date(2101, 1, 1), date(1812, 9, 7)]
+
+
+def test_table_rows_match_reference_formulas():
+    dates = sample_dates()
+    rows = mt.compute(dates)
+    for row, d in zip(rows, dates):
+        expected = reference(datetime(d.year, d.month, d.day))
+        assert row['chakra_line'].tolist() == expected.pop('chakra_line'), d
+        assert {key: int(row[key]) for key in expected} == expected, d
+
+
+def test_calculate_many_matches_calculate_matrix():
+    dates = sample_dates()
+    rows = matrix_of_destiny.calculate_many(np.array(dates, dtype='datetime64[D]'))
+    assert len(rows) == len(dates)
+    for row, d in zip(rows, dates):
+        single = matrix_of_destiny.calculate_matrix(datetime(d.year, d.month, d.day))
+        assert row['chakra_line'].tolist() == single.chakra_line, d
+        for field, attr in FIELDS.items():
+            assert int(row[field]) == getattr(single, attr), (d, field)
+
+
+def test_year_arcana_matches_single():
+    dates = sample_dates()[:50]
+    year = datetime.now().year
+    arcana = mt.year_arcana(dates, year)
+    for value, d in zip(arcana, dates):
+        single = matrix_of_destiny.calculate_matrix(datetime(d.year, d.month, d.day))
+        assert int(value) == single.current_year_arcana
+
+
+def test_built_table_is_used_for_lookups(tmp_path):
+    path = mt.build(tmp_path / "destiny_matrix.npy", start_year=1990, end_year=1991)
+    table = mt.MatrixTable(path)
+    dates = [date(1989, 12, 31), date(1990, 1, 1), date(1991, 7, 4), date(1992, 1, 1)]
+
+    rows = table.lookup_many(dates)
+    np.testing.assert_array_equal(rows, mt.compute(dates))
+    assert table.row(date(1991, 7, 4)) == mt.compute([date(1991, 7, 4)])[0]
+    assert len(table._load()) == 730
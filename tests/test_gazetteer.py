@@ -0,0 +1,58 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from database.user_manager import user_manager
+from oracle.natal.chart_store import NatalChartStore
+from oracle.natal.gazetteer import gazetteer, resolve_birth, to_ut
+
+
+@pytest.mark.parametrize("query", ["Москва", "г. Москва", "Moscow", "Moskva", "москва, Россия"])
+def test_lookup_finds_city_by_any_spelling(query):
+    assert gazetteer.lookup(query).name == "Москва"
+
+
+def test_lookup_tolerates_typos():
+    assert gazetteer.lookup("Новосибирк").name == "Новосибирск"
+    assert gazetteer.lookup("Ekaterinburg").name == "Екатеринбург"
+
+
+def test_unknown_place_is_not_resolved():
+    assert resolve_birth(datetime(1990, 3, 15, 14, 30), "Нигдеград-на-Марсе") is None
+
+
+@pytest.mark.parametrize("local, timezone, expected", [
+    # Москва: зимнее время 1990 (UTC+3), летнее 1990 (UTC+4), постоянное UTC+3 с 2014
+    (datetime(1990, 3, 15, 14, 30), "Europe/Moscow", datetime(1990, 3, 15, 11, 30)),
+    (datetime(1990, 7, 1, 14, 30), "Europe/Moscow", datetime(1990, 7, 1, 10, 30)),
+    (datetime(2015, 7, 1, 14, 30), "Europe/Moscow", datetime(2015, 7, 1, 11, 30)),
+    # Екатеринбург в 1985 - UTC+5, переход через полночь назад
+    (datetime(1985, 2, 1, 3, 0), "Asia/Yekaterinburg", datetime(1985, 1, 31, 22, 0)),
+])
+def test_local_birth_time_to_ut(local, timezone, expected):
+    assert to_ut(local, timezone) == expected
+
+
+async def test_saved_birth_data_builds_chart_in_ut(db):
+    user = SimpleNamespace(id=77, username=None, first_name="Seeker", last_name=None)
+    await user_manager.get_or_create_user(user)
+    await user_manager.save_user_data(77, birth_date=datetime(1990, 7, 1), birth_time="14:30", birth_location="Москва")
+
+    store = NatalChartStore()
+    chart = await store.for_user(77)
+
+    # Карта посчитана на UT (14:30 MSD = 10:30 UT), а показывается местное время
+    in_ut = await store.get(datetime(1990, 7, 1, 10, 30), 55.7558, 37.6173, "Москва")
+    assert chart.birth_date == datetime(1990, 7, 1, 14, 30)
+    assert chart.ascendant == in_ut.ascendant
+    assert chart.planets["Moon"].longitude == in_ut.planets["Moon"].longitude
+    assert store.computed == 1
+
+
+async def test_no_chart_without_birth_place(db):
+    user = SimpleNamespace(id=78, username=None, first_name="Seeker", last_name=None)
+    await user_manager.get_or_create_user(user)
+    await user_manager.save_user_data(78, birth_date=datetime(1990, 7, 1))
+
+    assert await NatalChartStore().for_user(78) is None
@@ -0,0 +1,81 @@
+from contextlib import aclosing
+
+import pytest
+
+from oracle.interpreter import INTERPRETATION_ERROR_TEXT, OracleInterpreter
+from oracle.llm_router import LLMRouter
+from oracle.llm_scheduler import LLMScheduler
+
+
+class FakeLLM:
+    def __init__(self, chunks, complete_result="полный ответ", complete_error=None):
+        self.chunks = chunks
+        self.complete_result = complete_result
+        self.complete_error = complete_error
+        self.complete_calls = 0
+
+    async def stream(self, *args, **kwargs):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def complete(self, *args, **kwargs):
+        self.complete_calls += 1
+        if self.complete_error:
+            raise self.complete_error
+        return self.complete_result
+
+
+async def collect(llm):
+    interpreter = OracleInterpreter()
+    interpreter.llm = llm
+    return "".join([chunk async for chunk in interpreter.stream_interpretation("вопрос", "данные", "Искатель")])
+
+
+async def test_stream_passes_chunks_through():
+    llm = FakeLLM(["Видение ", "и суть"])
+    assert await collect(llm) == "Видение и суть"
+    assert llm.complete_calls == 0
+
+
+@pytest.mark.parametrize("chunks", [[], ["", "  \n"]])
+async def test_empty_stream_falls_back_to_complete(chunks):
+    llm = FakeLLM(chunks)
+    assert (await collect(llm)).strip() == "полный ответ"
+    assert llm.complete_calls == 1
+
+
+async def test_empty_stream_and_failed_complete_give_error_text():
+    llm = FakeLLM([], complete_error=RuntimeError("down"))
+    assert await collect(llm) == INTERPRETATION_ERROR_TEXT
+
+
+class EndlessProvider:
+    name = "endless"
+    model = "endless-model"
+
+    def __init__(self):
+        self.closed = False
+
+    async def stream(self, *args, **kwargs):
+        try:
+            while True:
+                yield "слово "
+        finally:
+            self.closed = True
+
+
+async def test_aborted_stream_releases_queue_slot_immediately():
+    provider = EndlessProvider()
+    scheduler = LLMScheduler(LLMRouter([provider]), max_concurrency=1, rate_limits={"endless": 600})
+    interpreter = OracleInterpreter()
+    interpreter.llm = scheduler
+
+    # Как в main.py: отправка в Telegram упала посреди потока
+    with pytest.raises(RuntimeError):
+        async with aclosing(interpreter.stream_interpretation("вопрос", "данные", "Искатель")) as chunks:
+            async for _ in chunks:
+                raise RuntimeError("telegram send failed")
+
+    # Без ожидания сборщика мусора: слот очереди и поток провайдера уже освобождены
+    assert scheduler.active == 0
+    assert provider.closed
@@ -0,0 +1,78 @@
+import pytest
+
+from oracle.llm_client import LLMProviderError
+from oracle.llm_router import LLMRouter
+
+
+class FakeProvider:
+    def __init__(self, name, status=None, fails=True):
+        self.name = name
+        self.model = f"{name}-model"
+        self.status = status
+        self.fails = fails
+        self.calls = 0
+
+    async def complete(self, system_prompt, user_prompt, **kwargs):
+        self.calls += 1
+        if self.fails:
+            raise LLMProviderError(self.name, "boom", self.status)
+        return f"answer from {self.name}"
+
+
+def router(*providers):
+    r = LLMRouter(list(providers))
+    r.hedge_enabled = False
+    return r
+
+
+@pytest.mark.parametrize("status", [None, 500, 429, 404])
+async def test_failing_provider_fails_over_and_drops(status):
+    broken = FakeProvider("broken", status)
+    good = FakeProvider("good", fails=False)
+    r = router(broken, good)
+
+    assert await r.complete("system", "user") == "answer from good"
+    assert r.primary is good
+    assert r.stats["broken"].error_rate == 1.0
+
+
+async def test_request_error_is_raised_without_failover_but_still_ranks_last():
+    # 400 - ошибка самого запроса: другому провайдеру его не отправляем
+    broken = FakeProvider("broken", 400)
+    good = FakeProvider("good", fails=False)
+    r = router(broken, good)
+
+    with pytest.raises(LLMProviderError):
+        await r.complete("system", "user")
+    assert good.calls == 0
+    # Провайдер без единого успеха не остается первым
+    assert r.primary is good
+    assert await r.complete("system", "user") == "answer from good"
+
+
+async def test_failing_provider_sinks_below_measured_ones():
+    broken = FakeProvider("broken", 400)
+    good = FakeProvider("good", fails=False)
+    r = router(good, broken)
+    assert await r.complete("system", "user") == "answer from good"
+    # Провайдер без замеров идет первым, чтобы получить замер
+    assert r.primary is broken
+
+    with pytest.raises(LLMProviderError):
+        await r.complete("system", "user")
+
+    # После первой же ошибки запросы идут измеренному провайдеру
+    assert r.primary is good
+    for _ in range(5):
+        assert await r.complete("system", "user") == "answer from good"
+    assert broken.calls == 1
+
+
+async def test_repeated_request_errors_put_provider_on_cooldown():
+    broken = FakeProvider("broken", 400)
+    r = router(broken)
+    for _ in range(LLMRouter.PERSISTENT_FAILURES):
+        with pytest.raises(LLMProviderError):
+            await r.complete("system", "user")
+    # Серия одинаковых ошибок подряд - это уже провайдер (например, модель снята)
+    assert r.snapshot()[0]["cooldown"] > 0
@@ -0,0 +1,73 @@
+from collections import Counter
+
+import pytest
+from sqlalchemy import select
+
+from bot import mailing
+from bot.mailing import DailyMailer
+from database.models import Broadcast, User
+
+SUBSCRIBERS = 45
+
+
+class Crash(BaseException):
+    """Остановка процесса посреди рассылки (не перехватывается как ошибка отправки)"""
+
+
+class FakeBot:
+    def __init__(self, crash_after=None):
+        self.sent = []
+        self.crash_after = crash_after
+
+    async def send_message(self, chat_id, **kwargs):
+        if self.crash_after is not None and len(self.sent) >= self.crash_after:
+            raise Crash()
+        self.sent.append(chat_id)
+
+
+@pytest.fixture
+async def subscribers(db, monkeypatch):
+    async def guidance(sign):
+        return f"Послание для {sign}"
+
+    monkeypatch.setattr(mailing.daily_guidance, "get", guidance)
+    async with db() as session:
+        session.add_all(
+            User(telegram_id=5000 + i, daily_prediction_enabled=True) for i in range(SUBSCRIBERS)
+        )
+        await session.commit()
+    return [5000 + i for i in range(SUBSCRIBERS)]
+
+
+def mailer():
+    # Одна отправка за раз - остановка приходится на середину части
+    return DailyMailer(messages_per_second=10000, concurrency=1, batch_size=20, checkpoint_size=10)
+
+
+@pytest.mark.parametrize("crash_after", [20, 25])
+async def test_resume_after_crash_sends_no_duplicates(db, subscribers, crash_after):
+    crashed = FakeBot(crash_after=crash_after)
+    with pytest.raises(Crash):
+        await mailer().run(crashed)
+
+    restarted = FakeBot()
+    report = await mailer().resume(restarted)
+
+    assert report.resumed
+    deliveries = Counter(crashed.sent + restarted.sent)
+    assert sorted(deliveries) == subscribers
+    assert set(deliveries.values()) == {1}
+
+    async with db() as session:
+        broadcast = await session.scalar(select(Broadcast))
+    assert broadcast.status == 'done'
+    assert broadcast.sent == SUBSCRIBERS
+
+
+async def test_completed_mailing_is_not_sent_again(db, subscribers):
+    bot = FakeBot()
+    await mailer().run(bot)
+
+    assert await mailer().resume(bot) is None
+    await mailer().run(bot)
+    assert sorted(bot.sent) == subscribers
@@ -0,0 +1,41 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from oracle.numerology.sucai import chinese_numerology, reduce_to_single
+
+
+def digit_sum_to_single(number: int) -> int:
+    """Исходное сведение: сумма цифр строкой, пока число больше 9 (0 -> 9)"""
+    while number > 9:
+        number = sum(int(digit) for digit in str(number))
+    return number if number > 0 else 9
+
+
+def sample_dates():
+    dates = [date(1900, 1, 1) + timedelta(days=11 * i) for i in range(6700)]
+    return dates + [date(2000, 2, 29), date(1999, 12, 31), date(1, 1, 1), date(9999, 12, 31)]
+
+
+def test_reduce_to_single_matches_digit_sum():
+    numbers = np.arange(0, 20000)
+    expected = [digit_sum_to_single(n) for n in numbers.tolist()]
+    assert reduce_to_single(numbers).tolist() == expected
+    assert [chinese_numerology._reduce_to_single(n) for n in numbers.tolist()] == expected
+
+
+def test_calculate_sucai_many_matches_single():
+    dates = sample_dates()
+    rows = chinese_numerology.calculate_sucai_many(dates)
+    assert len(rows) == len(dates)
+    for i, d in enumerate(dates):
+        single = chinese_numerology.calculate_sucai(datetime(d.year, d.month, d.day))
+        assert chinese_numerology.sucai_at(rows, i) == single, d
+
+
+def test_accepts_datetime64_dates():
+    dates = sample_dates()[:100]
+    np.testing.assert_array_equal(
+        chinese_numerology.calculate_sucai_many(np.array(dates, dtype='datetime64[D]')),
+        chinese_numerology.calculate_sucai_many(dates),
+    )
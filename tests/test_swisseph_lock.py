@@ -0,0 +1,32 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from oracle.ephemeris import calc_houses, julian_day, swe_lock
+from oracle.horary.horary import _calculate_chart
+from oracle.natal.natal_chart import natal_astrology
+
+
+def test_swisseph_calls_wait_for_the_lock():
+    done = threading.Event()
+    jd = julian_day(datetime(2024, 1, 1, 12))
+
+    with swe_lock:
+        worker = threading.Thread(target=lambda: (calc_houses(jd, 55.75, 37.62), done.set()))
+        worker.start()
+        assert not done.wait(0.2)
+    worker.join(5)
+    assert done.is_set()
+
+
+def test_concurrent_charts_match_serial():
+    moments = [datetime(2024, 1, 1, 12) + timedelta(hours=7 * i) for i in range(40)]
+    serial = [_calculate_chart(m, 55.75, 37.62, b'P').houses for m in moments]
+    natal_serial = [natal_astrology.calculate_positions(m, 59.93, 30.34) for m in moments]
+
+    with ThreadPoolExecutor(8) as pool:
+        horary = list(pool.map(lambda m: _calculate_chart(m, 55.75, 37.62, b'P').houses, moments))
+        natal = list(pool.map(lambda m: natal_astrology.calculate_positions(m, 59.93, 30.34), moments))
+
+    assert horary == serial
+    assert natal == natal_serial
@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+
+from database.user_cache import user_cache
+from database.user_manager import UserManager, user_manager
+
+
+async def test_invalidation_during_profile_read_is_not_overwritten(db, monkeypatch):
+    user = SimpleNamespace(id=555, username="seeker", first_name="Seeker", last_name=None)
+    await user_manager.get_or_create_user(user)
+
+    read_done = asyncio.Event()
+    release = asyncio.Event()
+    original = UserManager.get_or_create_user
+
+    async def slow_read(tg_user, referred_by=None):
+        db_user = await original(tg_user, referred_by)  # Строка прочитана до оплаты
+        read_done.set()
+        await release.wait()
+        return db_user
+
+    monkeypatch.setattr(UserManager, "get_or_create_user", staticmethod(slow_read))
+    reader = asyncio.create_task(user_manager.get_profile(user))
+    await read_done.wait()
+
+    await user_manager.update_premium_status(user.id)
+    release.set()
+    stale = await reader
+    assert not stale.is_premium
+
+    # Устаревший снимок не попал в кэш: следующее чтение видит премиум
+    monkeypatch.setattr(UserManager, "get_or_create_user", original)
+    assert user_cache.get(user.id) is None
+    assert (await user_manager.get_profile(user)).is_premium
+
+
+async def test_profile_is_cached_without_concurrent_writes(db):
+    user = SimpleNamespace(id=556, username=None, first_name="Seeker", last_name=None)
+    first = await user_manager.get_profile(user)
+    assert user_cache.get(user.id) is first